@@ -1,49 +1,133 @@
+import glob
 import json
 import logging
 import sys
 
 from core.backtest_engine import BackTestEngine
+from core.batch import run_batch
+from core.search import ParameterSearch
 from utils.analysis import analyze
+from utils.bootstrap import run_bootstrap
+from utils.profiler import PROFILER
 
 logger = logging.getLogger(__name__)
 
+# Profiling report of --profile runs, written next to session.log
+PROFILE_FILE = "profile.json"
+
+
+def run_test(test_params, data_source=None):
+    """
+    Run the backtest, parameter search or walk-forward test of a configuration, along with its statistical analysis
+    :param test_params: a json dictionary of test parameters; check sample.json for an example
+    :param data_source: DataSource to read option data from (see serve.py); by default one is set up from test_params
+    :return: list of (window or None, ticker summary, net value histories) entries, a single one unless walk-forward
+    """
+    if "search" in test_params:
+        # Search the parameter space adaptively instead of testing every permutation
+        search = ParameterSearch(test_params, data_source)
+        ticker_summaries = [(None, search.run(), search.engine.nav_histories)]
+    elif "walkforward" in test_params:
+        # Test over many sub-windows of the date range, and analyze each of them
+        engine = BackTestEngine(test_params, data_source)
+        ticker_summaries = [(window, summary, engine.nav_histories[window])
+                            for window, summary in engine.run_windows().items()]
+    else:
+        # Create a session and configure the session.
+        engine = BackTestEngine(test_params, data_source)
+
+        # Run the session.
+        ticker_summaries = [(None, engine.run(), engine.nav_histories)]
+
+    analyze_results(test_params, ticker_summaries)
+    return ticker_summaries
+
+
+def analyze_results(test_params, ticker_summaries):
+    """
+    Run statistical analysis of the results of a configuration
+    :param ticker_summaries: list of (window or None, ticker summary, net value histories) entries, as run_test() gives
+    """
+    with PROFILER.timed("analysis"):
+        for window, ticker_summary, nav_histories in ticker_summaries:
+            if window is not None:
+                logger.info("Analysis of window {} - {}".format(*window))
+            analyze(test_params, ticker_summary, nav_histories)
+            run_bootstrap(test_params, ticker_summary, nav_histories)
+
+
+def run_tests(configs, data_source=None):
+    """
+    Run several configurations; plain backtests share a single pass over the option data (see core/batch.py), while
+    searches and walk-forward runs are run one by one
+    :param configs: list of (filename, test_params) pairs
+    :return: list of run_test() results, one per configuration
+    """
+    shared = [k for k, (_, test_params) in enumerate(configs)
+              if "search" not in test_params and "walkforward" not in test_params]
+    batch_results = dict(zip(shared, run_batch([configs[k][1] for k in shared], data_source)))
+
+    results = []
+    for k, (filename, test_params) in enumerate(configs):
+        logger.info("Results of configuration {}".format(filename))
+        if k not in batch_results:
+            results.append(run_test(test_params, data_source))
+            continue
+        summary_by_ticker, nav_histories = batch_results[k]
+        for ticker, summary in summary_by_ticker.items():
+            for perf, drawdown, netval, id, _ in summary:
+                logger.info("{} Strategy {} Portfolio Value {} Performance {:.2f}% MaxDrawdown {:.2f}%".
+                            format(ticker, id, netval, perf, drawdown))
+        results.append([(None, summary_by_ticker, nav_histories)])
+        analyze_results(test_params, results[-1])
+    return results
+
 
 def main():
     """
-    Usage: backtest.py <backtest_config_filename>
+    Usage: backtest.py <backtest_config_filenames or glob patterns> [--profile]
     Example: backtest.py sample.json
+             backtest.py "sample_*DTE.json"
 
     Where the file is a JSON file with strategy parameters to be back-tested
     Check sample.json as an example (used as default file if none provided)
     Check README.md for a more detailed explanation.
+    With several files, plain backtests over the same data are run together, loading every ticker only once.
+    With --profile, time spent per stage of the run is written to profile.json
     """
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    PROFILER.enabled = "--profile" in sys.argv[1:]
 
     # Default strategy to backtest if no JSON file is provided
-    filename = "sample.json"
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
+    filenames = []
+    for pattern in args:
+        filenames.extend(sorted(glob.glob(pattern)) or [pattern])
+    if len(filenames) == 0:
+        filenames = ["sample.json"]
 
     # Set up logging for the session.
     logging.basicConfig(filename='session.log', level=logging.INFO)
 
-    test_params = None
-    try:
-        with open(filename) as f:
-            test_params = json.load(f)
-    except Exception as e:
-        print("Sorry mate, something is wrong with your input file {}. {}".format(filename, e))
-        logger.info("Sorry mate, something is wrong with your input file {}. {}".format(filename, e))
-        return
-
-    # Create a session and configure the session.
-    engine = BackTestEngine(test_params)
-
-    # Run the session.
-    ticker_summary = engine.run()
+    configs = []
+    for filename in filenames:
+        try:
+            with open(filename) as f:
+                configs.append((filename, json.load(f)))
+        except Exception as e:
+            print("Sorry mate, something is wrong with your input file {}. {}".format(filename, e))
+            logger.info("Sorry mate, something is wrong with your input file {}. {}".format(filename, e))
+            return
 
-    # Run statistical analysis
-    analyze(test_params, ticker_summary)
+    PROFILER.reset()
+    if len(configs) == 1:
+        run_test(configs[0][1])
+    else:
+        run_tests(configs)
 
+    if PROFILER.enabled:
+        report = PROFILER.write(PROFILE_FILE)
+        logger.info("Profile written to {}: {:.2f}s in total, stages {}".format(
+            PROFILE_FILE, report["wall_time"], {stage: round(t["total"], 3) for stage, t in report["stages"].items()}))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+
+from core.backtest_engine import BackTestEngine
+from core.portfolio import Portfolio
+from datasource.synthetic_source import SyntheticDataSource
+from strategy.buyandhold import BuyAndHold
+from utils.data_loader import events_from_frame
+
+# Stored results to compare against, rewritten by --save
+BASELINES_FILE = "benchmark_baselines.json"
+
+# A benchmark regresses when it gets this much slower than its baseline, or needs this much more memory
+TOLERANCE = 0.25
+# ... and memory growth below this many MB is ignored, as tiny peaks vary from run to run
+MEMORY_SLACK_MB = 1.0
+
+# Each benchmark is timed over this many runs, and the best run is reported
+REPEAT = 5
+
+FROM_DATE, TO_DATE = "2021-01-04", "2021-04-01"
+DATASOURCE = {"type": "synthetic", "seed": 0, "tickers": {"SPY": {"price": 370.0}, "QQQ": {"price": 310.0}}}
+
+
+def load_frame(ticker="SPY"):
+    return SyntheticDataSource(DATASOURCE).query(ticker, FROM_DATE, TO_DATE)
+
+
+def load_events(ticker="SPY"):
+    """
+    :return: list of events with all their option chains decoded
+    """
+    events = list(events_from_frame(ticker, load_frame(ticker)))
+    for event in events:
+        for expiry in event.get_option_expiries():
+            event.option_chains.get_option_chain_by_expiry(expiry)
+    return events
+
+
+def bench_decode():
+    """
+    Turning option rows into events, with every option chain decoded
+    """
+    data = load_frame()
+
+    def run():
+        events = 0
+        for event in events_from_frame("SPY", data):
+            for expiry in event.get_option_expiries():
+                event.option_chains.get_option_chain_by_expiry(expiry)
+            events += 1
+        return events
+    return run, "events"
+
+
+def bench_find_option_by_delta():
+    """
+    Option lookups by type, DTE and delta, as done by most strategies on every event
+    """
+    events = load_events()
+    lookups = [(option_type, dte, delta) for option_type, delta in [("CALL", 0.3), ("PUT", -0.3)]
+               for dte in (2, 7, 30, 90)]
+
+    def run():
+        for event in events:
+            for option_type, dte, delta in lookups:
+                event.find_option_by_delta(option_type, preferred_dte=dte, preferred_delta=delta)
+        return len(events) * len(lookups)
+    return run, "lookups"
+
+
+def bench_update_portfolio():
+    """
+    Marking a portfolio of shares and 20 long dated options to market on every event
+    """
+    events = load_events()
+    first = events[0]
+    expiry = first.find_expiry(preferred_dte=180)
+    chain = first.option_chains.get_option_chain_by_expiry(expiry)
+    options = [op for _, op in chain.get_sorted_calls()][:10] + [op for _, op in chain.get_sorted_puts()][:10]
+
+    def run():
+        portfolio = Portfolio(1000000, BuyAndHold({}))
+        portfolio.adjust_holdings(first.ticker, 100, first.price)
+        for op in options:
+            portfolio.adjust_holdings(op.symbol, 1, op.midprice())
+        for event in events:
+            portfolio.update_portfolio([], event)
+        return len(events)
+    return run, "events"
+
+
+def bench_rnd():
+    """
+    Fitting the risk neutral distribution of a weekly option chain
+    """
+    # Imported here; it pulls in scipy's optimizers and matplotlib
+    from indicators.rnd import get_RND_distribution
+    events = load_events()[:20]
+    chains = [event.option_chains.get_option_chain_by_expiry(event.find_expiry(preferred_dte=7)) for event in events]
+
+    def run():
+        for chain in chains:
+            get_RND_distribution(chain)
+        return len(chains)
+    return run, "fits"
+
+
+def bench_sweep():
+    """
+    A full BackTestEngine run of a small sweep over two tickers, uncached
+    """
+    test_params = {
+        "ticker": ["SPY", "QQQ"], "fromDate": FROM_DATE, "toDate": TO_DATE, "startcash": 1000000,
+        "datasource": DATASOURCE, "resultcache": False,
+        "strategies": [
+            {"strategy": "buyandhold"},
+            {"strategy": "coveredcall", "dte": [7, 30], "delta": [0.2, 0.3]},
+            {"strategy": "wheel", "calldte": [30, 45], "calldelta": 0.3, "putdte": 7, "putdelta": -0.3},
+            {"strategy": "deltaneutral", "longdte": 180, "longdelta": 0.5, "shortdte": 7, "shortdelta": 0.2,
+             "closeonprofit": 0.5, "creditroll": 0}
+        ]
+    }
+
+    events = {ticker: load_frame(ticker).QuoteDate.nunique() for ticker in test_params["ticker"]}
+
+    def run():
+        summary_by_ticker = BackTestEngine(dict(test_params)).run()
+        return sum(len(summary) * events[ticker] for ticker, summary in summary_by_ticker.items())
+    return run, "strategy events"
+
+
+BENCHMARKS = {
+    "decode": bench_decode,
+    "find_option_by_delta": bench_find_option_by_delta,
+    "update_portfolio": bench_update_portfolio,
+    "rnd": bench_rnd,
+    "sweep": bench_sweep,
+}
+
+
+def measure(benchmark):
+    """
+    :param benchmark: function setting up a benchmark, returning its run function and the unit of work it counts
+    :return: dictionary with the rate (units per second) of the fastest run, and the peak memory allocated by a run
+    """
+    run, unit = benchmark()
+    best = None
+    for _ in range(REPEAT):
+        tic = time.perf_counter()
+        count = run()
+        seconds = time.perf_counter() - tic
+        best = seconds if best is None else min(best, seconds)
+
+    # Memory is measured in a separate run, tracing allocations slows it down
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"unit": unit, "count": count, "seconds": best, "rate": count / best, "peak_mb": peak / 2 ** 20}
+
+
+def compare(name, result, baseline):
+    """
+    :return: (report line, True if the result regressed from the baseline)
+    """
+    line = "{:<22}{:>12.1f} {}/sec{:>10.1f} MB peak".format(name, result["rate"], result["unit"], result["peak_mb"])
+    if baseline is None:
+        return line + "  (no baseline)", False
+
+    speed = result["rate"] / baseline["rate"]
+    memory = result["peak_mb"] / max(baseline["peak_mb"], 1e-9)
+    regressed = speed < 1 - TOLERANCE or \
+        (memory > 1 + TOLERANCE and result["peak_mb"] - baseline["peak_mb"] > MEMORY_SLACK_MB)
+    line += "  speed x{:.2f}, memory x{:.2f}".format(speed, memory)
+    if regressed:
+        line += "  REGRESSED"
+    return line, regressed
+
+
+def main():
+    """
+    Usage: benchmark.py [benchmark names] [--save]
+    Example: benchmark.py decode sweep
+
+    Runs the benchmarks on synthetic option data (no database needed) and reports their throughput and peak memory,
+    compared to the baselines stored in benchmark_baselines.json. Runs all benchmarks if none are named. Exits with
+    an error code if any benchmark regressed by more than 25%.
+    With --save, the results are stored as the new baselines instead.
+    """
+    names = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    save = "--save" in sys.argv[1:]
+    for name in names:
+        if name not in BENCHMARKS:
+            print("Unknown benchmark {}, choose from {}".format(name, ", ".join(BENCHMARKS)))
+            return 1
+    if len(names) == 0:
+        names = list(BENCHMARKS)
+
+    # Only warnings are logged, so logging does not skew the timings
+    logging.basicConfig(filename='session.log', level=logging.WARNING)
+
+    try:
+        with open(BASELINES_FILE) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {"benchmarks": {}}
+
+    print("Python {} on {}".format(platform.python_version(), platform.platform()))
+    if not save and "machine" in baselines:
+        print("Baselines from {}".format(baselines["machine"]))
+
+    regressions = []
+    for name in names:
+        result = measure(BENCHMARKS[name])
+        line, regressed = compare(name, result, None if save else baselines["benchmarks"].get(name, None))
+        print(line)
+        if regressed:
+            regressions.append(name)
+        baselines["benchmarks"][name] = result
+
+    if save:
+        baselines["machine"] = "Python {} on {}".format(platform.python_version(), platform.platform())
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print("Baselines saved to {}".format(BASELINES_FILE))
+        return 0
+    if len(regressions) > 0:
+        print("Regressed: {}".format(", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
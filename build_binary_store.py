@@ -0,0 +1,45 @@
+import json
+import logging
+import sys
+
+from datasource.binary_source import write_binary_store
+from utils.data_loader import data_source_from_params
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Usage: build_binary_store.py <backtest_config_filename> <store_folder> [plain|delta]
+    Example: build_binary_store.py sample.json binarystore delta
+
+    Converts the option data of all tickers and the date range of a backtest file, read from its "datasource", into
+    the memory-mapped binary store, in the given encoding ("plain" by default). Use it afterwards with
+    "datasource": {"type": "binary", "path": "<store_folder>"}.
+    """
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    filename, store = sys.argv[1], sys.argv[2]
+    encoding = sys.argv[3] if len(sys.argv) > 3 else "plain"
+
+    logging.basicConfig(filename='session.log', level=logging.INFO)
+
+    with open(filename) as f:
+        test_params = json.load(f)
+
+    source = data_source_from_params(test_params.get("datasource", None))
+    tickers = test_params.get("ticker", ["SPY"])
+    if type(tickers) != list:
+        tickers = [tickers]
+
+    for ticker in tickers:
+        data = source.query(ticker=ticker, fromdate=test_params.get("fromDate", "2021-06-01"),
+                            todate=test_params.get("toDate", None))
+        rows = write_binary_store(store, ticker, data, encoding=encoding)
+        print("Wrote {} rows of {} into {}".format(rows, ticker, store))
+        logger.info("Wrote {} rows of {} into {}".format(rows, ticker, store))
+
+
+if __name__ == "__main__":
+    main()
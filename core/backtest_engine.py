@@ -1,88 +1,206 @@
-import copy
+import bisect
+import heapq
 import logging
+import multiprocessing
+import time
 
+from core.datafilter import merge_data_filters
 from core.portfolio import Portfolio
-from utils.data_loader import events_generator
-from strategy.buyandhold import BuyAndHold
-from strategy.covered_call import CoveredCall
-from strategy.delta_neutral import DeltaNeutral
-from strategy.leveraged_covered_call import LeveragedCoveredCall
-from strategy.rnd_strategy import RndStrategy
-from strategy.wheel import Wheel
+from utils.data_loader import BASKET_SEPARATOR, data_source_from_params, events_generator, get_fingerprint
+from utils.export import ResultExporter, DEFAULT_BATCH_ROWS
+from utils.metrics import RunMetrics, count_weekdays, DEFAULT_INTERVAL
+from utils.prefetch import prefetch_events, PREFETCH_MODES
+from utils.checkpoint import Checkpointer
+from utils.permutations import iter_sampled_permutations
+from utils.profiler import PROFILER
+from utils.resample import get_step_period, parse_resample, report_divergence
+from utils.result_cache import ResultCache
+from utils.tools import add_days
+from utils.trace import TraceWriter
+from strategy.registry import strategy_from_params
 
 logger = logging.getLogger(__name__)
 
+# Events of every ticker, for runs that simulate over the same data many times (searches, walk-forward windows);
+# loaded once before the worker pool is forked, so that all workers share them. Dates index the events of a ticker.
+LOADED_EVENTS = {}
+LOADED_DATES = {}
 
-def strategy_from_params(params):
-    """
-    Add initializaiton of new strategies here; map a string to their class;
-    :param params: parameters unique to the strategy
-    :return: an initialized strategy
-    """
-    if params["strategy"].lower() == "buyandhold":
-        return BuyAndHold(params)
-    if params["strategy"].lower() == "coveredcall":
-        return CoveredCall(params)
-    if params["strategy"].lower() == "wheel":
-        return Wheel(params)
-    if params["strategy"].lower() == "leveragedcoveredcall":
-        return LeveragedCoveredCall(params)
-    if params["strategy"].lower() == "deltaneutral":
-        return DeltaNeutral(params)
-    if params["strategy"].lower() == "rndstrategy":
-        return RndStrategy(params)
-
-
-def get_all_permutations(original_params, params_to_generate, index, pos, permutation_list):
-    N = len(index)
-    if pos == len(index):
-        # Create a deep copy of the original parameters
-        param_cpy = copy.deepcopy(original_params)
-        # Rewrite params according to current permutation
-        for i in range(N):
-            key, value = params_to_generate[i]
-            param_cpy[key] = value[index[i]]
-        permutation_list.append(param_cpy)
-    else:
-        # Generate all possible permutations
-        L = len(params_to_generate[pos][1])
-        for i in range(L):
-            index[pos] = i
-            get_all_permutations(original_params, params_to_generate, index, pos + 1, permutation_list)
-
-
-def generate_permutations(params):
-    params_to_generate = []
-    for key, value in params.items():
-        if type(value) == list:
-            params_to_generate.append((key, value))
 
-    N = len(params_to_generate)
-    permutation_list = []
-    get_all_permutations(params, params_to_generate, [0 for _ in range(N)], 0, permutation_list)
-    return permutation_list
+# Metrics to pick the top portfolios by in "retain" mode, from result dictionaries (see get_result); higher is better
+RETAIN_METRICS = {
+    "performance": lambda result: result["performance"],
+    "maxdrawdown": lambda result: result["max_drawdown"],
+    "calmar": lambda result: result["performance"] / max(abs(result["max_drawdown"]), 1.0),
+    "sharpe": lambda result: result["sharpe"] if result.get("sharpe") is not None else float("-inf"),
+}
 
 
 def spawn_strategies(params):
     """
-    Spawn initialized strategies according to param specs
+    Spawn initialized strategies according to param specs; permutations are generated lazily, and only the sampled
+    ones are initialized (see "sampling" in the Readme)
     :param params: dictionary of parameters (see Readme)
     :return: list of initialized strategies
     """
-    strategy_list = []
     if "strategy" in params:
         # A single strategy is specified
-        perm_list = generate_permutations(params)
-        for param_version in perm_list:
-            strategy_list.append(strategy_from_params(param_version))
+        param_specs = [params]
     elif "strategies" in params:
         # Add multiple strategies for testing
-        for strat_params in params["strategies"]:
-            # Generate all permutations of array-style parameters
-            perm_list = generate_permutations(strat_params)
-            for param_version in perm_list:
-                strategy_list.append(strategy_from_params(param_version))
-    return strategy_list
+        param_specs = params["strategies"]
+    else:
+        return []
+    return [strategy_from_params(param_version)
+            for param_version in iter_sampled_permutations(param_specs, params.get("sampling", None))]
+
+
+def step_strategies(simulated, event, step=True, trace=None, export=None):
+    """
+    Let every strategy react to a new event, and update its portfolio accordingly
+    :param simulated: list of (strategy index, strategy, portfolio) entries
+    :param event: the next Event
+    :param step: False to skip the strategies for this event; portfolios are still marked and settled
+    :param trace: a TraceWriter to record orders, fills and net values to; portfolios must track fills
+    :param export: a ResultExporter to record fills and net values to; portfolios must track fills
+    :return: number of strategies that handled the event
+    """
+    # Only pay for formatting (and a drawdown scan) when debug logging is actually enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    profiling = PROFILER.enabled
+    handled_by = 0
+    for i, strategy, portfolio in simulated:
+        if not step or portfolio.is_strategy_idle(event):
+            orders = []
+            if profiling:
+                started = time.perf_counter()
+            portfolio.update_portfolio(orders, event)
+            if profiling:
+                PROFILER.add_strategy(strategy, "update_portfolio", time.perf_counter() - started)
+        else:
+            handled_by += 1
+            if profiling:
+                started = time.perf_counter()
+            # Take order decisions from strategy
+            orders = strategy.handle_event(open_positions=portfolio.get_open_positions(), totalcash=portfolio.cash,
+                                           totalvalue=portfolio.get_net_value(), event=event)
+            if profiling:
+                handled = time.perf_counter()
+                PROFILER.add_strategy(strategy, "handle_event", handled - started)
+            if debug and len(orders) > 0:
+                logger.debug("%s placed orders: %s", strategy.get_unique_id(), [str(o) for o in orders])
+            # Update portfolio holdings, and skip the strategy until it wants to handle events again
+            portfolio.update_portfolio(orders, event)
+            portfolio.set_wake_up(strategy.get_wake_up(portfolio.get_open_positions(), event))
+            if profiling:
+                PROFILER.add_strategy(strategy, "update_portfolio", time.perf_counter() - handled)
+            if debug:
+                logger.debug("Strategy %s Portfolio Value %s Performance %.2f%% MaxDrawdown %.2f%%",
+                             strategy.get_unique_id(), portfolio.get_net_value(), portfolio.get_performance(),
+                             portfolio.get_max_drawdown())
+
+        if trace is not None:
+            for order in orders:
+                trace.order(event.quotedate, i, order.symbol, order.qty)
+            for symbol, qty, price in portfolio.fills:
+                trace.fill(event.quotedate, i, symbol, qty, price)
+            trace.nav(event.quotedate, i, portfolio.net_value_history[-1][1])
+        if export is not None:
+            for symbol, qty, price in portfolio.fills:
+                export.fill(event.ticker, event.quotedate, i, symbol, qty, price)
+            export.nav(event.ticker, event.quotedate, i, portfolio.net_value_history[-1][1])
+        if portfolio.fills:
+            del portfolio.fills[:]
+    return handled_by
+
+
+def get_result(portfolio):
+    """
+    :param portfolio: the Portfolio of a strategy at the end of a simulation
+    :return: dictionary of final results, as stored in the result cache; the net value history is None if the
+             portfolio did not keep it
+    """
+    return {"performance": portfolio.get_performance(), "max_drawdown": portfolio.get_max_drawdown(),
+            "net_value": portfolio.get_net_value(), "sharpe": portfolio.get_sharpe(),
+            "net_value_history": portfolio.net_value_history if portfolio.keep_history else None}
+
+
+def summarize(strategy_list, results):
+    """
+    :param strategy_list: list of strategies
+    :param results: list of results (see get_result), one per strategy
+    :return: list of (performance, maxdrawdown, netvalue, strategy_id, strategy) entries, sorted by performance
+    """
+    summary = []
+    for strategy, result in zip(strategy_list, results):
+        summary.append((result["performance"], result["max_drawdown"], result["net_value"],
+                        strategy.get_unique_id(), strategy))
+    summary.sort(reverse=True)
+    return summary
+
+
+def get_nav_histories(strategy_list, results):
+    """
+    :param strategy_list: list of strategies
+    :param results: list of results (see get_result), one per strategy
+    :return: dictionary of {strategy_id: net value history} entries, for results that kept their history
+    """
+    return {strategy.get_unique_id(): result["net_value_history"] for strategy, result in zip(strategy_list, results)
+            if result["net_value_history"] is not None}
+
+
+def load_events(source, tickers, fromdate, todate, data_filter):
+    """
+    Load all events of the tickers into LOADED_EVENTS and LOADED_DATES
+    """
+    LOADED_EVENTS.clear()
+    LOADED_DATES.clear()
+    for ticker in tickers:
+        LOADED_EVENTS[ticker] = list(events_generator(ticker, fromdate, todate, data_filter, source))
+        LOADED_DATES[ticker] = [event.quotedate for event in LOADED_EVENTS[ticker]]
+        logger.info("Loaded {} events for {}".format(len(LOADED_EVENTS[ticker]), ticker))
+
+
+def simulate(params, startcash, tickers, fromdate=None, todate=None, resample=None):
+    """
+    Simulate a single strategy over the loaded events
+    :param params: strategy parameters (a single permutation)
+    :param startcash: starting cash of the portfolio
+    :param tickers: list of tickers to simulate the strategy on
+    :param fromdate: only simulate events from this date on (inclusive); None for all loaded events
+    :param todate: only simulate events up to this date (exclusive); None for all loaded events
+    :param resample: only step the strategy every this many days, or "weekly"; None to step on every event
+    :return: list of results (see get_result), one per ticker
+    """
+    results = []
+    for ticker in tickers:
+        dates = LOADED_DATES[ticker]
+        first = 0 if fromdate is None else bisect.bisect_left(dates, fromdate)
+        last = len(dates) if todate is None else bisect.bisect_left(dates, todate)
+
+        strategy = strategy_from_params(params)
+        simulated = [(0, strategy, Portfolio(starting_cash=startcash, strategy=strategy))]
+        origin = fromdate if fromdate is not None else dates[0] if len(dates) > 0 else None
+        period = None
+        for event in LOADED_EVENTS[ticker][first:last]:
+            previous, period = period, get_step_period(event.quotedate, resample, origin)
+            step_strategies(simulated, event, step=period != previous)
+        results.append(get_result(simulated[0][2]))
+    return results
+
+
+def make_pool(workers):
+    """
+    :param workers: number of worker processes
+    :return: a pool of forked worker processes, sharing the loaded events; None to simulate in this process
+    """
+    if workers <= 1:
+        return None
+    try:
+        return multiprocessing.get_context("fork").Pool(workers)
+    except ValueError:
+        logger.info("Cannot fork worker processes on this platform; simulating in a single process")
+        return None
 
 
 class BackTestEngine:
@@ -98,10 +216,12 @@ class BackTestEngine:
      - generate a final report in the end for each strategies performance
     """
 
-    def __init__(self, test_params):
+    def __init__(self, test_params, data_source=None):
         """
         Do a whole lot of default initializations and sanity checking
         :param test_params: a json dictionary of test parameters; check sample.json for an example
+        :param data_source: DataSource to read option data from, such as a shared CachedDataSource; by default one is
+                            set up from the "datasource" entry of test_params
         """
         # Start date
         logger.info("Setting up new Backtest run.")
@@ -131,13 +251,298 @@ class BackTestEngine:
         # Make sure ticker is a list
         if type(self.ticker) != list:
             self.ticker = [self.ticker]
+        # A nested list of tickers (or "SPY+QQQ") is a basket: its tickers are simulated together, every strategy
+        # trading all of them out of a single portfolio (see MultiEvent)
+        self.ticker = [BASKET_SEPARATOR.join(t) if type(t) == list else t for t in self.ticker]
 
         # Set a starting cash amount, consistent across all strategies
         self.startcash = test_params.get("startcash", 1000000)
 
+        # Which of the strategy declared data windows to push down into the data query: "none", "dte" or "all"
+        # Pushing down delta windows is opt-in: held contracts drifting out of the window are no longer re-priced
+        self.pushdown = test_params.get("pushdown", "dte")
+        if self.pushdown not in ("none", "dte", "all"):
+            logger.info("Unknown 'pushdown' value {}. Using default value of 'dte'".format(self.pushdown))
+            self.pushdown = "dte"
+
+        # Option data backend (MySQL unless specified otherwise); no connection is made until data is queried
+        self.data_source = data_source
+        if self.data_source is None:
+            self.data_source = data_source_from_params(test_params.get("datasource", None))
+        logger.info("Reading option data from {}".format(self.data_source.get_name()))
+
+        # Load upcoming events in the background while simulating: either a prefetch depth, or a dictionary with
+        # "depth" and "mode" ("thread" or "process") entries. A depth of 0 loads events in line with the simulation.
+        prefetch = test_params.get("prefetch", 8)
+        if type(prefetch) != dict:
+            prefetch = {"depth": prefetch}
+        self.prefetch_depth = prefetch.get("depth", 8)
+        self.prefetch_mode = prefetch.get("mode", "thread")
+        if self.prefetch_mode not in PREFETCH_MODES:
+            logger.info("Unknown prefetch mode {}. Using default value of 'thread'".format(self.prefetch_mode))
+            self.prefetch_mode = "thread"
+        if PROFILER.enabled and self.prefetch_mode == "process" and self.prefetch_depth > 0:
+            logger.info("Events are loaded in a separate process; query and decode times are not profiled")
+
+        # Results of strategy permutations simulated before (same params, ticker, dates, cash and data version) are
+        # taken from the result cache folder instead of being simulated again; set "resultcache" to false to disable
+        cache_path = test_params.get("resultcache", ".resultcache")
+        self.result_cache = ResultCache(cache_path) if cache_path else None
+
+        # Periodically snapshot strategy and portfolio state, to resume a run (or extend it to a later end date) from
+        # the latest snapshot; either a checkpoint folder, or a dictionary with "path" and "every" (events) entries
+        checkpoint = test_params.get("checkpoint", None)
+        if checkpoint is not None and type(checkpoint) != dict:
+            checkpoint = {"path": checkpoint}
+        self.checkpointer = None
+        if checkpoint:
+            self.checkpointer = Checkpointer(checkpoint.get("path", "checkpoints"), checkpoint.get("every", 20))
+
+        # Walk-forward mode: run over many (possibly overlapping) sub-windows of the date range from a single data
+        # load; either rolling windows of "length" days every "step" days, or an explicit list of [from, to] "windows"
+        self.walkforward = test_params.get("walkforward", None)
+        self.workers = multiprocessing.cpu_count()
+        if self.walkforward is not None:
+            self.workers = self.walkforward.get("workers", self.workers)
+
+        # Coarse sweeps: only let strategies act every N days, or "weekly"; portfolios still settle every day.
+        # With "compare", a full resolution run follows, to report how far the coarse results diverge from it.
+        self.resample, self.resample_compare = parse_resample(test_params.get("resample", None))
+
+        # Write a binary trace of all events, orders, fills and net values to this file (see utils/trace.py)
+        self.trace_path = test_params.get("trace", None)
+
+        # Bound memory in huge sweeps: only the "top" portfolios of every ticker by "metric" (see RETAIN_METRICS) end up
+        # with a net value history, all others only keep running statistics; either the number of portfolios to keep,
+        # or a dictionary with "top" and "metric" entries
+        retain = test_params.get("retain", None)
+        if retain is not None and type(retain) != dict:
+            retain = {"top": retain}
+        if retain is not None and retain.get("metric", "performance") not in RETAIN_METRICS:
+            raise ValueError("Unknown retain metric '{}', expected one of {}".format(
+                retain["metric"], ", ".join(RETAIN_METRICS)))
+        self.retain = retain
+
+        # Stream net value histories, fills and summaries to columnar files: either an export folder, or a dictionary
+        # with "path", "format" ("parquet", "arrow" or "ndjson") and "batch" (rows per written batch) entries
+        export = test_params.get("export", None)
+        if export is not None and type(export) != dict:
+            export = {"path": export}
+        self.export = export
+
+        # Portfolios keep their daily net value history for analysis, unless only the top ones should (see retain) or
+        # it is streamed to an export instead
+        self.keep_history = self.retain is None and not self.export
+
+        # Live progress metrics: either a file to rewrite with Prometheus style metrics, or a dictionary with "path",
+        # "every" (seconds between updates) and "console" (show a progress line) entries
+        metrics = test_params.get("metrics", None)
+        if metrics is not None and type(metrics) != dict:
+            metrics = {"path": metrics}
+        self.metrics = metrics
+
         # Save out test-params for strategy re-initialization
         self.test_params = test_params
 
+        # Net value histories of all strategies of the latest run, for analysis: {ticker: {strategy_id: history}}
+        # after run(), {(fromdate, todate): {ticker: {strategy_id: history}}} after run_windows()
+        self.nav_histories = {}
+
+    def get_data_filter(self, strategy_list):
+        """
+        Merge the data windows declared by all strategies of the sweep into a single filter for the data query
+        :param strategy_list: list of initialized strategies
+        :return: a DataFilter, or None if nothing should be pushed down
+        """
+        # Every kind of run sets up its data filter before loading anything, so fail early on unfit strategies
+        self.check_baskets(strategy_list)
+        if self.pushdown == "none":
+            return None
+        data_filter = merge_data_filters([strat.get_data_filter() for strat in strategy_list])
+        if self.pushdown == "dte":
+            data_filter = data_filter.without_delta()
+        return data_filter
+
+    def check_baskets(self, strategy_list):
+        """
+        :param strategy_list: list of initialized strategies
+        :raise ValueError: if a basket of tickers is tested with strategies that only trade a single ticker
+        """
+        if not any(BASKET_SEPARATOR in ticker for ticker in self.ticker):
+            return
+        single = sorted(set(strat.get_unique_id() for strat in strategy_list if not strat.trades_baskets()))
+        if len(single) > 0:
+            raise ValueError("Strategies {} cannot trade baskets of tickers".format(", ".join(single)))
+
+    def get_cache_keys(self, ticker, strategy_list, data_filter, fromdate=None, todate=None, compact=None):
+        """
+        :param ticker: string of the ticker ("SPY", "QQQ", ...)
+        :param strategy_list: list of initialized strategies
+        :param data_filter: the DataFilter pushed down into the data query
+        :param fromdate: start date of the simulation, if other than the start date of the run
+        :param todate: end date of the simulation, if other than the end date of the run
+        :param compact: True for the keys of results without a net value history; None for the mode of the run
+        :return: list of result cache keys, one per strategy; None if results for the ticker cannot be cached
+        """
+        if self.result_cache is None:
+            return None
+        fromdate = self.start_date if fromdate is None else fromdate
+        todate = self.end_date if todate is None else todate
+        fingerprint = get_fingerprint(self.data_source, ticker, fromdate, todate)
+        if fingerprint is None:
+            return None
+
+        extra = self.get_key_extra(data_filter, compact)
+        return [self.result_cache.make_key(strat, ticker, fromdate, todate, self.startcash, fingerprint, extra)
+                for strat in strategy_list]
+
+    def get_key_extra(self, data_filter, compact=None):
+        """
+        :param data_filter: the DataFilter pushed down into the data query
+        :param compact: True if portfolios only keep running statistics; None for the mode of the run
+        :return: dictionary of run settings that change results, for result cache and checkpoint keys
+        """
+        # Pushed down windows can change results: held contracts are no longer re-priced outside of delta windows, nor
+        # once they lie beyond the DTE window, which is wider when loading for a batch (see run_batch)
+        extra = {"pushdown": self.pushdown, "filter": str(data_filter)}
+        if self.resample is not None:
+            extra["resample"] = self.resample
+        if compact is None:
+            compact = not self.keep_history
+        if compact:
+            extra["history"] = False
+        return extra
+
+    def get_windows(self):
+        """
+        :return: list of (fromdate, todate) walk-forward windows, with inclusive start and exclusive end dates
+        """
+        if "windows" in self.walkforward:
+            return [(fromdate, todate) for fromdate, todate in self.walkforward["windows"]]
+
+        length = self.walkforward.get("length", 90)
+        step = self.walkforward.get("step", length)
+        windows = []
+        fromdate = self.start_date
+        while add_days(fromdate, length) <= self.end_date:
+            windows.append((fromdate, add_days(fromdate, length)))
+            fromdate = add_days(fromdate, step)
+        return windows
+
+    def restore_checkpoint(self, ticker, strategy_list, simulated, data_filter):
+        """
+        Restore the state of the simulated strategies and portfolios from their latest checkpoint, if any
+        :param ticker: string of the ticker ("SPY", "QQQ", ...)
+        :param strategy_list: list of all initialized strategies of the ticker; restored ones are swapped in
+        :param simulated: list of (strategy index, strategy, portfolio) entries to be simulated; restored in place
+        :param data_filter: the DataFilter pushed down into the data query
+        :return: (checkpoint key or None if not checkpointing, date string from when events should be loaded) pair
+        """
+        if self.checkpointer is None or len(simulated) == 0:
+            return None, self.start_date
+
+        extra = self.get_key_extra(data_filter)
+        key = self.checkpointer.make_key(ticker, self.start_date, self.startcash, [s for _, s, _ in simulated], extra)
+        checkpoint = self.checkpointer.load(key)
+        if checkpoint is None:
+            return key, self.start_date
+
+        quotedate, strategies, portfolios, data_fingerprint = checkpoint
+        if self.end_date is not None and quotedate >= self.end_date:
+            # Cannot rewind a snapshot to an earlier end date
+            logger.info("Checkpoint of {} is at {}, past the end date; starting over".format(ticker, quotedate))
+            return key, self.start_date
+        if data_fingerprint != self.get_checkpoint_fingerprint(ticker, quotedate):
+            logger.info("Option data of {} up to its checkpoint at {} changed; starting over".format(ticker, quotedate))
+            return key, self.start_date
+
+        logger.info("Resuming {} from checkpoint at {}".format(ticker, quotedate))
+        for j, (strategy, portfolio) in enumerate(zip(strategies, portfolios)):
+            i = simulated[j][0]
+            strategy_list[i] = strategy
+            simulated[j] = (i, strategy, portfolio)
+        return key, add_days(quotedate, 1)
+
+    def get_checkpoint_fingerprint(self, ticker, quotedate):
+        """
+        :return: fingerprint of the option data of a ticker from the start date up to a checkpoint date (inclusive)
+        """
+        return get_fingerprint(self.data_source, ticker, self.start_date, add_days(quotedate, 1))
+
+    def save_checkpoint(self, ticker, key, quotedate, simulated):
+        self.checkpointer.save(key, quotedate, [s for _, s, _ in simulated], [p for _, _, p in simulated],
+                               self.get_checkpoint_fingerprint(ticker, quotedate))
+
+    def get_run_filter(self):
+        """
+        :return: the DataFilter pushed down into the data query of the run, or None if nothing is pushed down
+        """
+        # All tickers are tested with the same strategies, so they share the data filter
+        data_filter = self.get_data_filter(spawn_strategies(self.test_params))
+        logger.info("Data filter pushed down into the query: {}".format(data_filter))
+        return data_filter
+
+    def plan(self, data_filter):
+        """
+        Set up the strategies of every ticker, and look up which of them were simulated before
+        :param data_filter: the DataFilter events are loaded with (see get_run_filter), or None if unfiltered
+        :return: (list of per ticker plans, list of (ticker, fromdate) pairs of events to load) pair; a plan is a
+                 (ticker, strategy_list, cache_keys, cached_results, simulated, checkpoint_key, fromdate) tuple
+        """
+        # Get strategies initialized for every ticker, and look up which of them were simulated before
+        plans = []
+        tickers_to_load = []
+        for next_ticker in self.ticker:
+            strategy_list = spawn_strategies(self.test_params)
+            cache_keys = self.get_cache_keys(next_ticker, strategy_list, data_filter)
+            if cache_keys is None or self.export and self.retain is None:
+                # Exports write out the net value history of cached results, so only take the ones that kept it
+                cached_results = [None for _ in strategy_list]
+            else:
+                cached_results = [self.result_cache.get(key) for key in cache_keys]
+            if not self.keep_history and cache_keys is not None:
+                # Results with a full history serve just as well
+                full_keys = self.get_cache_keys(next_ticker, strategy_list, data_filter, compact=False)
+                cached_results = [self.result_cache.get(full_keys[i]) if result is None else result
+                                  for i, result in enumerate(cached_results)]
+
+            # Initialize a portfolio for each of the strategies still to be simulated
+            simulated = [(i, strat, Portfolio(starting_cash=self.startcash, strategy=strat,
+                                              keep_history=self.keep_history))
+                         for i, strat in enumerate(strategy_list) if cached_results[i] is None]
+            checkpoint_key, fromdate = self.restore_checkpoint(next_ticker, strategy_list, simulated, data_filter)
+
+            # Only load tickers with anything left to simulate
+            if len(simulated) > 0 and (self.end_date is None or fromdate < self.end_date):
+                tickers_to_load.append((next_ticker, fromdate))
+            plans.append((next_ticker, strategy_list, cache_keys, cached_results, simulated, checkpoint_key, fromdate))
+        return plans, tickers_to_load
+
+    def open_outputs(self, tickers_to_load):
+        """
+        :param tickers_to_load: list of (ticker, fromdate) pairs of events to be simulated
+        :return: (TraceWriter, ResultExporter, RunMetrics) triple of the run, None for the ones not asked for
+        """
+        trace = TraceWriter(self.trace_path) if self.trace_path else None
+        export = None
+        if self.export:
+            export = ResultExporter(self.export.get("path", "results"), self.export.get("format", "parquet"),
+                                    self.export.get("batch", DEFAULT_BATCH_ROWS))
+        metrics = None
+        if self.metrics:
+            metrics = RunMetrics(self.metrics.get("path", None), self.metrics.get("every", DEFAULT_INTERVAL),
+                                 self.metrics.get("console", True))
+            metrics.start([(ticker, count_weekdays(fromdate, self.end_date)) for ticker, fromdate in tickers_to_load])
+        return trace, export, metrics
+
+    def close_outputs(self, trace, export, metrics):
+        if trace is not None:
+            trace.close()
+        if export is not None:
+            export.close()
+        if metrics is not None:
+            metrics.close()
+
     def run(self):
         """
         Run portfolio simulation over historical data for all the strategies
@@ -146,53 +551,272 @@ class BackTestEngine:
         """
 
         summary_by_ticker = {}
+        self.nav_histories = {}
+        data_filter = self.get_run_filter()
+        plans, tickers_to_load = self.plan(data_filter)
 
+        # Events of all tickers, one after the other; loaded ahead in the background while simulating
+        event_stream = prefetch_events(source=self.data_source, tickers=tickers_to_load, todate=self.end_date,
+                                       data_filter=data_filter, depth=self.prefetch_depth, mode=self.prefetch_mode)
+        loaded = set(ticker for ticker, _ in tickers_to_load)
+        trace, export, metrics = self.open_outputs(tickers_to_load)
+        try:
+            self.simulate_plans(plans, event_stream, loaded, trace, export, metrics, summary_by_ticker)
+            if self.retain is not None:
+                self.fill_top_histories(plans, export)
+        finally:
+            self.close_outputs(trace, export, metrics)
+
+        self.compare_resampled(summary_by_ticker)
+        return summary_by_ticker
+
+    def compare_resampled(self, summary_by_ticker):
+        """
+        With "resample" set to compare, run once more at full resolution and report how far the results diverge
+        """
+        if self.resample_compare:
+            logger.info("Running at full resolution, to compare results")
+            full_summary = BackTestEngine(dict(self.test_params, resample=None, trace=None, export=None),
+                                          self.data_source).run()
+            report_divergence(summary_by_ticker, full_summary, self.resample)
+
+    def fill_top_histories(self, plans, export):
+        """
+        Pick the top portfolios of every ticker in "retain" mode, and simulate the ones that only kept running
+        statistics once more, with their net value history; nav_histories ends up holding only the top portfolios
+        :param plans: list of per ticker plans, as set up by plan() and simulated by simulate_plans()
+        :param export: a ResultExporter, or None
+        """
+        top = self.retain.get("top", 10)
+        metric = RETAIN_METRICS[self.retain.get("metric", "performance")]
+        # Run settings for simulating a single ticker with a fixed list of strategies
+        params = {key: value for key, value in self.test_params.items()
+                  if key not in ("strategy", "sampling", "retain", "checkpoint", "trace", "export", "metrics")}
+        params["resample"] = self.resample
+
+        for ticker, strategy_list, _, results, simulated, _, _ in plans:
+            # Net values of the portfolios simulated in this run were streamed to the export already
+            streamed = set(i for i, _, _ in simulated)
+            best = heapq.nlargest(top, range(len(strategy_list)), key=lambda i: metric(results[i]))
+            missing = [i for i in best if results[i]["net_value_history"] is None]
+            if len(missing) > 0:
+                logger.info("Simulating the top {} strategies of {} again to get their net value history".format(
+                    len(missing), ticker))
+                engine = BackTestEngine(dict(params, ticker=[ticker],
+                                             strategies=[strategy_list[i].params for i in missing]),
+                                        self.data_source)
+                engine.run()
+                for i in missing:
+                    history = engine.nav_histories[ticker][strategy_list[i].get_unique_id()]
+                    results[i] = dict(results[i], net_value_history=history)
+                    if export is not None and i not in streamed:
+                        export.nav_history(ticker, strategy_list[i].get_unique_id(), history)
+            self.nav_histories[ticker] = get_nav_histories([strategy_list[i] for i in best],
+                                                           [results[i] for i in best])
+
+    def simulate_plans(self, plans, event_stream, loaded, trace, export, metrics, summary_by_ticker):
+        """
+        Simulate the strategies of every ticker over its events, and summarize their results
+        :param plans: list of per ticker plans, as set up by plan()
+        :param event_stream: generator of (ticker, event) pairs, with (ticker, None) at the end of a ticker
+        :param loaded: set of tickers present in the event stream
+        :param trace: a TraceWriter, or None
+        :param export: a ResultExporter, or None
+        :param metrics: RunMetrics to count events and strategy steps in, or None
+        :param summary_by_ticker: dictionary to store the summary of every ticker in
+        """
         # Run a full backtest for every ticker listed
-        for next_ticker in self.ticker:
-            logger.info("Testing ticker {}".format(next_ticker))
+        for plan in plans:
+            state = self.begin_ticker(plan, plan[0] in loaded, trace, export, metrics)
+            if state is not None:
+                for _, event in event_stream:
+                    if event is None:
+                        # Out of events for this ticker
+                        break
+                    self.step_ticker(plan, state, event, trace, export, metrics)
+            self.end_ticker(plan, state, export, summary_by_ticker)
 
-            # Get strategies initialized
-            strategy_list = spawn_strategies(self.test_params)
+    def begin_ticker(self, plan, load, trace, export, metrics):
+        """
+        :param plan: the plan of a ticker (see plan())
+        :param load: whether events of the ticker are simulated
+        :return: state of the simulation of the ticker, to pass to step_ticker(); None if no events are simulated
+        """
+        next_ticker, strategy_list, _, _, simulated, _, fromdate = plan
+        logger.info("Testing ticker {}".format(next_ticker))
 
-            # Initialize a portfolio for each of these strategies
-            portfolio_list = [Portfolio(starting_cash=self.startcash, strategy=strat) for strat in strategy_list]
+        # Simulate events
+        if len(strategy_list) == 0:
+            logger.info("No strategies specified; nothing to test.")
+        else:
+            logger.info("Testing strategies: {}".format(",".join([s.get_unique_id() for s in strategy_list])))
+            logger.info("Results of {} out of {} strategies taken from the result cache".
+                        format(len(strategy_list) - len(simulated), len(strategy_list)))
+        if not load:
+            return None
 
-            # Simulate events
-            if len(strategy_list) == 0:
-                logger.info("No strategies specified; nothing to test.")
-            else:
-                logger.info("Testing strategies: {}".format(",".join([s.get_unique_id() for s in strategy_list])))
-
-            for event in events_generator(ticker=next_ticker, fromdate=self.start_date, todate=self.end_date):
-                logger.info("New event for {}, date {}, price {}".format(event.ticker, event.quotedate, event.price))
-
-                for strategy, portfolio in zip(strategy_list, portfolio_list):
-                    # Take order decisions from strategy
-                    orders = strategy.handle_event(open_positions=portfolio.get_open_positions(),
-                                                   totalcash=portfolio.cash,
-                                                   totalvalue=portfolio.get_net_value(), event=event)
-                    if len(orders) > 0:
-                        logger.debug("{} placed orders: {}".format(strategy.get_unique_id(), [str(o) for o in orders]))
-                    # Update portfolio holdings
-                    portfolio.update_portfolio(orders, event)
-                    logger.debug("Strategy {} Portfolio Value {} Performance {:.2f}% MaxDrawdown {:.2f}%".
-                                format(strategy.get_unique_id(), portfolio.get_net_value(),
-                                       portfolio.get_performance(), portfolio.get_max_drawdown()))
-
-            # Sort strategies by results and risk
-            summary = []
-            for strategy, portfolio in zip(strategy_list, portfolio_list):
-                summary.append((portfolio.get_performance(), portfolio.get_max_drawdown(),
-                                portfolio.get_net_value(), strategy.get_unique_id(), strategy))
-            summary.sort(reverse=True)
-
-            # Print final portfolio stats
-            logger.info("Out of events! Final results")
-            for perf, drawdown, netval, id, _ in summary:
-                logger.info("Strategy {} Portfolio Value {} Performance {:.2f}% MaxDrawdown {:.2f}%".
-                            format(id, netval, perf, drawdown))
-
-            # Save out summary for this ticker
-            summary_by_ticker[next_ticker] = summary
+        # Strategies are stepped on the first event of every resample period; when resuming from a checkpoint, the
+        # period of the checkpoint date was already stepped
+        state = {"nr_events": 0, "last_quotedate": None, "period": None, "waiting": None}
+        if fromdate != self.start_date:
+            state["period"] = get_step_period(add_days(fromdate, -1), self.resample, self.start_date)
+        for i, strategy, portfolio in simulated:
+            portfolio.fills = [] if trace is not None or export is not None else None
+            if trace is not None:
+                trace.strategy(i, strategy.get_unique_id())
+            if export is not None:
+                export.strategy(i, strategy.get_unique_id())
+        if export is not None and fromdate != self.start_date and len(simulated) > 0:
+            # Portfolios do not keep their net value history while exporting (see keep_history)
+            logger.info("Net values of {} before {} are not exported, as it resumes from a checkpoint".format(
+                next_ticker, fromdate))
+        if metrics is not None:
+            metrics.start_ticker(next_ticker)
+            state["waiting"] = time.perf_counter()
+        return state
 
-        return summary_by_ticker
+    def step_ticker(self, plan, state, event, trace, export, metrics):
+        """
+        Let the simulated strategies of a ticker react to its next event
+        """
+        next_ticker, _, _, _, simulated, checkpoint_key, _ = plan
+        logger.info("New event for %s, date %s, price %s", event.ticker, event.quotedate, event.price)
+        if trace is not None:
+            trace.event(event)
+
+        if PROFILER.enabled or metrics is not None:
+            started = time.perf_counter()
+        previous, state["period"] = state["period"], get_step_period(event.quotedate, self.resample, self.start_date)
+        steps = step_strategies(simulated, event, step=state["period"] != previous, trace=trace, export=export)
+        if PROFILER.enabled:
+            PROFILER.add_event(time.perf_counter() - started)
+
+        state["nr_events"] += 1
+        state["last_quotedate"] = event.quotedate
+        if checkpoint_key is not None and state["nr_events"] % self.checkpointer.every == 0:
+            self.save_checkpoint(next_ticker, checkpoint_key, event.quotedate, simulated)
+        if metrics is not None:
+            # Time between finishing an event and receiving the next one is spent waiting for data
+            done = time.perf_counter()
+            metrics.add_event(next_ticker, steps, started - state["waiting"], done - started)
+            state["waiting"] = done
+
+    def end_ticker(self, plan, state, export, summary_by_ticker):
+        """
+        Save out the results of the strategies of a ticker, and summarize them into summary_by_ticker
+        :param state: state of the simulation of the ticker (see begin_ticker()), or None
+        """
+        next_ticker, strategy_list, cache_keys, cached_results, simulated, checkpoint_key, _ = plan
+        if state is not None and checkpoint_key is not None and state["last_quotedate"] is not None:
+            self.save_checkpoint(next_ticker, checkpoint_key, state["last_quotedate"], simulated)
+
+        # Save out results of the simulated strategies
+        for i, strategy, portfolio in simulated:
+            cached_results[i] = get_result(portfolio)
+            if cache_keys is not None:
+                self.result_cache.put(cache_keys[i], cached_results[i])
+
+        # Sort strategies by results and risk
+        summary = summarize(strategy_list, cached_results)
+
+        # Print final portfolio stats
+        logger.info("Out of events! Final results")
+        for perf, drawdown, netval, id, _ in summary:
+            logger.info("Strategy {} Portfolio Value {} Performance {:.2f}% MaxDrawdown {:.2f}%".
+                        format(id, netval, perf, drawdown))
+
+        # Save out summary for this ticker
+        summary_by_ticker[next_ticker] = summary
+        self.nav_histories[next_ticker] = get_nav_histories(strategy_list, cached_results)
+        if export is not None:
+            # Net values of simulated portfolios were streamed while stepping; write out those of cached results
+            streamed = set(i for i, _, _ in simulated) if state is not None else set()
+            for i, strategy in enumerate(strategy_list):
+                history = cached_results[i]["net_value_history"]
+                if i not in streamed and history is not None:
+                    export.nav_history(next_ticker, strategy.get_unique_id(), history)
+            export.summary(next_ticker, summary)
+
+    def run_windows(self):
+        """
+        Walk-forward run: load the events of the whole date range once, and simulate all strategies over every
+        window in parallel, each window starting from a fresh portfolio
+        :return: dictionary of {(fromdate, todate): summary_by_ticker} entries, with summaries as returned by run()
+        """
+        windows = self.get_windows()
+        strategy_list = spawn_strategies(self.test_params)
+        logger.info("Testing {} strategies over {} windows".format(len(strategy_list), len(windows)))
+
+        data_filter = self.get_data_filter(strategy_list)
+        logger.info("Data filter pushed down into the query: {}".format(data_filter))
+
+        # Look up the results of every (window, ticker, strategy) combination simulated before
+        results = {}
+        cache_keys = {}
+        for window in windows:
+            for ticker in self.ticker:
+                keys = self.get_cache_keys(ticker, strategy_list, data_filter, *window)
+                for i in range(len(strategy_list)):
+                    results[window, ticker, i] = self.result_cache.get(keys[i]) if keys is not None else None
+                    if keys is not None:
+                        cache_keys[window, ticker, i] = keys[i]
+
+        # Simulate the rest, each strategy of each window as a separate task
+        tasks = []
+        for window in windows:
+            for i, strategy in enumerate(strategy_list):
+                missing = [ticker for ticker in self.ticker if results[window, ticker, i] is None]
+                if len(missing) > 0:
+                    tasks.append((window, i, missing))
+        logger.info("Results of {} out of {} simulations taken from the result cache".format(
+            len(results) - sum(len(missing) for _, _, missing in tasks), len(results)))
+
+        if len(tasks) > 0:
+            load_events(self.data_source, [t for t in self.ticker if any(t in m for _, _, m in tasks)],
+                        min(w[0] for w, _, _ in tasks), max(w[1] for w, _, _ in tasks), data_filter)
+            args = [(strategy_list[i].params, self.startcash, missing, window[0], window[1], self.resample)
+                    for window, i, missing in tasks]
+            pool = make_pool(self.workers)
+            try:
+                simulated = pool.starmap(simulate, args) if pool is not None else [simulate(*a) for a in args]
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+            for (window, i, missing), ticker_results in zip(tasks, simulated):
+                for ticker, result in zip(missing, ticker_results):
+                    results[window, ticker, i] = result
+                    if (window, ticker, i) in cache_keys:
+                        self.result_cache.put(cache_keys[window, ticker, i], result)
+
+        # Summaries per window, and the spread of each strategy's results over all windows
+        summary_by_window = {}
+        self.nav_histories = {}
+        for window in windows:
+            logger.info("Window {} - {}".format(*window))
+            summary_by_ticker = {}
+            self.nav_histories[window] = {}
+            for ticker in self.ticker:
+                window_results = [results[window, ticker, i] for i in range(len(strategy_list))]
+                summary = summarize(strategy_list, window_results)
+                self.nav_histories[window][ticker] = get_nav_histories(strategy_list, window_results)
+                for perf, drawdown, netval, id, _ in summary:
+                    logger.info("{} Strategy {} Portfolio Value {} Performance {:.2f}% MaxDrawdown {:.2f}%".
+                                format(ticker, id, netval, perf, drawdown))
+                summary_by_ticker[ticker] = summary
+            summary_by_window[window] = summary_by_ticker
+
+        logger.info("Results over all {} windows".format(len(windows)))
+        for ticker in self.ticker:
+            for i, strategy in enumerate(strategy_list):
+                perfs = [results[window, ticker, i]["performance"] for window in windows]
+                drawdowns = [results[window, ticker, i]["max_drawdown"] for window in windows]
+                if len(perfs) == 0:
+                    continue
+                logger.info("{} Strategy {} Performance avg {:.2f}% min {:.2f}% max {:.2f}% positive in {}/{} "
+                            "windows, MaxDrawdown avg {:.2f}% worst {:.2f}%".format(
+                                ticker, strategy.get_unique_id(), sum(perfs) / len(perfs), min(perfs), max(perfs),
+                                sum(1 for p in perfs if p > 0), len(perfs), sum(drawdowns) / len(drawdowns),
+                                min(drawdowns)))
+        return summary_by_window
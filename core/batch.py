@@ -0,0 +1,118 @@
+import json
+import logging
+from collections import OrderedDict
+
+from core.backtest_engine import BackTestEngine
+from core.datafilter import merge_data_filters
+from utils.prefetch import prefetch_events
+
+logger = logging.getLogger(__name__)
+
+
+def get_shared_filter(engines, data_filters):
+    """
+    :param engines: list of engines sharing a data load
+    :param data_filters: list of the DataFilters of their runs
+    :return: a DataFilter covering the data needs of all of them, or None to load everything
+    """
+    if any(engine.pushdown == "none" for engine in engines):
+        return None
+    return merge_data_filters(data_filters)
+
+
+def run_batch(configs, data_source=None):
+    """
+    Run the backtests of several configurations in a single pass over their option data: every ticker is loaded
+    once, over the union of the date ranges of all configurations, and each of its events is handed to the
+    strategies of every configuration that tests the ticker on that date. Results, result cache entries, checkpoints,
+    traces and exports are kept per configuration, just as for separate runs.
+    Configurations share a load if they read from the same data source, and pushed down delta windows ("pushdown":
+    "all") only if they push down the same filter; others get a load of their own. Results are cached and checkpointed
+    under the filter of the shared load, since a wider DTE window can change results (see get_key_extra).
+    :param configs: list of json dictionaries of test parameters, none of them searches or walk-forward runs
+    :param data_source: DataSource to read option data from; by default one is set up per "datasource" entry
+    :return: list of (summary_by_ticker, nav_histories) pairs, one per configuration, as BackTestEngine.run() returns
+             and leaves in its nav_histories
+    """
+    engines = [BackTestEngine(params, data_source) for params in configs]
+    summaries = [{} for _ in engines]
+    run_filters = [engine.get_run_filter() for engine in engines]
+    groups = OrderedDict()
+    for k, engine in enumerate(engines):
+        engine.nav_histories = {}
+        source_key = json.dumps(engine.test_params.get("datasource", None), sort_keys=True)
+        filter_key = str(run_filters[k]) if engine.pushdown == "all" else None
+        groups.setdefault((source_key, filter_key), []).append(k)
+
+    # Every configuration is planned with the filter its events are actually loaded with
+    plans = [None for _ in engines]
+    shared_filters = {}
+    for key, members in groups.items():
+        shared_filters[key] = get_shared_filter([engines[k] for k in members], [run_filters[k] for k in members])
+        for k in members:
+            plans[k] = engines[k].plan(shared_filters[key])
+
+    outputs = [None for _ in engines]
+    try:
+        for k, engine in enumerate(engines):
+            outputs[k] = engine.open_outputs(plans[k][1])
+
+        for key, members in groups.items():
+            # Load every ticker once, from the earliest date any member needs it to the latest end date
+            fromdates = OrderedDict()
+            for k in members:
+                for ticker, fromdate in plans[k][1]:
+                    fromdates[ticker] = min(fromdate, fromdates.get(ticker, fromdate))
+            if len(fromdates) == 0:
+                continue
+            todates = [engines[k].end_date for k in members]
+            todate = None if None in todates else max(todates)
+            data_filter = shared_filters[key]
+            logger.info("Loading {} for {} configurations at once; data filter {}".format(
+                ", ".join(fromdates), len(members), data_filter))
+
+            first = engines[members[0]]
+            event_stream = prefetch_events(source=first.data_source, tickers=list(fromdates.items()), todate=todate,
+                                           data_filter=data_filter, depth=first.prefetch_depth,
+                                           mode=first.prefetch_mode)
+            for ticker in fromdates:
+                participants = []
+                for k in members:
+                    if ticker not in set(t for t, _ in plans[k][1]):
+                        continue
+                    plan = next(p for p in plans[k][0] if p[0] == ticker)
+                    trace, export, metrics = outputs[k]
+                    participants.append((k, plan, engines[k].begin_ticker(plan, True, trace, export, metrics)))
+
+                for _, event in event_stream:
+                    if event is None:
+                        # Out of events for this ticker
+                        break
+                    for k, plan, state in participants:
+                        engine = engines[k]
+                        if event.quotedate < plan[6] or (engine.end_date is not None and
+                                                         event.quotedate >= engine.end_date):
+                            continue
+                        engine.step_ticker(plan, state, event, *outputs[k])
+
+                for k, plan, state in participants:
+                    engines[k].end_ticker(plan, state, outputs[k][1], summaries[k])
+
+        for k, engine in enumerate(engines):
+            # Tickers with nothing left to simulate, then back into the ticker order of the configuration
+            for plan in plans[k][0]:
+                if plan[0] not in summaries[k]:
+                    engine.end_ticker(plan, engine.begin_ticker(plan, False, *outputs[k]), outputs[k][1],
+                                      summaries[k])
+            summaries[k] = OrderedDict((ticker, summaries[k][ticker]) for ticker in engine.ticker)
+            engine.nav_histories = OrderedDict((ticker, engine.nav_histories[ticker]) for ticker in engine.ticker)
+            if engine.retain is not None:
+                engine.fill_top_histories(plans[k][0], outputs[k][1])
+    finally:
+        for k, engine in enumerate(engines):
+            if outputs[k] is not None:
+                engine.close_outputs(*outputs[k])
+
+    for k, engine in enumerate(engines):
+        engine.compare_resampled(summaries[k])
+    return [(summaries[k], engine.nav_histories) for k, engine in enumerate(engines)]
@@ -0,0 +1,127 @@
+"""
+Describes which slice of the option data a strategy can make use of, so that it can be pushed down into the data query
+"""
+
+# Extra days to expiry loaded on top of the preferred DTE: the closest expiry to the preferred DTE can lie further out
+# than the preferred DTE itself, especially for monthly-only tickers and far out LEAPS
+MIN_DTE_MARGIN = 45
+DTE_MARGIN_RATIO = 0.5
+
+# Extra (absolute) delta loaded around the preferred deltas, to make sure the closest strike is always loaded
+DELTA_MARGIN = 0.1
+
+
+class DataFilter:
+    """
+    A window of days to expiry (DaysToExp) and absolute delta (abs(GreekDelta)) values.
+    Any bound can be None, meaning the window is unbounded on that side.
+    Data sources keep the first expiry beyond max_dte of every day as well, so the expiry closest to a DTE inside the
+    window is always loaded, even on days without any expiry inside the window (see is_first_expiry_beyond).
+    """
+    def __init__(self, min_dte=None, max_dte=None, min_delta=None, max_delta=None):
+        """
+        :param min_dte: smallest number of days to expiry needed (int, inclusive)
+        :param max_dte: largest number of days to expiry needed (int, inclusive)
+        :param min_delta: smallest absolute delta needed (float between 0 and 1, inclusive)
+        :param max_delta: largest absolute delta needed (float between 0 and 1, inclusive)
+        """
+        self.min_dte = min_dte
+        self.max_dte = max_dte
+        self.min_delta = min_delta
+        self.max_delta = max_delta
+
+    def __str__(self):
+        return "DTE [{}, {}] Delta [{}, {}]".format(self.min_dte, self.max_dte, self.min_delta, self.max_delta)
+
+    @staticmethod
+    def around(dtes, deltas=None):
+        """
+        Build the filter for a strategy that selects options by DTE (and optionally delta), then holds them.
+        Held contracts age all the way down to expiry, so the DTE window always starts at 0.
+        :param dtes: list of preferred DTE values the strategy selects options with
+        :param deltas: list of preferred delta values the strategy selects options with (sign is ignored);
+                       None if the strategy needs options of any delta
+        :return: a DataFilter
+        """
+        max_dte = max(dtes)
+        max_dte = int(max_dte + max(MIN_DTE_MARGIN, max_dte * DTE_MARGIN_RATIO))
+
+        min_delta, max_delta = None, None
+        if deltas is not None:
+            abs_deltas = [abs(d) for d in deltas]
+            min_delta = max(0.0, min(abs_deltas) - DELTA_MARGIN)
+            max_delta = min(1.0, max(abs_deltas) + DELTA_MARGIN)
+
+        return DataFilter(min_dte=0, max_dte=max_dte, min_delta=min_delta, max_delta=max_delta)
+
+    def merge(self, other):
+        """
+        :param other: another DataFilter
+        :return: the smallest DataFilter that covers both this and the other window
+        """
+        def lower(a, b):
+            return None if a is None or b is None else min(a, b)
+
+        def upper(a, b):
+            return None if a is None or b is None else max(a, b)
+
+        return DataFilter(min_dte=lower(self.min_dte, other.min_dte), max_dte=upper(self.max_dte, other.max_dte),
+                          min_delta=lower(self.min_delta, other.min_delta),
+                          max_delta=upper(self.max_delta, other.max_delta))
+
+    def without_delta(self):
+        """
+        :return: a copy of this DataFilter with the delta window removed
+        """
+        return DataFilter(min_dte=self.min_dte, max_dte=self.max_dte)
+
+    def is_unbounded(self):
+        """
+        :return: True if the filter does not restrict the data in any way
+        """
+        return self.min_dte is None and self.max_dte is None and self.min_delta is None and self.max_delta is None
+
+    def matches_dte(self, dte):
+        """
+        :param dte: days to expiry of an option
+        :return: True if the days to expiry fall inside the window
+        """
+        if self.min_dte is not None and dte < self.min_dte:
+            return False
+        if self.max_dte is not None and dte > self.max_dte:
+            return False
+        return True
+
+    def is_first_expiry_beyond(self, dte, dtes):
+        """
+        :param dte: days to expiry of an option
+        :param dtes: days to expiry of all expiries of the day
+        :return: True if dte is that of the first expiry after the DTE window, kept on top of the window
+        """
+        if self.max_dte is None or dte <= self.max_dte:
+            return False
+        return dte == min(d for d in dtes if d > self.max_dte)
+
+    def has_delta_window(self):
+        """
+        :return: True if the filter restricts the delta of the options
+        """
+        return self.min_delta is not None or self.max_delta is not None
+
+
+def merge_data_filters(filters):
+    """
+    Merge the data needs of all strategies in a sweep into one filter
+    :param filters: list of DataFilters; None entries (strategies that use no option data) are skipped
+    :return: a DataFilter covering all of them
+    """
+    merged = None
+    for f in filters:
+        if f is None:
+            continue
+        merged = f if merged is None else merged.merge(f)
+
+    if merged is None:
+        # Only the underlying price is needed, which is derived from the option rows; load everything
+        merged = DataFilter()
+    return merged
@@ -21,6 +21,8 @@ class Event:
         self.quotedate = quotedate
         self.price = price
         self.option_chains = option_chains
+        # Underlying prices by ticker, as for a MultiEvent
+        self.prices = {ticker: price}
 
     def find_expiry(self, preferred_dte=2, allow0dte=False):
         """
@@ -51,6 +53,8 @@ class Event:
         """
         # Find an expiration with preferred DTE
         best_expiry = self.find_expiry(preferred_dte=preferred_dte, allow0dte=allow0dte)
+        if best_expiry is None:
+            return None
 
         # Find an option with closest matching credit
         opchain = self.option_chains.get_option_chain_by_expiry(best_expiry)
@@ -73,6 +77,8 @@ class Event:
         """
         # Find an expiration with preferred DTE
         best_expiry = self.find_expiry(preferred_dte=preferred_dte, allow0dte=allow0dte)
+        if best_expiry is None:
+            return None
 
         # Find an option with closest matching delta
         opchain = self.option_chains.get_option_chain_by_expiry(best_expiry)
@@ -97,4 +103,103 @@ class Event:
         """
         :return: list of option expirations
         """
-        return self.option_chains.get_expiries()
\ No newline at end of file
+        return self.option_chains.get_expiries()
+
+    def get_tickers(self):
+        """
+        :return: list of the underlyings with data in this event
+        """
+        return [self.ticker]
+
+    def get_basket(self):
+        """
+        :return: list of all underlyings traded out of the portfolio, whether quoted in this event or not
+        """
+        return [self.ticker]
+
+    def get_event(self, ticker):
+        """
+        :return: the Event of an underlying, or None if the event has no data of it
+        """
+        return self if ticker == self.ticker else None
+
+    def get_events(self):
+        """
+        :return: list of the single ticker Events this event is made of
+        """
+        return [self]
+
+
+class MultiEvent:
+    """
+    The Events of several underlyings quoted on the same date, for strategies trading a basket of tickers out of a
+    single portfolio. Underlyings without a quote on the date are left out. Option chains of every ticker are only
+    decoded once a strategy looks them up (see OptionChainSet).
+    """
+    def __init__(self, ticker, quotedate, events, basket):
+        """
+        :param ticker: name of the basket ("SPY+QQQ")
+        :param quotedate: date string (YYYY-MM-DD) when the quotes were taken
+        :param events: list of the Events of the underlyings quoted on that date
+        :param basket: list of all tickers of the basket
+        """
+        self.ticker = ticker
+        self.basket = basket
+        self.quotedate = quotedate
+        self.events = {event.ticker: event for event in events}
+        self.prices = {event.ticker: event.price for event in events}
+        # There is no single underlying price; price bounds of WakeUps do not apply to baskets
+        self.price = None
+
+    def get_tickers(self):
+        return list(self.events)
+
+    def get_basket(self):
+        return list(self.basket)
+
+    def get_event(self, ticker):
+        return self.events.get(ticker)
+
+    def get_events(self):
+        return list(self.events.values())
+
+    def find_expiry(self, ticker, preferred_dte=2, allow0dte=False):
+        """
+        Event.find_expiry() for one underlying of the basket
+        :param ticker: ticker string of the underlying
+        :return: the expiry of the underlying closest to the required DTE, or None if none found (or not quoted)
+        """
+        event = self.events.get(ticker)
+        return event.find_expiry(preferred_dte=preferred_dte, allow0dte=allow0dte) if event is not None else None
+
+    def find_option_by_min_credit(self, ticker, type, preferred_credit, preferred_dte=2, allow0dte=False):
+        """
+        Event.find_option_by_min_credit() for one underlying of the basket
+        :param ticker: ticker string of the underlying
+        :return: the option closest to the required values, or None if none found (or not quoted)
+        """
+        event = self.events.get(ticker)
+        if event is None:
+            return None
+        return event.find_option_by_min_credit(type=type, preferred_credit=preferred_credit,
+                                               preferred_dte=preferred_dte, allow0dte=allow0dte)
+
+    def find_option_by_delta(self, ticker, type, preferred_dte=2, preferred_delta=0.5, allow0dte=False):
+        """
+        Event.find_option_by_delta() for one underlying of the basket
+        :param ticker: ticker string of the underlying
+        :return: the option closest to the required values, or None if none found (or not quoted)
+        """
+        event = self.events.get(ticker)
+        if event is None:
+            return None
+        return event.find_option_by_delta(type=type, preferred_dte=preferred_dte, preferred_delta=preferred_delta,
+                                          allow0dte=allow0dte)
+
+    def get_option_by_symbol(self, symbol):
+        """
+        :param symbol: an option symbol (structure: "SPY:2021:07:02:CALL:425")
+        :return: the option from the option chains of its underlying, or None if cannot be found
+        """
+        event = self.events.get(symbol.split(":", 1)[0])
+        return event.get_option_by_symbol(symbol) if event is not None else None
@@ -33,8 +33,9 @@ class OptionChain:
             self.puts.append((o.strike, o))
 
     def make_sorted(self):
-        self.calls.sort()
-        self.puts.sort()
+        # Sorted copies rather than sorting in place: a list being sorted looks empty to other threads
+        self.calls = sorted(self.calls)
+        self.puts = sorted(self.puts)
         self.sorted = True
 
     def get_sorted_calls(self):
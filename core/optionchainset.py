@@ -1,4 +1,12 @@
+import threading
+
+from .option import Option
 from .optionchain import OptionChain
+from utils.profiler import PROFILER
+from utils.tools import symbol_to_params
+
+# Option type codes used by the column arrays wrapped by OptionChainSet.from_arrays
+OPTION_TYPE_CODES = ("CALL", "PUT")
 
 
 class OptionChainSet:
@@ -19,10 +27,78 @@ class OptionChainSet:
         self.option_chains_by_expiry = {}
         self.symbol_to_option = {}
 
+        # Column arrays wrapped by from_arrays; their expiries are only turned into Options when first accessed
+        self.quotedate = None
+        self.columns = None
+        self.expiry_slices = {}
+        # Events are shared between threads (see CachedDataSource), so expiries are decoded one at a time
+        self.lock = threading.Lock()
+
         if option_list:
             for o in option_list:
                 self.add_option(o)
 
+    @staticmethod
+    def from_arrays(ticker, quotedate, columns, expiry_slices):
+        """
+        Wrap the column arrays (typically zero-copy memory-mapped views) of a single day of option data.
+        Nothing is decoded up front: Options of an expiry are only created when that expiry (or one of its symbols) is
+        first looked up, so creating the set is near-free.
+
+        :param ticker: ticker string of the underlying ("SPY", "QQQ", ...)
+        :param quotedate: date string (YYYY-MM-DD) when the quotes were taken
+        :param columns: dictionary mapping Option field names (symbol, strike, type, bid, ask, oi, vol, underlying,
+                        daytoexp, iv, delta, gamma, theta, vega) to arrays; symbols are bytes, types are indices into
+                        OPTION_TYPE_CODES
+        :param expiry_slices: dictionary mapping expiry date strings to (start, stop) row ranges in the arrays
+        :return: a new OptionChainSet
+        """
+        chains = OptionChainSet(ticker)
+        chains.quotedate = quotedate
+        chains.columns = columns
+        chains.expiry_slices = expiry_slices
+        return chains
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def decode_expiry(self, expiry):
+        """
+        Turn the rows of an expiry of the wrapped column arrays into Options. The chain is only published once it is
+        complete, so other threads never see it half built.
+        :param expiry: string in the form of "YYYY-MM-DD"
+        """
+        with self.lock:
+            if expiry not in self.option_chains_by_expiry:
+                self.decode_expiry_locked(expiry)
+
+    def decode_expiry_locked(self, expiry):
+        with PROFILER.timed("decode"):
+            start, stop = self.expiry_slices[expiry]
+            values = {name: column[start:stop].tolist() for name, column in self.columns.items()}
+            symbols = [s.decode() for s in values.pop("symbol")]
+            types = [OPTION_TYPE_CODES[t] for t in values.pop("type")]
+
+            names = list(values.keys())
+            options = [Option(ticker=self.ticker, expiry=expiry, symbol=symbol, type=option_type,
+                              quotedate=self.quotedate, **dict(zip(names, row)))
+                       for symbol, option_type, row in zip(symbols, types, zip(*[values[name] for name in names]))]
+
+        with PROFILER.timed("chain_build"):
+            chain = OptionChain(ticker=self.ticker, quotedate=self.quotedate)
+            for o in options:
+                if o.ticker == self.ticker:
+                    chain.add_option(o)
+                    self.symbol_to_option[o.symbol] = o
+            self.tot_options += chain.tot_options
+            self.option_chains_by_expiry[expiry] = chain
+
     def add_option(self, o):
         # Just make sure option ticker matches the option chain we are building
         if o.ticker == self.ticker:
@@ -40,6 +116,8 @@ class OptionChainSet:
         """
         :return: a list of expiry dates
         """
+        if self.columns is not None:
+            return self.expiry_slices.keys()
         return self.option_chains_by_expiry.keys()
 
     def get_option_chain_by_expiry(self, expiry):
@@ -47,6 +125,8 @@ class OptionChainSet:
         :param expiry: string in the form of "YYYY-MM-DD"
         :return: return an option chain with the given expiry, or None if expiry is not valid
         """
+        if expiry not in self.option_chains_by_expiry and expiry in self.expiry_slices:
+            self.decode_expiry(expiry)
         return self.option_chains_by_expiry.get(expiry, None)
 
     def get_option_by_symbol(self, symbol):
@@ -54,4 +134,8 @@ class OptionChainSet:
         :param symbol: an option symbol (structure: "SPY:2021:07:02:CALL:425")
         :return: the option if present, or None if cannot be found
         """
-        return self.symbol_to_option.get(symbol, None)
\ No newline at end of file
+        if self.columns is not None and symbol not in self.symbol_to_option:
+            # Make sure the expiry of the symbol is decoded
+            _, expiry, _, _ = symbol_to_params(symbol)
+            self.get_option_chain_by_expiry(expiry)
+        return self.symbol_to_option.get(symbol, None)
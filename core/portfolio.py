@@ -23,8 +23,15 @@ class Portfolio:
     - holdings_quote_date: maps symbols to the latest price quote date on record
     - holdings_last_price_info: maps symbols to the latest known price
     - net_value_history: list of (date, netvalue) pairs in chronological order (historical portfolio net asset values)
+    - holdings_version: counter of changes to holdings_qty
+    - wake_up: when the strategy wants to handle its next event (see Strategy.get_wake_up), along with the
+      holdings_version at the time it was set
+    - fills: list of (symbol, quantity, price) fills since it was last emptied; None unless fills are tracked
+    - keep_history: False to only keep the starting and the latest entry of net_value_history
+    - peak_net_value, max_drawdown, nr_returns, sum_returns, sum_sq_returns: running statistics of the net value,
+      kept whether or not the full history is
     """
-    def __init__(self, starting_cash, strategy: Strategy):
+    def __init__(self, starting_cash, strategy: Strategy, keep_history=True):
         self.cash = starting_cash
         self.strategy = strategy
         self.holdings_qty = {}
@@ -33,6 +40,18 @@ class Portfolio:
 
         # Add a sole datapoint to mark the beginning of the portfolio (and it's net value at the start)
         self.net_value_history = [("start", self.cash)]
+        self.keep_history = keep_history
+
+        self.peak_net_value = self.cash
+        self.max_drawdown = 0
+        self.nr_returns = 0
+        self.sum_returns = 0.0
+        self.sum_sq_returns = 0.0
+
+        self.holdings_version = 0
+        self.wake_up = None
+        self.wake_up_version = 0
+        self.fills = None
 
     def __str__(self):
         """
@@ -64,13 +83,39 @@ class Portfolio:
         """
         :return: calculate max drawdown throughout the history of the portfolio
         """
-        mdd = 0
-        maxnetval = self.net_value_history[0][1]
-        for (date, netval) in self.net_value_history:
-            maxnetval = max(maxnetval, netval)
-            if maxnetval != 0:
-                mdd = min(mdd, (netval - maxnetval) * 1.0 / maxnetval)
-        return mdd * 100
+        return self.max_drawdown * 100
+
+    def get_sharpe(self, periods_per_year=252):
+        """
+        :return: annualized Sharpe ratio of the daily net value changes (no risk free rate), or None if undefined
+        """
+        if self.nr_returns < 2:
+            return None
+        mean = self.sum_returns / self.nr_returns
+        variance = (self.sum_sq_returns - self.nr_returns * mean * mean) / (self.nr_returns - 1)
+        if variance <= 0:
+            return None
+        return mean / variance ** 0.5 * periods_per_year ** 0.5
+
+    def add_net_value(self, quotedate, net_value):
+        """
+        Record the net value at the end of an event, and update the running statistics
+        """
+        previous = self.net_value_history[-1][1]
+        daily_return = net_value / previous - 1 if previous != 0 else 0.0
+        self.nr_returns += 1
+        self.sum_returns += daily_return
+        self.sum_sq_returns += daily_return * daily_return
+
+        self.peak_net_value = max(self.peak_net_value, net_value)
+        if self.peak_net_value != 0:
+            self.max_drawdown = min(self.max_drawdown,
+                                    (net_value - self.peak_net_value) * 1.0 / self.peak_net_value)
+
+        if self.keep_history:
+            self.net_value_history.append((quotedate, net_value))
+        else:
+            self.net_value_history[1:] = [(quotedate, net_value)]
 
     def get_net_value(self):
         """
@@ -81,6 +126,21 @@ class Portfolio:
             net_value += self.holdings_qty[symbol] * self.holdings_last_price_info[symbol]
         return net_value
 
+    def set_wake_up(self, wake_up):
+        """
+        :param wake_up: a WakeUp condition for the strategy to handle its next event, or None for the next event
+        """
+        self.wake_up = wake_up
+        self.wake_up_version = self.holdings_version
+
+    def is_strategy_idle(self, event: Event):
+        """
+        :param event: the next Event
+        :return: True if the strategy can skip the event; its holdings did not change and its wake up did not fire
+        """
+        return self.wake_up is not None and self.wake_up_version == self.holdings_version and \
+            not self.wake_up.fires(event)
+
     def adjust_holdings(self, symbol, qty, price):
         """
         Add/Update quantity owned of different products by qty number specified
@@ -91,6 +151,9 @@ class Portfolio:
 
         cash_cost = qty * price
         self.cash -= cash_cost
+        self.holdings_version += 1
+        if self.fills is not None:
+            self.fills.append((symbol, qty, price))
 
         if symbol not in self.holdings_qty:
             # Add new entry about this holding
@@ -104,17 +167,19 @@ class Portfolio:
             self.holdings_last_price_info.pop(symbol, None)
 
     def update_data(self, event: Event):
+        prices = event.prices
         for symbol in self.holdings_qty.keys():
-            if symbol == event.ticker:
-                self.holdings_last_price_info[symbol] = event.price
+            price = prices.get(symbol)
+            if price is not None:
+                self.holdings_last_price_info[symbol] = price
                 self.holdings_quote_date[symbol] = event.quotedate
             else:
                 option = event.get_option_by_symbol(symbol)
                 if option:
                     self.holdings_last_price_info[symbol] = option.midprice()
                     self.holdings_quote_date[symbol] = option.quotedate
-        # Make sure to also update ticker price
-        self.holdings_last_price_info[event.ticker] = event.price
+        # Make sure to also update ticker prices
+        self.holdings_last_price_info.update(prices)
 
     def update_portfolio(self, order_list, event: Event):
         """
@@ -123,14 +188,19 @@ class Portfolio:
          - update info on prices on record for all portfolio holdings
          - handles expired option contracts/assignments
 
+        Events can be MultiEvents of several underlyings as well; holdings of underlyings without a quote in the
+        event keep their last price, and their options are settled on the first event quoting them after expiry.
+
         :param order_list: list of new orders to be executed
         :param event: an Event class with price data
         """
+        prices = event.prices
         # Update holdings
         for order in order_list:
-            if order.symbol == event.ticker:
+            price = prices.get(order.symbol)
+            if price is not None:
                 # It's an order for the underlying
-                self.adjust_holdings(symbol=order.symbol, qty=order.qty, price=event.price)
+                self.adjust_holdings(symbol=order.symbol, qty=order.qty, price=price)
             else:
                 # It's an option contract
                 option = event.get_option_by_symbol(order.symbol)
@@ -138,7 +208,7 @@ class Portfolio:
                     # Only execute if not None
                     self.adjust_holdings(symbol=order.symbol, qty=order.qty, price=option.midprice())
                 else:
-                    logger.info("Could not execute order, cannot find option with symbol {}".format(order.symbol))
+                    logger.info("Could not execute order, cannot find option with symbol %s", order.symbol)
 
         # Update product quote dates/last prices
         self.update_data(event)
@@ -147,46 +217,40 @@ class Portfolio:
         symbols = list(self.holdings_qty.keys())
         for symbol in symbols:
             ticker, option_expiry, option_type, strike = symbol_to_params(symbol)
-            if option_expiry is not None:
-                if event.quotedate >= option_expiry and event.ticker == ticker:
+            if option_expiry is not None and event.quotedate >= option_expiry:
+                price = prices.get(ticker)
+                if price is not None:
                     # Option expired/expires end of day
                     if self.strategy.take_assignment():
                         # Strategy takes assignment
                         if option_type == "CALL":
-                            if strike < event.price:
+                            if strike < price:
                                 # Call is in the money
                                 # Add shares
-                                logger.debug("Call option {} took assignment (EOD stock price {})".
-                                            format(symbol, event.price))
-                                self.adjust_holdings(event.ticker, 100 * self.holdings_qty[symbol], strike)
+                                logger.debug("Call option %s took assignment (EOD stock price %s)", symbol, price)
+                                self.adjust_holdings(ticker, 100 * self.holdings_qty[symbol], strike)
                             else:
                                 # Call expires worthless
-                                logger.debug("Call option {} expires worthless (EOD stock price {})".
-                                            format(symbol, event.price))
+                                logger.debug("Call option %s expires worthless (EOD stock price %s)", symbol, price)
                                 pass
                         else:
-                            if strike > event.price:
+                            if strike > price:
                                 # Put is in the money
                                 # Add shares
-                                logger.debug("Put option {} took assignment (EOD stock price {})".
-                                            format(symbol, event.price))
-                                self.adjust_holdings(event.ticker, -100 * self.holdings_qty[symbol], strike)
+                                logger.debug("Put option %s took assignment (EOD stock price %s)", symbol, price)
+                                self.adjust_holdings(ticker, -100 * self.holdings_qty[symbol], strike)
                             else:
                                 # Put expires worthless
-                                logger.debug("Put option {} expires worthless (EOD stock price {})".
-                                            format(symbol, event.price))
+                                logger.debug("Put option %s expires worthless (EOD stock price %s)", symbol, price)
                                 pass
 
                         # Remove options from holdings
                         self.adjust_holdings(symbol, -self.holdings_qty[symbol], 0)
                     else:
                         # Strategy closes positions before expiry
-                        logger.debug("Option {} closed out at price of {} (EOD stock price {})".
-                                    format(symbol, self.holdings_last_price_info[symbol], event.price))
+                        logger.debug("Option %s closed out at price of %s (EOD stock price %s)", symbol,
+                                     self.holdings_last_price_info[symbol], price)
                         self.adjust_holdings(symbol, -self.holdings_qty[symbol], self.holdings_last_price_info[symbol])
 
         # Update historical net value
-        self.net_value_history.append((event.quotedate, self.get_net_value()))
-
-
-
+        self.add_net_value(event.quotedate, self.get_net_value())
@@ -0,0 +1,219 @@
+"""
+Adaptive search of strategy parameters: instead of testing a full grid, new parameter sets are proposed based on the
+results so far (evolutionary search), and evaluated in parallel batches against option data loaded only once
+"""
+import logging
+import multiprocessing
+import random
+import time
+
+from core.backtest_engine import BackTestEngine, get_nav_histories, load_events, make_pool, simulate, \
+    strategy_from_params, summarize
+from utils.permutations import get_param_axes, iter_corner_permutations, lhs_indices, make_permutation
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ("performance", "maxdrawdown", "calmar")
+
+
+def score(results, objective):
+    """
+    :param results: list of results (see get_result) of a strategy, one per ticker
+    :param objective: one of OBJECTIVES
+    :return: average objective value over all tickers; higher is better
+    """
+    values = []
+    for result in results:
+        if objective == "maxdrawdown":
+            values.append(result["max_drawdown"])
+        elif objective == "calmar":
+            values.append(result["performance"] / max(abs(result["max_drawdown"]), 1.0))
+        else:
+            values.append(result["performance"])
+    return sum(values) / len(values)
+
+
+class ParameterSearch:
+    """
+    Evolutionary search over the array-style parameters of the strategies of a backtest file.
+    Every array-style parameter spans one axis of the search space, and new candidates are bred from the best
+    candidates so far by crossing over and nudging parameters to neighbouring values on their axis.
+    """
+
+    def __init__(self, test_params, data_source=None):
+        """
+        :param test_params: a json dictionary of test parameters, with an extra "search" entry (see Readme)
+        :param data_source: DataSource to read option data from; by default one is set up from test_params
+        """
+        # Dates, tickers, data source and result cache are set up just as for a regular backtest
+        self.engine = BackTestEngine(test_params, data_source)
+
+        search = test_params.get("search", {})
+        if type(search) != dict:
+            search = {}
+        # Stop after evaluating this many candidates, or after this many seconds (checked between batches)
+        self.budget = search.get("budget", 100)
+        self.time_limit = search.get("time", None)
+        # Candidates evaluated in parallel per batch, and number of worker processes evaluating them
+        self.workers = search.get("workers", multiprocessing.cpu_count())
+        self.batch = search.get("batch", max(self.workers, 4))
+        # Number of best candidates bred from, and chance of proposing a random candidate instead
+        self.elite = search.get("elite", max(2, self.batch // 2))
+        self.explore = search.get("explore", 0.2)
+        self.objective = search.get("objective", "performance")
+        if self.objective not in OBJECTIVES:
+            logger.info("Unknown search objective {}. Using default value of 'performance'".format(self.objective))
+            self.objective = "performance"
+        self.rng = random.Random(search.get("seed", 0))
+
+        if "strategy" in test_params:
+            specs = [test_params]
+        else:
+            specs = test_params.get("strategies", [])
+        self.spaces = [(spec, get_param_axes(spec)) for spec in specs]
+
+        # Evaluated candidates: {(space index, value indices): (score, params, results per ticker)}
+        self.evaluated = {}
+
+    def random_candidate(self):
+        i = self.rng.randrange(len(self.spaces))
+        return i, tuple(self.rng.randrange(len(values)) for _, values in self.spaces[i][1])
+
+    def initial_candidates(self):
+        """
+        :return: list of candidates spread evenly over every search space (Latin hypercube sample)
+        """
+        n = max(1, self.batch // len(self.spaces))
+        candidates = []
+        for i, (_, axes) in enumerate(self.spaces):
+            points = lhs_indices(axes, n, self.rng) if len(axes) > 0 else [()]
+            candidates.extend((i, point) for point in points)
+        return candidates
+
+    def mutate(self, candidate):
+        """
+        :return: the candidate with at least one parameter moved to a nearby value on its axis
+        """
+        i, point = candidate
+        axes = self.spaces[i][1]
+        if len(axes) == 0:
+            return candidate
+
+        point = list(point)
+        forced = self.rng.randrange(len(axes))
+        for a, (_, values) in enumerate(axes):
+            if a == forced or self.rng.random() < 1.0 / len(axes):
+                point[a] = min(len(values) - 1, max(0, point[a] + self.rng.choice([-2, -1, 1, 2])))
+        return i, tuple(point)
+
+    def propose(self, n):
+        """
+        :param n: number of candidates to propose
+        :return: list of at most n candidates not evaluated before; empty if the search space is exhausted
+        """
+        ranked = sorted(self.evaluated.items(), key=lambda item: item[1][0], reverse=True)
+        elite = [candidate for candidate, _ in ranked[:self.elite]]
+
+        proposals = []
+        tries = 0
+        while len(proposals) < n and tries < 100 * n:
+            tries += 1
+            if len(elite) == 0 or self.rng.random() < self.explore:
+                child = self.random_candidate()
+            else:
+                # Uniform crossover of two elite candidates of the same strategy, then mutation
+                parent = self.rng.choice(elite)
+                mate = self.rng.choice([c for c in elite if c[0] == parent[0]])
+                point = tuple(a if self.rng.random() < 0.5 else b for a, b in zip(parent[1], mate[1]))
+                child = self.mutate((parent[0], point))
+            if child not in self.evaluated and child not in proposals:
+                proposals.append(child)
+        return proposals
+
+    def evaluate(self, candidates, data_filter, pool):
+        """
+        Evaluate a batch of candidates; results are taken from the result cache where possible
+        :param candidates: list of candidates
+        :param data_filter: the DataFilter the events were loaded with
+        :param pool: multiprocessing pool to simulate in, or None to simulate in this process
+        """
+        params_list = [make_permutation(self.spaces[i][0], self.spaces[i][1], point) for i, point in candidates]
+        tickers = self.engine.ticker
+        results = [[None for _ in tickers] for _ in candidates]
+
+        cache_keys = {}
+        for t, ticker in enumerate(tickers):
+            keys = self.engine.get_cache_keys(ticker, [strategy_from_params(p) for p in params_list], data_filter)
+            if keys is not None:
+                cache_keys[ticker] = keys
+                for c, key in enumerate(keys):
+                    results[c][t] = self.engine.result_cache.get(key)
+
+        # Simulate every candidate on the tickers without cached results
+        tasks = [(c, [t for t in range(len(tickers)) if results[c][t] is None]) for c in range(len(candidates))]
+        tasks = [(c, missing) for c, missing in tasks if len(missing) > 0]
+        args = [(params_list[c], self.engine.startcash, [tickers[t] for t in missing], None, None,
+                 self.engine.resample) for c, missing in tasks]
+        simulated = pool.starmap(simulate, args) if pool is not None else [simulate(*a) for a in args]
+
+        for (c, missing), ticker_results in zip(tasks, simulated):
+            for t, result in zip(missing, ticker_results):
+                results[c][t] = result
+                if tickers[t] in cache_keys:
+                    self.engine.result_cache.put(cache_keys[tickers[t]][c], result)
+
+        for candidate, params, candidate_results in zip(candidates, params_list, results):
+            self.evaluated[candidate] = (score(candidate_results, self.objective), params, candidate_results)
+
+    def run(self):
+        """
+        Run the search until the evaluation or time budget is spent, or the search space is exhausted
+        :return: final summary result dictionary of all evaluated candidates, in the same format as BackTestEngine.run
+        """
+        engine = self.engine
+        started = time.time()
+
+        # Load the events once, covering the data needs of the whole search space
+        corner_strategies = [strategy_from_params(p) for spec, _ in self.spaces for p in iter_corner_permutations(spec)]
+        data_filter = engine.get_data_filter(corner_strategies)
+        logger.info("Data filter pushed down into the query: {}".format(data_filter))
+        load_events(engine.data_source, engine.ticker, engine.start_date, engine.end_date, data_filter)
+        pool = make_pool(self.workers)
+
+        try:
+            candidates = self.initial_candidates()[:self.budget]
+            while len(candidates) > 0:
+                self.evaluate(candidates, data_filter, pool)
+                best_score, best_params, _ = max(self.evaluated.values(), key=lambda v: v[0])
+                logger.info("Evaluated {} candidates in {:.1f}s; best {} {:.2f}: {}".format(
+                    len(self.evaluated), time.time() - started, self.objective, best_score,
+                    strategy_from_params(best_params).get_unique_id()))
+
+                if len(self.evaluated) >= self.budget:
+                    logger.info("Evaluation budget of {} spent".format(self.budget))
+                    break
+                if self.time_limit is not None and time.time() - started >= self.time_limit:
+                    logger.info("Time budget of {}s spent".format(self.time_limit))
+                    break
+                candidates = self.propose(min(self.batch, self.budget - len(self.evaluated)))
+                if len(candidates) == 0:
+                    logger.info("Search space exhausted")
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        ranked = sorted(self.evaluated.values(), key=lambda v: v[0], reverse=True)
+        logger.info("Best candidates by {}".format(self.objective))
+        for value, params, _ in ranked[:10]:
+            logger.info("{:.2f} {}".format(value, strategy_from_params(params).get_unique_id()))
+
+        # Summary per ticker, as for a regular backtest, so that the usual analysis can be run on it
+        summary_by_ticker = {}
+        engine.nav_histories = {}
+        for t, ticker in enumerate(engine.ticker):
+            strategy_list = [strategy_from_params(params) for _, params, _ in ranked]
+            ticker_results = [results[t] for _, _, results in ranked]
+            summary_by_ticker[ticker] = summarize(strategy_list, ticker_results)
+            engine.nav_histories[ticker] = get_nav_histories(strategy_list, ticker_results)
+        return summary_by_ticker
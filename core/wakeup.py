@@ -0,0 +1,52 @@
+from utils.tools import symbol_to_params
+
+
+class WakeUp:
+    """
+    Condition for the next event a strategy wants to handle; until then, the engine skips the strategy and its
+    portfolio is only marked to market. Any bound can be None, meaning it is not part of the condition.
+    Regardless of the condition, a strategy is always woken up when its holdings change without it placing orders
+    (options expiring, being assigned or closed out).
+    """
+    def __init__(self, date=None, price_below=None, price_above=None):
+        """
+        :param date: wake up on the first event on or after this date string ("YYYY-MM-DD")
+        :param price_below: wake up on events where the underlying trades below this price (single ticker events only)
+        :param price_above: wake up on events where the underlying trades above this price (single ticker events only)
+        """
+        self.date = date
+        self.price_below = price_below
+        self.price_above = price_above
+
+    def __str__(self):
+        return "WakeUp(Date:{};Below:{};Above:{})".format(self.date, self.price_below, self.price_above)
+
+    @staticmethod
+    def at_expiry(open_positions, option_type=None):
+        """
+        :param open_positions: a list of (symbol, quantity) pairs, representing current portfolio holdings
+        :param option_type: only consider held "CALL" or "PUT" contracts; None for both
+        :return: a WakeUp for the expiry date of the first held contract to expire
+        """
+        expiries = []
+        for symbol, _ in open_positions:
+            _, option_expiry, held_type, _ = symbol_to_params(symbol)
+            if option_expiry is not None and (option_type is None or held_type == option_type):
+                expiries.append(option_expiry)
+        return WakeUp(date=min(expiries) if len(expiries) > 0 else None)
+
+    def fires(self, event):
+        """
+        :param event: the next Event
+        :return: True if the strategy should handle the event
+        """
+        if self.date is not None and event.quotedate >= self.date:
+            return True
+        if event.price is None:
+            # Baskets (see MultiEvent) have no single underlying price
+            return False
+        if self.price_below is not None and event.price < self.price_below:
+            return True
+        if self.price_above is not None and event.price > self.price_above:
+            return True
+        return False
@@ -0,0 +1,407 @@
+"""
+A purpose-built binary store for option chains, read through memory maps.
+
+Layout, one folder per ticker (<root>/<ticker>/), in the "plain" encoding:
+- one fixed-width .npy file per column (see COLUMNS), rows sorted by (QuoteDate, expiry, type, strike)
+- expiries.npy: index mapping every (QuoteDate, expiry) pair to its [start, stop) row range
+- days.npy: one entry per QuoteDate with the price of the underlying and its [first, last) range of expiries.npy entries
+
+The "delta" encoding stores every contract only once and each day against stable integer contract ids:
+- contracts.npy: per-ticker contract dictionary (symbol, expiry, type, strike); the contract id is the index
+- one .npy file per quote/greek column (see DELTA_COLUMNS), rows of a day sorted by contract id
+- added.npy/removed.npy: contract ids listed/expired per day, relative to the previous day
+- keyframes.npy: the full list of contract ids every KEYFRAME_INTERVAL days, so any day can be decoded quickly
+- days.npy: per QuoteDate the price of the underlying and the ranges into all of the above
+It takes roughly 40% less disk space (and load bandwidth) than the plain encoding, at the cost of reordering each day's
+rows on load instead of wrapping zero-copy views.
+
+All files are opened as numpy memory maps, so worker processes reading the same store share the OS page cache.
+"""
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from core.event import Event
+from core.optionchainset import OptionChainSet, OPTION_TYPE_CODES
+from datasource.datasource import DataSource, OPTION_COLUMNS, files_fingerprint
+from utils.profiler import PROFILER
+
+logger = logging.getLogger(__name__)
+
+# (Option field name, option table column, numpy dtype); the symbol width is set by the longest symbol
+COLUMNS = [("symbol", "OptionSymbol", None), ("type", "OptType", "i1"), ("strike", "OptStrike", "f8"),
+           ("bid", "OptBid", "f8"), ("ask", "OptAsk", "f8"), ("oi", "OptOpenInterest", "i8"),
+           ("vol", "OptVolume", "i8"), ("underlying", "StockPrice", "f8"), ("daytoexp", "DaysToExp", "i4"),
+           ("iv", "GreekIV", "f8"), ("delta", "GreekDelta", "f8"), ("gamma", "GreekGamma", "f8"),
+           ("theta", "GreekTheta", "f8"), ("vega", "GreekVega", "f8")]
+
+# Per-row columns of the delta encoding; contract and underlying data is stored once per contract/day instead
+DELTA_COLUMNS = [("bid", "OptBid", "f8"), ("ask", "OptAsk", "f8"), ("oi", "OptOpenInterest", "i4"),
+                 ("vol", "OptVolume", "i4"), ("daytoexp", "DaysToExp", "i2"), ("iv", "GreekIV", "f8"),
+                 ("delta", "GreekDelta", "f8"), ("gamma", "GreekGamma", "f8"), ("theta", "GreekTheta", "f8"),
+                 ("vega", "GreekVega", "f8")]
+
+ENCODINGS = ("plain", "delta")
+KEYFRAME_INTERVAL = 20
+
+EXPIRY_INDEX_DTYPE = [("quotedate", "S10"), ("expiry", "S10"), ("start", "i8"), ("stop", "i8")]
+DAY_INDEX_DTYPE = [("quotedate", "S10"), ("price", "f8"), ("first", "i8"), ("last", "i8")]
+DELTA_DAY_INDEX_DTYPE = [("quotedate", "S10"), ("price", "f8"), ("start", "i8"), ("stop", "i8"),
+                         ("added_start", "i8"), ("added_stop", "i8"), ("removed_start", "i8"),
+                         ("removed_stop", "i8"), ("keyframe_start", "i8"), ("keyframe_stop", "i8")]
+
+
+def group_bounds(keys):
+    """
+    :param keys: numpy array of (sorted) group keys
+    :return: (starts, stops) arrays with the [start, stop) ranges of consecutive equal keys
+    """
+    change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    return np.concatenate([[0], change]), np.concatenate([change, [len(keys)]])
+
+
+def encode_strings(series, dtype="S"):
+    return series.astype(str).str.encode("ascii").values.astype(dtype)
+
+
+def write_plain(ticker_dir, data):
+    for field, column, dtype in COLUMNS:
+        if field == "symbol":
+            values = encode_strings(data[column])
+        elif field == "type":
+            values = (data[column].values == OPTION_TYPE_CODES[1]).astype(dtype)
+        else:
+            values = data[column].values.astype(dtype)
+        np.save(os.path.join(ticker_dir, field + ".npy"), values)
+
+    quotedates = encode_strings(data.QuoteDate, "S10")
+    expiries = encode_strings(data.OptExpDate, "S10")
+    expiry_index = np.zeros(0, dtype=EXPIRY_INDEX_DTYPE)
+    day_index = np.zeros(0, dtype=DAY_INDEX_DTYPE)
+    if len(data) > 0:
+        starts, stops = group_bounds(np.char.add(quotedates, expiries))
+        expiry_index = np.zeros(len(starts), dtype=EXPIRY_INDEX_DTYPE)
+        expiry_index["quotedate"] = quotedates[starts]
+        expiry_index["expiry"] = expiries[starts]
+        expiry_index["start"] = starts
+        expiry_index["stop"] = stops
+
+        firsts, lasts = group_bounds(expiry_index["quotedate"])
+        day_index = np.zeros(len(firsts), dtype=DAY_INDEX_DTYPE)
+        day_index["quotedate"] = expiry_index["quotedate"][firsts]
+        day_index["price"] = data.StockPrice.values[expiry_index["start"][firsts]]
+        day_index["first"] = firsts
+        day_index["last"] = lasts
+    np.save(os.path.join(ticker_dir, "expiries.npy"), expiry_index)
+    np.save(os.path.join(ticker_dir, "days.npy"), day_index)
+
+
+def write_delta(ticker_dir, data):
+    data = data.drop_duplicates(subset=["QuoteDate", "OptionSymbol"], keep="last")
+
+    # Contract ids are handed out in order of first appearance
+    cids, _ = pd.factorize(data.OptionSymbol)
+    contract_rows = data.drop_duplicates(subset=["OptionSymbol"])
+    symbols = encode_strings(contract_rows.OptionSymbol)
+    contracts = np.zeros(len(contract_rows), dtype=[("symbol", symbols.dtype), ("expiry", "S10"), ("type", "i1"),
+                                                    ("strike", "f8")])
+    contracts["symbol"] = symbols
+    contracts["expiry"] = encode_strings(contract_rows.OptExpDate, "S10")
+    contracts["type"] = contract_rows.OptType.values == OPTION_TYPE_CODES[1]
+    contracts["strike"] = contract_rows.OptStrike.values
+    np.save(os.path.join(ticker_dir, "contracts.npy"), contracts)
+
+    data = data.assign(cid=cids.astype("i4")).sort_values(["QuoteDate", "cid"], kind="mergesort")
+    for field, column, dtype in DELTA_COLUMNS:
+        np.save(os.path.join(ticker_dir, field + ".npy"), data[column].values.astype(dtype))
+
+    quotedates = encode_strings(data.QuoteDate, "S10")
+    row_cids = data.cid.values
+    day_index = np.zeros(0, dtype=DELTA_DAY_INDEX_DTYPE)
+    added, removed, keyframes = [], [], []
+    if len(data) > 0:
+        starts, stops = group_bounds(quotedates)
+        day_index = np.zeros(len(starts), dtype=DELTA_DAY_INDEX_DTYPE)
+        day_index["quotedate"] = quotedates[starts]
+        day_index["price"] = data.StockPrice.values[starts]
+        day_index["start"] = starts
+        day_index["stop"] = stops
+
+        n_added, n_removed, n_keyframes = 0, 0, 0
+        previous = np.zeros(0, dtype="i4")
+        for day, (start, stop) in enumerate(zip(starts, stops)):
+            current = row_cids[start:stop]
+            new, gone = np.setdiff1d(current, previous), np.setdiff1d(previous, current)
+            added.append(new)
+            removed.append(gone)
+            day_index["added_start"][day], day_index["added_stop"][day] = n_added, n_added + len(new)
+            day_index["removed_start"][day], day_index["removed_stop"][day] = n_removed, n_removed + len(gone)
+            n_added += len(new)
+            n_removed += len(gone)
+
+            day_index["keyframe_start"][day], day_index["keyframe_stop"][day] = -1, -1
+            if day % KEYFRAME_INTERVAL == 0:
+                keyframes.append(current)
+                day_index["keyframe_start"][day] = n_keyframes
+                day_index["keyframe_stop"][day] = n_keyframes + len(current)
+                n_keyframes += len(current)
+            previous = current
+
+    for name, arrays in [("added", added), ("removed", removed), ("keyframes", keyframes)]:
+        values = np.concatenate(arrays).astype("i4") if arrays else np.zeros(0, dtype="i4")
+        np.save(os.path.join(ticker_dir, name + ".npy"), values)
+    np.save(os.path.join(ticker_dir, "days.npy"), day_index)
+
+
+def write_binary_store(root, ticker, data, encoding="plain"):
+    """
+    (Re)write the binary store of a ticker. The store is written next to its final location and moved into place.
+    :param root: root folder of the store
+    :param ticker: string of the ticker ("SPY", "QQQ", ...)
+    :param data: pandas DataFrame with the option table columns, holding the full history of the ticker
+    :param encoding: "plain" or "delta" (see module description)
+    :return: number of rows written
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError("Unknown binary store encoding {}".format(encoding))
+
+    # Same rule as the data loader: zero bid and ask is considered invalid
+    data = data[(data.OptBid != 0) | (data.OptAsk != 0)]
+    data = data.sort_values(["QuoteDate", "OptExpDate", "OptType", "OptStrike"], kind="mergesort")
+    data = data.reset_index(drop=True)
+
+    ticker_dir = os.path.join(root, ticker)
+    tmp_dir = ticker_dir + ".tmp"
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    if encoding == "delta":
+        write_delta(tmp_dir, data)
+    else:
+        write_plain(tmp_dir, data)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"encoding": encoding, "keyframe_interval": KEYFRAME_INTERVAL}, f)
+
+    if os.path.isdir(ticker_dir):
+        shutil.rmtree(ticker_dir)
+    os.rename(tmp_dir, ticker_dir)
+    return len(data)
+
+
+def wrap_day(ticker, quotedate, columns, expiries, starts, stops, data_filter=None):
+    """
+    Wrap the column arrays of a day into an OptionChainSet, dropping data outside of the DataFilter windows
+    :param columns: dictionary of Option field name -> array with the rows of the day, sorted by expiry
+    :param expiries: expiry date strings of the day
+    :param starts: start row of each expiry
+    :param stops: stop row (excluded) of each expiry
+    :param data_filter: a DataFilter with DTE/delta windows to restrict the data to (optional)
+    :return: an OptionChainSet
+    """
+    expiry_slices = {}
+    daytoexp = columns.get("daytoexp")
+    dtes = [daytoexp[int(start)] for start in starts]
+    for expiry, start, stop, dte in zip(expiries, starts, stops, dtes):
+        start, stop = int(start), int(stop)
+        # Days to expiry is the same for all rows of an expiry, so the DTE window drops whole expiries
+        if data_filter is not None and not data_filter.matches_dte(dte) and \
+                not data_filter.is_first_expiry_beyond(dte, dtes):
+            continue
+        expiry_slices[expiry] = (start, stop)
+
+    if data_filter is not None and data_filter.has_delta_window():
+        # Rows outside of the delta window have to be dropped one by one; this copies the data of the day
+        abs_delta = np.abs(columns["delta"])
+        mask = np.ones(len(abs_delta), dtype=bool)
+        if data_filter.min_delta is not None:
+            mask &= abs_delta >= data_filter.min_delta
+        if data_filter.max_delta is not None:
+            mask &= abs_delta <= data_filter.max_delta
+        kept = np.concatenate([[0], np.cumsum(mask)])
+        columns = {field: column[mask] for field, column in columns.items()}
+        expiry_slices = {expiry: (int(kept[s]), int(kept[t])) for expiry, (s, t) in expiry_slices.items()}
+
+    return OptionChainSet.from_arrays(ticker, quotedate, columns, expiry_slices)
+
+
+class BinaryStore:
+    """
+    The memory-mapped binary store of a single ticker, in the plain encoding (see module description)
+    """
+    def __init__(self, ticker_dir, ticker):
+        self.ticker = ticker
+        self.columns = {field: np.load(os.path.join(ticker_dir, field + ".npy"), mmap_mode="r")
+                        for field, _, _ in COLUMNS}
+        self.expiries = np.load(os.path.join(ticker_dir, "expiries.npy"), mmap_mode="r")
+        self.days = np.load(os.path.join(ticker_dir, "days.npy"), mmap_mode="r")
+
+    def day_range(self, fromdate, todate=None):
+        """
+        :return: [first, last) range of days.npy entries within fromdate (included) and todate (NOT included)
+        """
+        quotedates = self.days["quotedate"]
+        first = int(np.searchsorted(quotedates, fromdate.encode("ascii"), side="left"))
+        last = len(quotedates)
+        if todate:
+            last = int(np.searchsorted(quotedates, todate.encode("ascii"), side="left"))
+        return first, last
+
+    def day_price(self, day):
+        return float(self.days["price"][day])
+
+    def day_chains(self, day, data_filter=None):
+        """
+        :param day: index of a days.npy entry
+        :param data_filter: a DataFilter with DTE/delta windows to restrict the data to (optional)
+        :return: OptionChainSet wrapping the rows of that day
+        """
+        quotedate = self.days["quotedate"][day].decode("ascii")
+        entries = self.expiries[self.days["first"][day]:self.days["last"][day]]
+        if len(entries) == 0:
+            return OptionChainSet.from_arrays(self.ticker, quotedate, {}, {})
+        start, stop = int(entries["start"][0]), int(entries["stop"][-1])
+
+        # Zero-copy views of the rows of the day
+        columns = {field: column[start:stop] for field, column in self.columns.items()}
+        expiries = [expiry.decode("ascii") for expiry in entries["expiry"]]
+        return wrap_day(self.ticker, quotedate, columns, expiries, entries["start"] - start, entries["stop"] - start,
+                        data_filter)
+
+
+class DeltaBinaryStore(BinaryStore):
+    """
+    The memory-mapped binary store of a single ticker, in the delta encoding (see module description)
+    """
+    def __init__(self, ticker_dir, ticker):
+        self.ticker = ticker
+        self.columns = {field: np.load(os.path.join(ticker_dir, field + ".npy"), mmap_mode="r")
+                        for field, _, _ in DELTA_COLUMNS}
+        self.contracts = np.load(os.path.join(ticker_dir, "contracts.npy"), mmap_mode="r")
+        self.added = np.load(os.path.join(ticker_dir, "added.npy"), mmap_mode="r")
+        self.removed = np.load(os.path.join(ticker_dir, "removed.npy"), mmap_mode="r")
+        self.keyframes = np.load(os.path.join(ticker_dir, "keyframes.npy"), mmap_mode="r")
+        self.days = np.load(os.path.join(ticker_dir, "days.npy"), mmap_mode="r")
+
+        # (day, contract ids) of the last decoded day, so reading days in order only has to apply one diff per day;
+        # a single attribute, so that threads reading the store at the same time never see a mismatched pair
+        self.last = (None, None)
+
+    def day_cids(self, day):
+        """
+        :return: sorted array with the contract ids quoted on the given day
+        """
+        last_day, last_cids = self.last
+        if last_day is not None and last_day == day - 1:
+            first, cids = day, last_cids
+        else:
+            # Start from the closest keyframe at or before the day
+            first = day - day % KEYFRAME_INTERVAL
+            entry = self.days[first]
+            cids = np.asarray(self.keyframes[entry["keyframe_start"]:entry["keyframe_stop"]])
+            first += 1
+
+        for d in range(first, day + 1):
+            entry = self.days[d]
+            gone = self.removed[entry["removed_start"]:entry["removed_stop"]]
+            new = self.added[entry["added_start"]:entry["added_stop"]]
+            cids = np.union1d(np.setdiff1d(cids, gone, assume_unique=True), new)
+
+        self.last = (day, cids)
+        return cids
+
+    def day_chains(self, day, data_filter=None):
+        entry = self.days[day]
+        quotedate = entry["quotedate"].decode("ascii")
+        cids = self.day_cids(day)
+        if len(cids) == 0:
+            return OptionChainSet.from_arrays(self.ticker, quotedate, {}, {})
+
+        # Rows of a day are stored by contract id; regroup them by (expiry, type, strike)
+        contracts = self.contracts[cids]
+        order = np.lexsort((contracts["strike"], contracts["type"], contracts["expiry"]))
+        contracts = contracts[order]
+        rows = order + int(entry["start"])
+        columns = {field: column[rows] for field, column in self.columns.items()}
+        columns["symbol"] = contracts["symbol"]
+        columns["type"] = contracts["type"]
+        columns["strike"] = contracts["strike"]
+        columns["underlying"] = np.full(len(cids), entry["price"])
+
+        starts, stops = group_bounds(contracts["expiry"])
+        expiries = [expiry.decode("ascii") for expiry in contracts["expiry"][starts]]
+        return wrap_day(self.ticker, quotedate, columns, expiries, starts, stops, data_filter)
+
+
+def open_binary_store(root, ticker):
+    """
+    :return: the BinaryStore of a ticker, in whatever encoding it was written
+    """
+    ticker_dir = os.path.join(root, ticker)
+    encoding = "plain"
+    meta_path = os.path.join(ticker_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            encoding = json.load(f).get("encoding", "plain")
+    if encoding == "delta":
+        return DeltaBinaryStore(ticker_dir, ticker)
+    return BinaryStore(ticker_dir, ticker)
+
+
+class BinaryDataSource(DataSource):
+    """
+    Reads option data from the memory-mapped binary store (see write_binary_store). Events are created without
+    decoding any options; they are only built when a strategy looks up an expiry or symbol.
+
+    Params:
+    - path: root folder of the store (default "binarystore")
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        self.path = params.get("path", "binarystore")
+        self.stores = {}
+
+    def open(self, ticker):
+        if ticker not in self.stores:
+            self.stores[ticker] = open_binary_store(self.path, ticker)
+        return self.stores[ticker]
+
+    def events(self, ticker, fromdate, todate=None, data_filter=None):
+        store = self.open(ticker)
+        first, last = store.day_range(fromdate, todate)
+        logger.info("Reading {} days of {} from {}".format(last - first, ticker, self.path))
+        for day in range(first, last):
+            # Reading a day is the query; its options are decoded lazily, on first use by a strategy or portfolio
+            with PROFILER.timed("query"):
+                chains = store.day_chains(day, data_filter)
+            yield Event(ticker=ticker, quotedate=chains.quotedate, price=store.day_price(day), option_chains=chains)
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        # A ticker's store is always rewritten as a whole
+        ticker_dir = os.path.join(self.path, ticker)
+        if not os.path.isdir(ticker_dir):
+            return None
+        return files_fingerprint([os.path.join(ticker_dir, filename) for filename in os.listdir(ticker_dir)])
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        store = self.open(ticker)
+        first, last = store.day_range(fromdate, todate)
+        frames = []
+        for day in range(first, last):
+            chains = store.day_chains(day, data_filter)
+            for expiry, (start, stop) in chains.expiry_slices.items():
+                frame = pd.DataFrame({column: chains.columns[field][start:stop] for field, column, _ in COLUMNS})
+                frame["Ticker"] = ticker
+                frame["QuoteDate"] = chains.quotedate
+                frame["OptExpDate"] = expiry
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=OPTION_COLUMNS)
+        data = pd.concat(frames, ignore_index=True)
+        data["OptionSymbol"] = data.OptionSymbol.str.decode("ascii")
+        data["OptType"] = [OPTION_TYPE_CODES[t] for t in data.OptType]
+        return data[OPTION_COLUMNS]
@@ -0,0 +1,116 @@
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+
+from datasource.datasource import DataSource
+
+logger = logging.getLogger(__name__)
+
+
+class CachedDataSource(DataSource):
+    """
+    Keeps the decoded events of the most recently used (ticker, date range, data filter) loads of another data source
+    in memory, for long running processes (see serve.py). A load is served from memory when a cached load of the same
+    ticker and filter covers its date range. Jobs share the cached Event objects: option chains decoding lazily (see
+    OptionChainSet.decode_expiry) only publish an expiry once it is complete, under a lock per chain set.
+    Cached loads are dropped once the fingerprint of their data changes (for sources that can tell).
+    """
+    def __init__(self, source, max_entries=16):
+        """
+        :param source: the DataSource to load events from
+        :param max_entries: number of loads to keep in memory; the least recently used one is dropped first
+        """
+        super().__init__(source.params)
+        self.source = source
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Concurrent jobs needing the same data wait for a single load
+        self.load_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        return self.source.query(ticker, fromdate, todate, data_filter)
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        return self.source.get_fingerprint(ticker, fromdate, todate)
+
+    def get_name(self):
+        return "cached " + self.source.get_name()
+
+    def find(self, ticker, fromdate, todate, data_filter):
+        """
+        :return: list of cached events of the date range, or None if no cached load covers it
+        """
+        with self.lock:
+            for key, (dates, events, fingerprint) in self.entries.items():
+                entry_ticker, entry_filter, entry_from, entry_to = key
+                if entry_ticker != ticker or entry_filter != str(data_filter) or entry_from > fromdate:
+                    continue
+                if entry_to is not None and (todate is None or todate > entry_to):
+                    continue
+                self.entries.move_to_end(key)
+                break
+            else:
+                return None
+
+        if fingerprint is not None and self.source.get_fingerprint(entry_ticker, entry_from, entry_to) != fingerprint:
+            logger.info("Option data of {} changed; dropping its cached events".format(ticker))
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        start = bisect.bisect_left(dates, fromdate)
+        end = len(dates) if todate is None else bisect.bisect_left(dates, todate)
+        return events[start:end]
+
+    def events(self, ticker, fromdate, todate=None, data_filter=None):
+        events = self.find(ticker, fromdate, todate, data_filter)
+        if events is not None:
+            self.count(hit=True)
+            return iter(events)
+
+        key = (ticker, str(data_filter), fromdate, todate)
+        with self.lock:
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another job may have loaded it meanwhile
+            events = self.find(ticker, fromdate, todate, data_filter)
+            if events is not None:
+                self.count(hit=True)
+                return iter(events)
+
+            self.count(hit=False)
+            fingerprint = self.source.get_fingerprint(ticker, fromdate, todate)
+            events = list(self.source.events(ticker, fromdate, todate, data_filter))
+            with self.lock:
+                self.entries[key] = ([event.quotedate for event in events], events, fingerprint)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                self.load_locks.pop(key, None)
+            logger.info("Cached {} events of {} from {} to {}".format(len(events), ticker, fromdate, todate))
+        return iter(events)
+
+    def count(self, hit):
+        # Jobs load from several threads at once
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_status(self):
+        """
+        :return: JSON serializable description of the cached loads, most recently used last
+        """
+        with self.lock:
+            loads = [{"ticker": ticker, "filter": data_filter, "fromdate": fromdate, "todate": todate,
+                      "events": len(events)}
+                     for (ticker, data_filter, fromdate, todate), (_, events, _) in self.entries.items()]
+            hits, misses = self.hits, self.misses
+        return {"source": self.source.get_name(), "hits": hits, "misses": misses, "loads": loads}
@@ -0,0 +1,75 @@
+import logging
+import os
+import time
+
+import pandas as pd
+
+from datasource.datasource import DataSource, OPTION_COLUMNS, apply_data_filter, files_fingerprint
+
+logger = logging.getLogger(__name__)
+
+PARTITION_EXT = ".parquet"
+
+
+def partition_path(root, ticker, quotedate):
+    """
+    The store is partitioned by ticker and trading day: <root>/<ticker>/<YYYY-MM-DD>.parquet
+    :param root: root folder of the store
+    :param ticker: string of the ticker ("SPY", "QQQ", ...)
+    :param quotedate: date string (YYYY-MM-DD)
+    :return: path of the partition file
+    """
+    return os.path.join(root, ticker, quotedate + PARTITION_EXT)
+
+
+def list_partition_dates(root, ticker, fromdate, todate=None):
+    """
+    :return: sorted list of date strings (YYYY-MM-DD) with a partition for the ticker, fromdate included, todate not
+    """
+    ticker_dir = os.path.join(root, ticker)
+    if not os.path.isdir(ticker_dir):
+        return []
+
+    dates = []
+    for filename in os.listdir(ticker_dir):
+        if not filename.endswith(PARTITION_EXT):
+            continue
+        quotedate = filename[:-len(PARTITION_EXT)]
+        if quotedate >= fromdate and (todate is None or quotedate < todate):
+            dates.append(quotedate)
+    dates.sort()
+    return dates
+
+
+class ColumnarDataSource(DataSource):
+    """
+    Reads option data from a local store of Parquet files, one file per ticker and trading day (see partition_path).
+    Only the partitions of the requested date range are read.
+
+    Params:
+    - path: root folder of the store (default "optionstore")
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        self.path = params.get("path", "optionstore")
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        dates = list_partition_dates(self.path, ticker, fromdate, todate)
+        logger.info("Reading {} partitions of {} from {}".format(len(dates), ticker, self.path))
+
+        tic = time.time()
+        frames = []
+        for quotedate in dates:
+            day = pd.read_parquet(partition_path(self.path, ticker, quotedate))
+            frames.append(apply_data_filter(day, data_filter))
+        if frames:
+            data = pd.concat(frames, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=OPTION_COLUMNS)
+        toc = time.time()
+        logger.info("Reading partitions took {} seconds".format(toc - tic))
+        return data
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        dates = list_partition_dates(self.path, ticker, fromdate, todate)
+        return files_fingerprint([partition_path(self.path, ticker, quotedate) for quotedate in dates])
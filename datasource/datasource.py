@@ -0,0 +1,141 @@
+import os
+from abc import abstractmethod
+
+from utils.data_loader import events_from_frame
+from utils.profiler import PROFILER
+
+# Columns of the option data table, as used by all data sources
+OPTION_COLUMNS = ["Ticker", "QuoteDate", "StockPrice", "OptionSymbol", "OptExpDate", "OptStrike", "OptType", "OptBid",
+                  "OptAsk", "OptOpenInterest", "OptVolume", "DaysToExp", "GreekIV", "GreekDelta", "GreekGamma",
+                  "GreekTheta", "GreekVega"]
+
+
+def build_query(ticker, fromdate, todate=None, data_filter=None, table="bt_OptionDataTable"):
+    """
+    Build the SQL query for option data of a ticker in a date range, with named (:name style) bind parameters
+    :param ticker: string of the ticker ("SPY", "QQQ", ...)
+    :param fromdate: date string (YYYY-MM-DD), included
+    :param todate: date string (YYYY-MM-DD), NOT included; None to query everything from fromdate on
+    :param data_filter: a DataFilter with DTE/delta windows to restrict the query to (optional)
+    :param table: name of the option data table
+    :return: (query string, dictionary of bind parameters) pair
+    """
+    conditions = "Ticker = :ticker AND QuoteDate >= :fromdate"
+    query_params = {"ticker": ticker, "fromdate": fromdate}
+
+    if todate:
+        conditions += " AND QuoteDate < :todate"
+        query_params["todate"] = todate
+    query_str = "SELECT * FROM " + table + " WHERE " + conditions
+
+    # Only load the slice of the chains the strategies can make use of
+    if data_filter is not None:
+        if data_filter.min_dte is not None:
+            query_str += " AND DaysToExp >= :min_dte"
+            query_params["min_dte"] = int(data_filter.min_dte)
+        if data_filter.max_dte is not None:
+            # Also keep the first expiry beyond the window of every day (see DataFilter); the subquery does not depend
+            # on the row, so it is only run once
+            query_str += " AND (DaysToExp <= :max_dte OR (QuoteDate, DaysToExp) IN (SELECT QuoteDate, MIN(DaysToExp)" \
+                " FROM " + table + " WHERE " + conditions + " AND DaysToExp > :max_dte GROUP BY QuoteDate))"
+            query_params["max_dte"] = int(data_filter.max_dte)
+        if data_filter.min_delta is not None:
+            query_str += " AND ABS(GreekDelta) >= :min_delta"
+            query_params["min_delta"] = float(data_filter.min_delta)
+        if data_filter.max_delta is not None:
+            query_str += " AND ABS(GreekDelta) <= :max_delta"
+            query_params["max_delta"] = float(data_filter.max_delta)
+
+    # Sort chronologically
+    query_str += " ORDER BY QuoteDate"
+    return query_str, query_params
+
+
+def apply_data_filter(data, data_filter):
+    """
+    Apply a DataFilter to a DataFrame of option rows (for sources that cannot filter while reading)
+    :param data: pandas DataFrame with the option table columns
+    :param data_filter: a DataFilter, or None
+    :return: the filtered DataFrame
+    """
+    if data_filter is None or data_filter.is_unbounded():
+        return data
+
+    mask = None
+    abs_delta = data.GreekDelta.abs()
+    for column, lower, upper in [(data.DaysToExp, data_filter.min_dte, None),
+                                 (abs_delta, data_filter.min_delta, data_filter.max_delta)]:
+        if lower is not None:
+            mask = (column >= lower) if mask is None else mask & (column >= lower)
+        if upper is not None:
+            mask = (column <= upper) if mask is None else mask & (column <= upper)
+
+    if data_filter.max_dte is not None:
+        # Also keep the first expiry beyond the window of every day (see DataFilter)
+        beyond = data.DaysToExp.where(data.DaysToExp > data_filter.max_dte)
+        first_beyond = beyond.groupby(data.QuoteDate).transform("min")
+        in_window = (data.DaysToExp <= data_filter.max_dte) | (data.DaysToExp == first_beyond)
+        mask = in_window if mask is None else mask & in_window
+    return data[mask].reset_index(drop=True)
+
+
+def files_fingerprint(paths):
+    """
+    :param paths: list of file paths
+    :return: fingerprint string of the sizes and modification times of the files
+    """
+    stats = []
+    for path in sorted(paths):
+        st = os.stat(path)
+        stats.append("{}:{}:{}".format(os.path.basename(path), st.st_size, st.st_mtime_ns))
+    return ";".join(stats)
+
+
+class DataSource:
+    """
+    Abstract interface class for all option data backends to implement
+
+      __init__: initialization is done with a dictionary of backend specific parameters (the "datasource" entry of the
+                backtest JSON); connecting/opening files should be deferred until the first query
+      query: returns the option rows of a ticker in a date range, sorted chronologically
+      get_fingerprint: (optional) tells whether the data of a ticker and date range changed
+    """
+
+    def __init__(self, params):
+        """
+        :param params: a json of backend specific parameters, mapping strings to their values
+        """
+        self.params = params
+
+    @abstractmethod
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        """
+        :param ticker: string of the ticker ("SPY", "QQQ", ...)
+        :param fromdate: date string (YYYY-MM-DD) from when option data should be read (fromdate included)
+        :param todate: date string (YYYY-MM-DD) until when option data should be read (todate NOT included)
+        :param data_filter: a DataFilter with DTE/delta windows to restrict the data to (optional)
+        :return: a pandas DataFrame with the OPTION_COLUMNS columns, sorted by QuoteDate
+        """
+        pass
+
+    def events(self, ticker, fromdate, todate=None, data_filter=None):
+        """
+        Yield Events in a chronological order; see utils.data_loader.events_generator
+        """
+        with PROFILER.timed("query"):
+            data = self.query(ticker=ticker, fromdate=fromdate, todate=todate, data_filter=data_filter)
+        return events_from_frame(ticker, data)
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        """
+        A cheap fingerprint of the data version, which changes whenever the option data of the ticker and date range
+        changes (used to invalidate cached backtest results)
+        :return: a fingerprint string, or None if the backend cannot tell (results are not cached then)
+        """
+        return None
+
+    def get_name(self):
+        """
+        :return: a short name for this backend, used in logging
+        """
+        return type(self).__name__
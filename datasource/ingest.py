@@ -0,0 +1,186 @@
+"""
+Bulk ingestion of vendor end-of-day option CSV dumps into the local Parquet store read by ColumnarDataSource
+"""
+import logging
+import os
+
+import pandas as pd
+
+from datasource.columnar_source import partition_path
+from datasource.datasource import OPTION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+GREEK_COLUMNS = ["GreekIV", "GreekDelta", "GreekGamma", "GreekTheta", "GreekVega"]
+REQUIRED_COLUMNS = ["Ticker", "QuoteDate", "StockPrice", "OptExpDate", "OptStrike", "OptType", "OptBid", "OptAsk"]
+OPTION_TYPES = {"C": "CALL", "CALL": "CALL", "P": "PUT", "PUT": "PUT"}
+
+
+def normalize_columns(data, column_map=None):
+    """
+    Rename vendor columns to the option table columns. Columns already named like the table (in any letter case) are
+    picked up automatically, others can be mapped explicitly.
+    :param data: pandas DataFrame as read from the CSV
+    :param column_map: dictionary of vendor column name -> option table column name (optional)
+    :return: the renamed DataFrame
+    """
+    renames = dict(column_map) if column_map else {}
+    by_lower = {c.lower(): c for c in OPTION_COLUMNS}
+    for column in data.columns:
+        if column not in renames and column.strip().lower() in by_lower:
+            renames[column] = by_lower[column.strip().lower()]
+    return data.rename(columns=renames)
+
+
+def build_symbols(data):
+    """
+    :return: Series of option symbols in the "SPY:2021:07:02:CALL:425" format
+    """
+    expiry = data.OptExpDate.str.replace("-", ":")
+    # astype(str): mapping an empty column leaves it numeric
+    strike = data.OptStrike.map("{:g}".format).astype(str)
+    return data.Ticker + ":" + expiry + ":" + data.OptType + ":" + strike
+
+
+def normalize_keys(data):
+    """
+    Normalize the columns identifying a partition (ticker and quote date), in place
+    """
+    data["Ticker"] = data.Ticker.astype(str).str.strip().str.upper()
+    data["QuoteDate"] = pd.to_datetime(data.QuoteDate, errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+def clean_options(data):
+    """
+    Validate and clean option rows:
+    - rows missing any of the REQUIRED_COLUMNS values are dropped
+    - rows with zero (or missing) bid and ask prices are dropped, same as the data loader does
+    - missing greeks are set to 0 (strategies treat a delta of 0 as unknown)
+    - duplicate symbols of the same day are dropped, keeping the last quote
+    :param data: pandas DataFrame with (normalized) option table columns
+    :return: (cleaned DataFrame, dictionary of dropped row counts by reason) pair
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in data.columns]
+    if missing:
+        raise ValueError("Missing required columns {}".format(missing))
+
+    dropped = {}
+    data = data.copy()
+
+    # Normalize formats
+    normalize_keys(data)
+    data["OptType"] = data.OptType.astype(str).str.strip().str.upper().map(OPTION_TYPES)
+    data["OptExpDate"] = pd.to_datetime(data.OptExpDate, errors="coerce").dt.strftime("%Y-%m-%d")
+    for column in ["StockPrice", "OptStrike", "OptBid", "OptAsk"]:
+        data[column] = pd.to_numeric(data[column], errors="coerce")
+
+    n = len(data)
+    data = data.dropna(subset=REQUIRED_COLUMNS)
+    dropped["missing_fields"] = n - len(data)
+
+    n = len(data)
+    data = data[(data.OptBid > 0) | (data.OptAsk > 0)]
+    dropped["zero_bid_ask"] = n - len(data)
+
+    for column in GREEK_COLUMNS:
+        if column not in data.columns:
+            data[column] = 0.0
+        data[column] = pd.to_numeric(data[column], errors="coerce").fillna(0.0)
+    for column in ["OptOpenInterest", "OptVolume"]:
+        if column not in data.columns:
+            data[column] = 0
+        data[column] = pd.to_numeric(data[column], errors="coerce").fillna(0).astype("int64")
+
+    if "OptionSymbol" not in data.columns:
+        data["OptionSymbol"] = build_symbols(data)
+    if "DaysToExp" not in data.columns:
+        data["DaysToExp"] = (pd.to_datetime(data.OptExpDate) - pd.to_datetime(data.QuoteDate)).dt.days
+    data["DaysToExp"] = pd.to_numeric(data.DaysToExp, errors="coerce").fillna(0).astype("int64")
+
+    n = len(data)
+    data = data.drop_duplicates(subset=["Ticker", "QuoteDate", "OptionSymbol"], keep="last")
+    dropped["duplicate_symbols"] = n - len(data)
+
+    data = data.sort_values(["Ticker", "QuoteDate", "OptExpDate", "OptType", "OptStrike"])
+    return data[OPTION_COLUMNS].reset_index(drop=True), dropped
+
+
+def write_partition(root, ticker, quotedate, day):
+    """
+    Write one ticker/day partition. The file is written next to its final location and renamed into place, so
+    re-ingesting a day simply replaces it and readers never see a half-written file.
+    """
+    path = partition_path(root, ticker, quotedate)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp{}".format(os.getpid())
+    day.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def staged_path(root, ticker, quotedate, index):
+    """
+    Rows of a ticker/day read from the index-th input file wait next to the partition until all files are read; the
+    store does not list them (see list_partition_dates)
+    """
+    return partition_path(root, ticker, quotedate) + ".{}.staged".format(index)
+
+
+def ingest_file(task):
+    """
+    Read, clean and stage a single vendor CSV file; runs in a worker process. Several files can hold rows of the same
+    ticker/day, so the rows are only staged here and moved into the store by publish_partitions once all files are
+    read.
+    :param task: (csv filename, index of the file, store root folder, column map) tuple
+    :return: dictionary of ingestion stats for this file
+    """
+    filename, index, root, column_map = task
+    raw = normalize_columns(pd.read_csv(filename), column_map)
+    data, dropped = clean_options(raw)
+
+    partitions = []
+    for (ticker, quotedate), day in data.groupby(["Ticker", "QuoteDate"], sort=False):
+        path = staged_path(root, ticker, quotedate, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        day.reset_index(drop=True).to_parquet(path, index=False)
+        partitions.append((ticker, quotedate))
+
+    # Ticker/days of the file without any valid row left; their old partitions are stale
+    keys = raw[["Ticker", "QuoteDate"]].copy()
+    normalize_keys(keys)
+    emptied = sorted(set(map(tuple, keys.dropna().values.tolist())) - set(partitions))
+
+    return {"file": filename, "index": index, "rows_read": len(raw), "rows_written": len(data), "dropped": dropped,
+            "partitions": partitions, "emptied": emptied}
+
+
+def publish_partitions(root, staged, emptied):
+    """
+    Move the staged rows of every ticker/day into the store. Rows of a ticker/day found in several files are merged;
+    of symbols quoted in more than one of them, the quote of the last file (in the order the files were given) is
+    kept. Partitions of ticker/days whose re-ingested rows were all dropped are removed.
+    :param root: root folder of the store
+    :param staged: dictionary of (ticker, quotedate) -> list of indices of the files with rows of it
+    :param emptied: set of (ticker, quotedate) pairs found in the files, but without any valid row
+    :return: (number of merged partitions, number of removed partitions) pair
+    """
+    merged = 0
+    for (ticker, quotedate), indices in staged.items():
+        paths = [staged_path(root, ticker, quotedate, index) for index in sorted(indices)]
+        if len(paths) == 1:
+            os.replace(paths[0], partition_path(root, ticker, quotedate))
+            continue
+        day = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+        day = day.drop_duplicates(subset=["OptionSymbol"], keep="last")
+        day = day.sort_values(["OptExpDate", "OptType", "OptStrike"]).reset_index(drop=True)
+        write_partition(root, ticker, quotedate, day)
+        for path in paths:
+            os.remove(path)
+        merged += 1
+
+    removed = 0
+    for ticker, quotedate in emptied:
+        path = partition_path(root, ticker, quotedate)
+        if (ticker, quotedate) not in staged and os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return merged, removed
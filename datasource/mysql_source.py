@@ -0,0 +1,59 @@
+import logging
+import time
+
+from datasource.datasource import DataSource, OPTION_COLUMNS, build_query
+
+logger = logging.getLogger(__name__)
+
+
+class MySQLDataSource(DataSource):
+    """
+    Reads option data from the bt_OptionDataTable table of a MySQL database (the original backend)
+
+    Params:
+    - credentials: file with the username on the first line, password on the second one (default "credentials.txt")
+    - host: database host (default "localhost")
+    - database: database name (default "rtoptionsdb")
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        self.credentials = params.get("credentials", "credentials.txt")
+        self.host = params.get("host", "localhost")
+        self.database = params.get("database", "rtoptionsdb")
+        self.db = None
+
+    def connect(self):
+        """
+        Connect to the DB on first use, so that nothing needs a live DB until data is actually queried
+        """
+        if self.db is None:
+            import records
+
+            with open(self.credentials) as f:
+                username, password = f.readlines()
+                username = username.strip()
+                password = password.strip()
+            self.db = records.Database('mysql://' + username + ':' + password + '@' + self.host + '/' + self.database)
+        return self.db
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        query_str, query_params = build_query(ticker, fromdate, todate, data_filter)
+        logger.info("Running query: {} with {}".format(query_str, query_params))
+
+        # Run query - this can take a while
+        tic = time.time()
+        rows = self.connect().query(query_str, **query_params)
+        data = rows.export('df')
+        toc = time.time()
+        logger.info("Query took {} seconds".format(toc - tic))
+        return data
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        # Row count and latest quote date of the range catch newly ingested and removed data, and a checksum over all
+        # columns of every row catches corrected quotes (e.g. days ingested once more)
+        query_str, query_params = build_query(ticker, fromdate, todate)
+        query_str = query_str.replace("SELECT *", "SELECT COUNT(*) AS nrows, MAX(QuoteDate) AS lastdate, "
+                                      "SUM(CRC32(CONCAT_WS(',', " + ", ".join(OPTION_COLUMNS) + "))) AS checksum")
+        query_str = query_str.replace(" ORDER BY QuoteDate", "")
+        row = self.connect().query(query_str, **query_params).first()
+        return "{}:{}:{}".format(row.nrows, row.lastdate, row.checksum)
@@ -0,0 +1,46 @@
+import logging
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from datasource.datasource import DataSource, build_query, files_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDataSource(DataSource):
+    """
+    Reads option data from a local SQLite file holding a bt_OptionDataTable table, with the same columns as the MySQL
+    table. Handy for development and CI.
+
+    Params:
+    - path: the SQLite database file (default "options.db")
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        self.path = params.get("path", "options.db")
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            # Worker threads may run queries as well
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+        return self.db
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        query_str, query_params = build_query(ticker, fromdate, todate, data_filter)
+        logger.info("Running query: {} with {}".format(query_str, query_params))
+
+        tic = time.time()
+        data = pd.read_sql_query(query_str, self.connect(), params=query_params)
+        toc = time.time()
+        logger.info("Query took {} seconds".format(toc - tic))
+        return data
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        # Any write to the DB file changes its size or modification time
+        if not os.path.exists(self.path):
+            return None
+        return files_fingerprint([self.path])
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from datasource.datasource import DataSource, OPTION_COLUMNS, apply_data_filter
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "seed": 0,
+    "price": 100.0,
+    "vol": 0.2,
+    "drift": 0.05,
+    "skew": 0.5,
+    "rate": 0.0,
+    "spread": 0.02,
+    "weeklies": 8,
+    "maxdte": 400,
+    "strikes": 20,
+    "strikestep": 0.01,
+    "origin": "2015-01-02",
+}
+
+
+def parse_date(datestr):
+    return date(int(datestr[0:4]), int(datestr[5:7]), int(datestr[8:10]))
+
+
+def third_friday(year, month):
+    first = date(year, month, 1)
+    return first + timedelta(days=(4 - first.weekday()) % 7 + 14)
+
+
+def get_expiries(day, weeklies, maxdte):
+    """
+    :param day: a datetime.date
+    :param weeklies: number of weekly (Friday) expiries listed, starting with the Friday of the current week
+    :param maxdte: monthly expiries (third Friday) are listed up to this many days out
+    :return: sorted list of expiry dates
+    """
+    friday = day + timedelta(days=(4 - day.weekday()) % 7)
+    expiries = {friday + timedelta(days=7 * i) for i in range(weeklies)}
+    year, month = day.year, day.month
+    while True:
+        monthly = third_friday(year, month)
+        if (monthly - day).days > maxdte:
+            break
+        if monthly >= day:
+            expiries.add(monthly)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return sorted(expiries)
+
+
+class SyntheticDataSource(DataSource):
+    """
+    Generates deterministic option chains, with no database needed: the underlying follows a seeded random walk
+    (geometric Brownian motion) over all weekdays, and options are priced with Black-Scholes on a volatility smile, so
+    prices and greeks are consistent with each other. The same parameters always give the same data, whatever the
+    queried date range. Meant for benchmarks, development and CI.
+
+    Params (all optional):
+    - seed: random seed, combined with the ticker name (default 0)
+    - price: price of the underlying on the origin date (default 100)
+    - vol: annualized volatility of the underlying, also the at-the-money implied volatility (default 0.2)
+    - drift: annualized drift of the underlying (default 0.05)
+    - skew: implied volatility slope over log-moneyness; puts get more expensive with a positive skew (default 0.5)
+    - rate: risk free rate used for pricing (default 0)
+    - spread: bid/ask spread as a fraction of the option price, at least a cent (default 0.02)
+    - weeklies: number of weekly expiries listed (default 8)
+    - maxdte: monthly expiries are listed up to this many days out (default 400)
+    - strikes: number of strikes listed on each side of the underlying price (default 20)
+    - strikestep: distance between strikes, as a fraction of the price on the origin date (default 0.01)
+    - origin: first day of the random walk (default "2015-01-02"); no data is generated before it
+    - tickers: dictionary of per ticker overrides of the above, e.g. {"SPY": {"price": 370, "vol": 0.18}}
+    """
+    def __init__(self, params):
+        super().__init__(params)
+        self.price_paths = {}
+
+    def get_params(self, ticker):
+        params = dict(DEFAULTS)
+        params.update({key: value for key, value in self.params.items() if key in DEFAULTS})
+        params.update(self.params.get("tickers", {}).get(ticker, {}))
+        return params
+
+    def get_prices(self, ticker, todate):
+        """
+        :return: (list of trading days, array of underlying prices) from the origin date up to todate (not included)
+        """
+        params = self.get_params(ticker)
+        days, prices = self.price_paths.get(ticker, ([], None))
+        if len(days) > 0 and days[-1] >= todate - timedelta(days=1):
+            return days, prices
+
+        # The walk is regenerated from the origin, so every date gets the same price whatever the queried range
+        days = []
+        day = parse_date(params["origin"])
+        while day < todate:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        rng = np.random.RandomState((zlib.crc32(ticker.encode("utf-8")) + params["seed"]) % (2 ** 32))
+        dt = 1 / 252.0
+        steps = (params["drift"] - params["vol"] ** 2 / 2) * dt + params["vol"] * np.sqrt(dt) * rng.standard_normal(
+            len(days))
+        steps[0] = 0.0
+        prices = params["price"] * np.exp(np.cumsum(steps))
+        self.price_paths[ticker] = (days, prices)
+        return days, prices
+
+    def day_frame(self, ticker, day, price, params, data_filter):
+        """
+        :return: dictionary of option table columns for one trading day
+        """
+        expiries = get_expiries(day, params["weeklies"], params["maxdte"])
+        dtes = np.array([(expiry - day).days for expiry in expiries])
+        keep = np.ones(len(expiries), dtype=bool)
+        if data_filter is not None and data_filter.min_dte is not None:
+            keep &= dtes >= data_filter.min_dte
+        if data_filter is not None and data_filter.max_dte is not None:
+            keep &= (dtes <= data_filter.max_dte) | \
+                np.array([data_filter.is_first_expiry_beyond(dte, dtes) for dte in dtes], dtype=bool)
+        expiries = [expiry for expiry, kept in zip(expiries, keep) if kept]
+        dtes = dtes[keep]
+
+        # Strikes lie on a fixed grid, so listed contracts keep their symbols from day to day
+        spacing = params["price"] * params["strikestep"]
+        spacing = max(0.5, round(spacing * 2) / 2)
+        center = round(price / spacing)
+        strikes = spacing * np.arange(center - params["strikes"], center + params["strikes"] + 1)
+        strikes = strikes[strikes > 0]
+
+        n_exp, n_strikes = len(expiries), len(strikes)
+        strike = np.tile(strikes, n_exp * 2)
+        dte = np.repeat(np.tile(dtes, 2), n_strikes)
+        is_call = np.repeat([True, False], n_exp * n_strikes)
+
+        # Black-Scholes on a volatility smile; expiring options get half a day of time value
+        t = np.maximum(dte, 0.5) / 365.0
+        sqrt_t = np.sqrt(t)
+        iv = np.maximum(0.05, params["vol"] * (1 - params["skew"] * np.log(strike / price)))
+        d1 = (np.log(price / strike) + (params["rate"] + iv ** 2 / 2) * t) / (iv * sqrt_t)
+        d2 = d1 - iv * sqrt_t
+        discount = np.exp(-params["rate"] * t)
+        pdf = np.exp(-d1 ** 2 / 2) / np.sqrt(2 * np.pi)
+        call_value = price * ndtr(d1) - strike * discount * ndtr(d2)
+        put_value = strike * discount * ndtr(-d2) - price * ndtr(-d1)
+        value = np.where(is_call, call_value, put_value)
+        delta = np.where(is_call, ndtr(d1), ndtr(d1) - 1)
+        gamma = pdf / (price * iv * sqrt_t)
+        vega = price * pdf * sqrt_t / 100
+        theta = (-price * pdf * iv / (2 * sqrt_t) - np.where(is_call, 1, -1) * params["rate"] * strike * discount *
+                 ndtr(np.where(is_call, d2, -d2))) / 365
+
+        half_spread = np.maximum(0.005, value * params["spread"] / 2)
+        bid = np.maximum(0.0, np.round(value - half_spread, 2))
+        ask = np.round(value + half_spread, 2) + 0.01
+        open_interest = (5000 * np.exp(-10 * np.abs(np.log(strike / price)))).astype(int)
+
+        expiry_strs = [expiry.isoformat() for expiry in expiries]
+        expiry_col = np.repeat(np.array(expiry_strs * 2, dtype=object), n_strikes)
+        type_col = np.where(is_call, "CALL", "PUT")
+        symbol_prefixes = ["{}:{}:{}:".format(ticker, expiry.replace("-", ":"), option_type)
+                           for option_type in ("CALL", "PUT") for expiry in expiry_strs]
+        strike_strs = ["{:g}".format(s) for s in strikes]
+        symbols = [prefix + s for prefix in symbol_prefixes for s in strike_strs]
+
+        rows = len(symbols)
+        return {"Ticker": [ticker] * rows, "QuoteDate": [day.isoformat()] * rows, "StockPrice": np.full(rows, price),
+                "OptionSymbol": symbols, "OptExpDate": expiry_col, "OptStrike": strike, "OptType": type_col,
+                "OptBid": bid, "OptAsk": ask, "OptOpenInterest": open_interest, "OptVolume": open_interest // 10,
+                "DaysToExp": dte, "GreekIV": iv, "GreekDelta": delta, "GreekGamma": gamma, "GreekTheta": theta,
+                "GreekVega": vega}
+
+    def query(self, ticker, fromdate, todate=None, data_filter=None):
+        params = self.get_params(ticker)
+        start = parse_date(fromdate)
+        end = parse_date(todate) if todate else date.today()
+        days, prices = self.get_prices(ticker, end)
+
+        frames = []
+        for day, price in zip(days, prices):
+            if day >= start:
+                frames.append(pd.DataFrame(self.day_frame(ticker, day, float(price), params, data_filter),
+                                           columns=OPTION_COLUMNS))
+        if len(frames) == 0:
+            return pd.DataFrame(columns=OPTION_COLUMNS)
+        data = pd.concat(frames, ignore_index=True)
+        logger.info("Generated {} synthetic option rows for {} from {} to {}".format(len(data), ticker, fromdate,
+                                                                                    todate))
+
+        # DTE windows are applied while generating, delta windows need the greeks first
+        return apply_data_filter(data, data_filter)
+
+    def get_fingerprint(self, ticker, fromdate, todate=None):
+        # The data is a pure function of the parameters
+        params = json.dumps(self.get_params(ticker), sort_keys=True)
+        return "synthetic:" + hashlib.sha1(params.encode("utf-8")).hexdigest()
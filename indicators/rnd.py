@@ -3,8 +3,6 @@ import logging
 from core.optionchain import OptionChain
 from core.option import Option
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import *
 from scipy.special import betainc, beta
 
 logger = logging.getLogger(__name__)
@@ -13,6 +11,9 @@ PROB_TH = 0.01
 
 
 def scatter(x, y, textx=None, texty=None, title=None, x2=None, y2=None):
+    # Only for debugging; matplotlib takes longer to import than the rest of a small run
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots()
     plt.scatter(x, y)
     if textx:
@@ -100,6 +101,8 @@ def get_RND_distribution(options: OptionChain):
     strikes, probs = add_call_bull_spreads(sorted_calls, strikes, probs, D=D)
     strikes, probs = add_put_bull_spreads(sorted_puts, strikes, probs, D=D)
 
+    # Imported on first use, so that runs without RND strategies do not pay for scipy.optimize
+    from scipy.optimize import curve_fit
     popt, _ = curve_fit(curve_fit_optim, strikes, probs)
 
     """
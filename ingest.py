@@ -0,0 +1,68 @@
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import time
+
+from datasource.ingest import ingest_file, publish_partitions
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Usage: ingest.py <store_folder> <csv files or glob patterns> [--workers N] [--columns column_map.json]
+    Example: ingest.py optionstore "dumps/2021-*.csv" --workers 8
+
+    Reads vendor end-of-day option CSV files in parallel, cleans them and writes them into the local Parquet store
+    (one file per ticker and trading day), which can then be used with "datasource": {"type": "parquet"}.
+    Re-ingesting a day replaces its partitions. Rows of a ticker/day spread over several CSV files are merged; for
+    symbols quoted in several of them, the quote of the file given last is kept.
+    """
+    parser = argparse.ArgumentParser(description="Ingest vendor EOD option CSV dumps into the local Parquet store")
+    parser.add_argument("store", help="root folder of the Parquet store")
+    parser.add_argument("csv", nargs="+", help="CSV files or glob patterns")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="number of worker processes")
+    parser.add_argument("--columns", default=None,
+                        help="JSON file mapping vendor column names to option table column names")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename='session.log', level=logging.INFO)
+
+    column_map = None
+    if args.columns:
+        with open(args.columns) as f:
+            column_map = json.load(f)
+
+    filenames = []
+    for pattern in args.csv:
+        filenames.extend(sorted(glob.glob(pattern)) or [pattern])
+    tasks = [(filename, index, args.store, column_map) for index, filename in enumerate(filenames)]
+
+    tic = time.time()
+    rows_read, rows_written = 0, 0
+    partition_sources = {}
+    emptied = set()
+    with multiprocessing.Pool(processes=max(1, min(args.workers, len(tasks)))) as pool:
+        for stats in pool.imap_unordered(ingest_file, tasks):
+            rows_read += stats["rows_read"]
+            rows_written += stats["rows_written"]
+            for partition in stats["partitions"]:
+                partition_sources.setdefault(partition, []).append(stats["index"])
+            emptied.update(stats["emptied"])
+            logger.info("Ingested {}: {} rows read, {} rows written, dropped {}".
+                        format(stats["file"], stats["rows_read"], stats["rows_written"], stats["dropped"]))
+    merged, removed = publish_partitions(args.store, partition_sources, emptied)
+    toc = time.time()
+    logger.info("Merged {} partitions found in several files, removed {} partitions without valid rows".format(
+        merged, removed))
+
+    msg = "Ingested {} files into {} partitions: {} rows read, {} rows written in {:.1f} seconds ({:.0f} rows/sec)".\
+        format(len(tasks), len(partition_sources), rows_read, rows_written, toc - tic, rows_read / max(toc - tic, 1e-9))
+    print(msg)
+    logger.info(msg)
+
+
+if __name__ == "__main__":
+    main()
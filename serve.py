@@ -0,0 +1,278 @@
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+from backtest import run_test
+from datasource.cached_source import CachedDataSource
+from utils.bootstrap import DEFAULT_WORKERS
+from utils.data_loader import data_source_from_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Finished jobs kept around for their results to be fetched; the oldest ones are dropped first
+MAX_FINISHED_JOBS = 100
+
+
+def forks_workers(test_params):
+    """
+    :return: whether a job forks worker processes: searches, walk-forward runs and bootstraps do
+    """
+    bootstrap = test_params.get("bootstrap", None)
+    return "search" in test_params or "walkforward" in test_params or \
+        (type(bootstrap) == dict and bootstrap.get("workers", DEFAULT_WORKERS) > 1)
+
+
+def summary_to_json(ticker_summaries):
+    """
+    :param ticker_summaries: result of run_test()
+    :return: JSON serializable list of {"window", "tickers"} entries, with a list of portfolio results per ticker
+    """
+    return [{"window": window,
+             "tickers": {ticker: [{"strategy": id, "params": strat.params, "performance": perf,
+                                   "max_drawdown": drawdown, "net_value": netval}
+                                  for perf, drawdown, netval, id, strat in summary]
+                         for ticker, summary in ticker_summary.items()}}
+            for window, ticker_summary, _ in ticker_summaries]
+
+
+class JobRunner:
+    """
+    Runs backtest jobs on a pool of worker threads, reading option data through a CachedDataSource per data source
+    configuration, so that jobs over recently used tickers and date ranges skip loading and decoding them again
+    """
+    def __init__(self, workers=2, cache_entries=16):
+        """
+        :param workers: number of jobs run at the same time
+        :param cache_entries: number of (ticker, date range, data filter) loads kept in memory per data source
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache_entries = cache_entries
+        self.sources = {}
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        # Jobs forking worker processes run on their own: forking while other threads hold locks is not safe, and
+        # they share the LOADED_EVENTS of the engine module
+        self.gate = threading.Condition()
+        self.running = 0
+        self.exclusive = False
+        # Jobs waiting to run on their own; other jobs queue up behind them, instead of starving them
+        self.waiting_exclusive = 0
+
+    def get_source(self, params):
+        key = json.dumps(params, sort_keys=True)
+        with self.lock:
+            if key not in self.sources:
+                self.sources[key] = CachedDataSource(data_source_from_params(params), self.cache_entries)
+            return self.sources[key]
+
+    def submit(self, test_params):
+        """
+        :param test_params: a json dictionary of test parameters, as for backtest.py
+        :return: id of the queued job
+        """
+        # Events loaded in a prefetch process would not end up in the cache
+        prefetch = test_params.get("prefetch", 8)
+        if type(prefetch) != dict:
+            prefetch = {"depth": prefetch}
+        test_params = dict(test_params, prefetch=dict(prefetch, mode="thread"))
+
+        with self.lock:
+            job_id = str(next(self.ids))
+            self.jobs[job_id] = {"id": job_id, "status": "queued", "submitted": time.time(), "started": None,
+                                 "finished": None, "error": None, "result": None, "done": threading.Event()}
+            finished = [id for id, job in self.jobs.items() if job["done"].is_set()]
+            for id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[id]
+        self.executor.submit(self.run_job, job_id, test_params)
+        logger.info("Queued job {}".format(job_id))
+        return job_id
+
+    def enter(self, exclusive):
+        with self.gate:
+            if exclusive:
+                self.waiting_exclusive += 1
+                self.gate.wait_for(lambda: not self.exclusive and self.running == 0)
+                self.waiting_exclusive -= 1
+            else:
+                self.gate.wait_for(lambda: not self.exclusive and self.waiting_exclusive == 0)
+            self.running += 1
+            self.exclusive = exclusive
+
+    def leave(self):
+        with self.gate:
+            self.running -= 1
+            self.exclusive = False
+            self.gate.notify_all()
+
+    def run_job(self, job_id, test_params):
+        job = self.jobs[job_id]
+        self.enter(forks_workers(test_params))
+        try:
+            job["status"] = "running"
+            job["started"] = time.time()
+            source = self.get_source(test_params.get("datasource", None))
+            job["result"] = summary_to_json(run_test(test_params, source))
+            job["status"] = "done"
+        except Exception as e:
+            logger.exception("Job {} failed".format(job_id))
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            self.leave()
+            job["finished"] = time.time()
+            job["done"].set()
+        logger.info("Job {} {} in {:.2f}s".format(job_id, job["status"], job["finished"] - job["started"]))
+
+    def get_job(self, job_id, wait=0):
+        """
+        :param wait: number of seconds to wait for the job to finish
+        :return: JSON serializable state of the job, with its result once done; None if unknown
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job["done"].wait(wait)
+        return {key: value for key, value in job.items() if key != "done"}
+
+    def get_status(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+            sources = list(self.sources.values())
+        counts = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"jobs": counts, "sources": [source.get_status() for source in sources]}
+
+    def clear_cache(self):
+        with self.lock:
+            for source in self.sources.values():
+                source.clear()
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs               queue a job (a backtest JSON configuration as body), responds with its id
+    GET  /jobs/<id>?wait=N   state of a job, with its result once done; waits up to N seconds for it to finish
+    GET  /status             job counts and cached data
+    POST /cache/clear        drop all cached data
+    """
+    def send_json(self, code, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            self.send_json(200, self.server.runner.get_status())
+        elif url.path.startswith("/jobs/"):
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+            job = self.server.runner.get_job(url.path[len("/jobs/"):], wait)
+            if job is None:
+                self.send_json(404, {"error": "unknown job"})
+            else:
+                self.send_json(200, job)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path == "/jobs":
+            try:
+                test_params = json.loads(body.decode("utf-8"))
+                if type(test_params) != dict:
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                self.send_json(400, {"error": "invalid job: {}".format(e)})
+                return
+            self.send_json(202, {"id": self.server.runner.submit(test_params)})
+        elif url.path == "/cache/clear":
+            self.server.runner.clear_cache()
+            self.send_json(200, {"cleared": True})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        logger.info("{} {}".format(self.address_string(), format % args))
+
+
+class JobServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, runner):
+        super().__init__(address, JobHandler)
+        self.runner = runner
+
+
+def submit(filename, host, port, poll=5):
+    """
+    Queue a backtest JSON file on a running server, wait for it to finish and print its result
+    """
+    with open(filename) as f:
+        body = f.read().encode("utf-8")
+    url = "http://{}:{}".format(host, port)
+    request = urllib.request.Request(url + "/jobs", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        job_id = json.loads(response.read().decode("utf-8"))["id"]
+    while True:
+        with urllib.request.urlopen("{}/jobs/{}?wait={}".format(url, job_id, poll)) as response:
+            job = json.loads(response.read().decode("utf-8"))
+        if job["status"] in ("done", "failed"):
+            break
+    print(json.dumps(job, indent=2))
+
+
+def main():
+    """
+    Usage: serve.py [--port N] [--workers N] [--cache N]
+           serve.py --submit <backtest_config_filename> [--port N]
+    Example: serve.py --workers 4
+
+    Runs backtests as jobs of a local HTTP server, keeping the option data of recently used tickers and date ranges in
+    memory between jobs (see "Backtest server" in the Readme). With --submit, a backtest JSON file is sent to a running
+    server instead, and its result printed once done.
+    """
+    parser = argparse.ArgumentParser(description="Local backtest server keeping recently used option data in memory")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on, or of the server to submit to")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, or to submit to")
+    parser.add_argument("--workers", type=int, default=2, help="number of jobs run at the same time")
+    parser.add_argument("--cache", type=int, default=16,
+                        help="number of ticker/date range loads kept in memory per data source")
+    parser.add_argument("--submit", default=None, help="backtest JSON file to run on a running server")
+    args = parser.parse_args()
+
+    if args.submit:
+        submit(args.submit, args.host, args.port)
+        return
+
+    logging.basicConfig(filename='session.log', level=logging.INFO)
+    server = JobServer((args.host, args.port), JobRunner(args.workers, args.cache))
+    logger.info("Serving backtest jobs on {}:{}".format(args.host, args.port))
+    print("Serving backtest jobs on http://{}:{}".format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
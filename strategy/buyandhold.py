@@ -2,6 +2,7 @@ from math import floor
 
 from core.event import Event
 from core.order import Order
+from core.wakeup import WakeUp
 from strategy.strategy import Strategy
 
 
@@ -9,20 +10,38 @@ class BuyAndHold(Strategy):
     """
     Simple Buy and Hold strategy.
     Opens a position for as many shares as it can afford and never seels :)
+    Of a basket of tickers, it buys equal amounts of each, every ticker on the first date it is quoted.
     """
     def __init__(self, params):
         super().__init__(params)
 
     def handle_event(self, open_positions, totalcash, totalvalue, event: Event):
-        if len(open_positions) == 0:
-            # When starting up, buy as many of the underlying ticker as possible
-            buy_qty = floor(totalcash / event.price)
-            order = Order(buy_qty, event.ticker)
-            return [order]
+        tickers = self.get_tickers_to_buy(open_positions, event)
+        if len(tickers) > 0:
+            # Buy as many of the underlying tickers as possible; tickers not quoted yet keep their share of the cash
+            budget = totalcash / len(tickers)
+            return [Order(floor(budget / event.prices[ticker]), ticker) for ticker in tickers
+                    if ticker in event.prices]
 
         # Just wait and hold, nothing to do...
         return []
 
+    @staticmethod
+    def get_tickers_to_buy(open_positions, event: Event):
+        held = set(symbol for symbol, _ in open_positions)
+        return [ticker for ticker in event.get_basket() if ticker not in held]
+
+    def get_data_filter(self):
+        # Only ever trades the underlying
+        return None
+
+    def get_wake_up(self, open_positions, event: Event):
+        # Once invested in every ticker, there is nothing left to do
+        return WakeUp() if len(self.get_tickers_to_buy(open_positions, event)) == 0 else None
+
+    def trades_baskets(self):
+        return True
+
     def take_assignment(self):
         return False
 
@@ -1,7 +1,9 @@
 from math import floor
 
+from core.datafilter import DataFilter
 from core.event import Event
 from core.order import Order
+from core.wakeup import WakeUp
 from strategy.strategy import Strategy
 from utils.tools import symbol_to_params
 
@@ -9,20 +11,38 @@ class CoveredCall(Strategy):
     """
     Simple Covered Call strategy
     Opens a position for as many shares (multiple of 100x) as it can afford and sells covered calls against it
+    Of a basket of tickers, it splits its cash evenly and sells covered calls against the shares of each.
     """
     def __init__(self, params):
         super().__init__(params)
         self.preferred_dte = params.get("dte", 5)
         self.preferred_delta = params.get("delta", 0.3)
+        # Number of shares bought, by ticker
+        self.buy_qty = {}
 
     def handle_event(self, open_positions, totalcash, totalvalue, event: Event):
+        orders = []
+        positions = self.get_positions_by_ticker(open_positions, event)
+        # Tickers without shares split the cash evenly, also those that are not quoted yet
+        budget = totalcash / max(1, sum(1 for held in positions.values() if len(held) == 0))
+        for ticker_event in event.get_events():
+            orders.extend(self.handle_ticker(positions[ticker_event.ticker], budget, ticker_event))
+        return orders
+
+    def handle_ticker(self, open_positions, budget, event: Event):
+        """
+        :param open_positions: holdings in the underlying of the event
+        :param budget: cash to buy shares with, if none are held
+        :param event: the Event of a single underlying
+        :return: list of orders for that underlying
+        """
         orders = []
         if len(open_positions) == 0:
             # When starting up, buy as many of the underlying ticker as possible
-            self.buy_qty = floor(totalcash / event.price)
+            buy_qty = floor(budget / event.price)
             # Make the order a multiple of 100
-            self.buy_qty = (self.buy_qty // 100) * 100
-            order = Order(self.buy_qty, event.ticker)
+            self.buy_qty[event.ticker] = (buy_qty // 100) * 100
+            order = Order(self.buy_qty[event.ticker], event.ticker)
             orders.append(order)
 
         # Sell covered calls against position
@@ -31,7 +51,7 @@ class CoveredCall(Strategy):
             best_option = event.find_option_by_delta(type="CALL", preferred_dte=self.preferred_dte,
                                                      preferred_delta=self.preferred_delta)
             if best_option:
-                order = Order(-self.buy_qty / 100, best_option.symbol)
+                order = Order(-self.buy_qty[event.ticker] / 100, best_option.symbol)
                 orders.append(order)
 
         else:
@@ -54,6 +74,29 @@ class CoveredCall(Strategy):
 
         return orders
 
+    @staticmethod
+    def get_positions_by_ticker(open_positions, event: Event):
+        """
+        :return: dictionary of ticker -> list of the (symbol, quantity) holdings in it, for every ticker of the basket
+        """
+        positions = {ticker: [] for ticker in event.get_basket()}
+        for symbol, qty in open_positions:
+            positions[symbol_to_params(symbol)[0]].append((symbol, qty))
+        return positions
+
+    def get_data_filter(self):
+        return DataFilter.around(dtes=[self.preferred_dte], deltas=[self.preferred_delta])
+
+    def get_wake_up(self, open_positions, event: Event):
+        # With shares and a covered call in place (on every ticker), only act once the first call expires
+        positions = self.get_positions_by_ticker(open_positions, event)
+        if all(len(held) > 1 for held in positions.values()):
+            return WakeUp.at_expiry(open_positions, option_type="CALL")
+        return None
+
+    def trades_baskets(self):
+        return True
+
     def take_assignment(self):
         return True
 
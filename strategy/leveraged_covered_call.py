@@ -1,6 +1,7 @@
 import logging
 from math import floor
 
+from core.datafilter import DataFilter
 from core.event import Event
 from core.order import Order
 from strategy.strategy import Strategy
@@ -93,6 +94,11 @@ class LeveragedCoveredCall(Strategy):
 
         return orders
 
+    def get_data_filter(self):
+        # Rolling for credit picks options by price, regardless of their delta
+        deltas = None if self.creditroll == 1 else [self.long_delta, self.short_delta]
+        return DataFilter.around(dtes=[self.long_dte, self.short_dte], deltas=deltas)
+
     def take_assignment(self):
         return False
 
@@ -0,0 +1,84 @@
+"""
+Registry of the strategies that backtest files can refer to by name ("strategy": "wheel"). Strategy modules are only
+imported once a backtest uses them, so runs (and forked workers) do not pay for the dependencies of strategies they
+do not test, such as scipy for the RND strategy.
+
+Strategies of other packages register through the "strategy_backtester.strategies" entry point group, e.g. in their
+setup.py: entry_points={"strategy_backtester.strategies": ["mystrategy = mypackage.strategies:MyStrategy"]}
+or in code with register_strategy().
+"""
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "strategy_backtester.strategies"
+
+# Strategy names (lower case) to their class, or to a "module:class" path to import the class from on first use
+STRATEGIES = {
+    "buyandhold": "strategy.buyandhold:BuyAndHold",
+    "coveredcall": "strategy.covered_call:CoveredCall",
+    "wheel": "strategy.wheel:Wheel",
+    "leveragedcoveredcall": "strategy.leveraged_covered_call:LeveragedCoveredCall",
+    "deltaneutral": "strategy.delta_neutral:DeltaNeutral",
+    "rndstrategy": "strategy.rnd_strategy:RndStrategy",
+}
+
+
+def register_strategy(name, strategy=None):
+    """
+    Register a strategy under a name, either directly or as a class decorator (@register_strategy("mystrategy"))
+    :param name: name of the strategy in backtest files (case insensitive)
+    :param strategy: a Strategy subclass, or a "module:class" path to import it from on first use
+    """
+    if strategy is None:
+        def decorator(cls):
+            register_strategy(name, cls)
+            return cls
+        return decorator
+    STRATEGIES[name.lower()] = strategy
+    return strategy
+
+
+def find_entry_point(name):
+    """
+    :return: the "module:class" path of an installed strategy plugin registered under the name, or None
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return None
+    found = entry_points()
+    group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, "select") else found.get(ENTRY_POINT_GROUP, [])
+    for entry_point in group:
+        if entry_point.name.lower() == name:
+            return entry_point.value
+    return None
+
+
+def get_strategy_class(name):
+    """
+    :param name: name of a strategy (case insensitive)
+    :return: the Strategy subclass registered under the name, imported if needed
+    """
+    name = name.lower()
+    strategy = STRATEGIES.get(name)
+    if strategy is None:
+        strategy = find_entry_point(name)
+        if strategy is None:
+            raise ValueError("Unknown strategy '{}', expected one of {} or an installed plugin".format(
+                name, ", ".join(sorted(STRATEGIES))))
+        logger.info("Using strategy plugin {} for '{}'".format(strategy, name))
+    if isinstance(strategy, str):
+        module_name, _, class_name = strategy.partition(":")
+        strategy = getattr(importlib.import_module(module_name), class_name)
+        STRATEGIES[name] = strategy
+    return strategy
+
+
+def strategy_from_params(params):
+    """
+    :param params: parameters unique to the strategy, with its name under "strategy"
+    :return: an initialized strategy
+    """
+    return get_strategy_class(params["strategy"])(params)
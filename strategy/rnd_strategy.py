@@ -1,10 +1,12 @@
 from math import floor
 
+from core.datafilter import DataFilter
 from core.event import Event
 from core.optionchain import OptionChain
 from core.order import Order
 from indicators.rnd import get_RND_distribution, Distribution
 from strategy.strategy import Strategy
+from utils.profiler import PROFILER
 
 class RndStrategy(Strategy):
     """
@@ -45,7 +47,8 @@ class RndStrategy(Strategy):
         orders = []
         best_expiry = event.find_expiry(preferred_dte=self.dte, allow0dte=False)
         chain = event.option_chains.get_option_chain_by_expiry(best_expiry)
-        distribution = get_RND_distribution(chain)
+        with PROFILER.timed("rnd_fit"):
+            distribution = get_RND_distribution(chain)
 
         options_by_rnd_profit = self.get_option_profits(chain=chain, distribution=distribution)
         for i in range(min(5, len(options_by_rnd_profit))):
@@ -57,6 +60,10 @@ class RndStrategy(Strategy):
 
         return orders
 
+    def get_data_filter(self):
+        # The RND fit needs the full chain of the selected expiry
+        return DataFilter.around(dtes=[self.dte])
+
     def take_assignment(self):
         return False
 
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+from core.datafilter import DataFilter
 from core.event import  Event
 
 
@@ -38,6 +39,33 @@ class Strategy:
         """
         pass
 
+    def get_data_filter(self):
+        """
+        Declare which slice of the option data the strategy can use, so it can be pushed down into the data query.
+        Strategies that do not override this get to see all option data.
+        :return: a DataFilter, or None if the strategy does not use option data at all
+        """
+        return DataFilter()
+
+    def get_wake_up(self, open_positions, event: Event):
+        """
+        Declare when the strategy wants to handle its next event, so that the engine can skip it until then. Called
+        after every handled event, once the portfolio is updated. Strategies that do not override this handle every
+        event.
+        :param open_positions: a list of (symbol, quantity) pairs, representing current portfolio holdings
+        :param event: the event just handled
+        :return: a WakeUp, or None to handle the next event
+        """
+        return None
+
+    def trades_baskets(self):
+        """
+        Strategies that can trade several underlyings out of one portfolio handle MultiEvents of baskets of tickers
+        (see core.event.MultiEvent); all others only ever get the Event of a single ticker
+        :return: True if the strategy handles MultiEvents
+        """
+        return False
+
     @abstractmethod
     def get_unique_id(self):
         """
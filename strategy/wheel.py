@@ -1,7 +1,9 @@
 from math import floor
 
+from core.datafilter import DataFilter
 from core.event import Event
 from core.order import Order
+from core.wakeup import WakeUp
 from strategy.strategy import Strategy
 from utils.tools import symbol_to_params
 
@@ -43,6 +45,17 @@ class Wheel(Strategy):
 
         return orders
 
+    def get_data_filter(self):
+        return DataFilter.around(dtes=[self.preferred_call_dte, self.preferred_put_dte],
+                                 deltas=[self.preferred_call_delta, self.preferred_put_delta])
+
+    def get_wake_up(self, open_positions, event: Event):
+        # While a put or call is written, wait for it to be assigned or expire
+        for symbol, _ in open_positions:
+            if symbol_to_params(symbol)[1] is not None:
+                return WakeUp()
+        return None
+
     def take_assignment(self):
         return True
 
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datasource.synthetic_source import SyntheticDataSource  # noqa: E402
+
+TICKERS = ["SPY", "QQQ"]
+FROMDATE = "2021-01-04"
+TODATE = "2021-03-01"
+
+# Small chains keep the tests fast: 4 weeklies, monthlies up to 120 days out, 21 strikes
+SYNTHETIC = {"type": "synthetic", "seed": 0, "weeklies": 4, "maxdte": 120, "strikes": 10,
+             "tickers": {"SPY": {"price": 370}, "QQQ": {"price": 310}}}
+
+STRATEGIES = [{"strategy": "buyandhold"},
+              {"strategy": "coveredcall", "dte": [2, 7], "delta": 0.3},
+              {"strategy": "wheel", "calldte": 14, "calldelta": 0.3, "putdte": 7, "putdelta": -0.3},
+              {"strategy": "rndstrategy", "dte": 7}]
+
+
+def make_config(datasource, **params):
+    """
+    :return: backtest configuration over the test tickers and dates, without result cache or prefetching
+    """
+    config = {"ticker": list(TICKERS), "fromDate": FROMDATE, "toDate": TODATE, "startcash": 1000000,
+              "datasource": datasource, "strategies": STRATEGIES, "resultcache": False, "prefetch": 0}
+    config.update(params)
+    return config
+
+
+def summarize(summary_by_ticker):
+    """
+    :return: {ticker: {strategy id: (performance, max drawdown, net value)}} of an engine run
+    """
+    return {ticker: {strategy_id: (perf, drawdown, netval) for perf, drawdown, netval, strategy_id, _ in summary}
+            for ticker, summary in summary_by_ticker.items()}
+
+
+def event_rows(event):
+    """
+    :return: sorted list of the (symbol, bid, ask, delta) quotes of every option of an Event
+    """
+    rows = []
+    for expiry in event.get_option_expiries():
+        for option in event.option_chains.get_option_chain_by_expiry(expiry).options:
+            rows.append((option.symbol, option.bid, option.ask, option.delta))
+    return sorted(rows)
+
+
+@pytest.fixture(scope="session")
+def option_frames():
+    """
+    Synthetic option rows of the test tickers, by ticker
+    """
+    source = SyntheticDataSource(SYNTHETIC)
+    return {ticker: source.query(ticker, "2020-12-01", "2021-04-01") for ticker in TICKERS}
+
+
+@pytest.fixture(scope="session")
+def sqlite_db(tmp_path_factory, option_frames):
+    """
+    :return: path of a SQLite DB holding the synthetic option rows
+    """
+    path = str(tmp_path_factory.mktemp("sqlite") / "options.db")
+    with sqlite3.connect(path) as db:
+        for data in option_frames.values():
+            data.to_sql("bt_OptionDataTable", db, index=False, if_exists="append")
+    return path
@@ -0,0 +1,41 @@
+import math
+import statistics
+
+import numpy as np
+import pytest
+
+from utils.analytics import STAT_NAMES, compute_stats, nav_matrix, rolling_drawdowns
+
+NAVS = np.array([[100.0, 110.0, 99.0, 121.0],
+                 [100.0, 100.0, 100.0, 100.0]])
+
+
+def test_stats():
+    # Three returns over a year of three periods
+    stats = compute_stats(NAVS, periods_per_year=3, rolling_window=2)
+    assert list(stats) == STAT_NAMES
+    returns = [0.1, -0.1, 121.0 / 99.0 - 1]
+    assert stats["total_return"] == pytest.approx([0.21, 0.0])
+    assert stats["cagr"] == pytest.approx([0.21, 0.0])
+    assert stats["volatility"][0] == pytest.approx(statistics.stdev(returns) * math.sqrt(3))
+    assert stats["sharpe"][0] == pytest.approx(statistics.mean(returns) / statistics.stdev(returns) * math.sqrt(3))
+    assert stats["max_drawdown"] == pytest.approx([-0.1, 0.0])
+    assert stats["calmar"][0] == pytest.approx(2.1)
+    # Trailing peaks of 100, 110, 110 and 121
+    assert stats["rolling_drawdown"] == pytest.approx([-0.025, 0.0])
+    # Undefined without any volatility or drawdown
+    assert np.isnan(stats["sharpe"][1]) and np.isnan(stats["sortino"][1]) and np.isnan(stats["calmar"][1])
+
+
+def test_rolling_drawdowns():
+    navs = np.array([[100.0, 90.0, 80.0, 85.0, 95.0]])
+    assert rolling_drawdowns(navs, 2)[0] == pytest.approx([0.0, -0.1, -1 / 9.0, 0.0, 0.0])
+    assert rolling_drawdowns(navs, 10)[0] == pytest.approx([0.0, -0.1, -0.2, -0.15, -0.05])
+
+
+def test_nav_matrix():
+    # Dates missing from a history carry its last net value forward
+    dates, navs = nav_matrix([[("start", 100), ("2021-01-04", 101), ("2021-01-05", 102)],
+                              [("start", 100), ("2021-01-05", 99)]])
+    assert dates == ["start", "2021-01-04", "2021-01-05"]
+    assert navs.tolist() == [[100, 101, 102], [100, 100, 99]]
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import SYNTHETIC, make_config
+from core.backtest_engine import BackTestEngine
+from datasource.synthetic_source import SyntheticDataSource
+from utils.data_loader import events_generator
+from utils.export import read_results
+
+# QQQ is only quoted from February on
+LATE_QQQ = dict(SYNTHETIC, tickers={"SPY": {"price": 370}, "QQQ": {"price": 310, "origin": "2021-02-01"}})
+
+
+def basket_orders(tmp_path, strategy):
+    path = str(tmp_path / "export")
+    BackTestEngine(make_config(LATE_QQQ, ticker=[["SPY", "QQQ"]], strategies=[strategy],
+                               export={"path": path, "format": "ndjson"})).run()
+    orders = read_results(path, "orders")
+    return orders.assign(underlying=orders.symbol.str.split(":").str[0])
+
+
+def test_buy_and_hold_split():
+    basket = BackTestEngine(make_config(SYNTHETIC, ticker=[["SPY", "QQQ"]], strategies=[{"strategy": "buyandhold"}]))
+    single = BackTestEngine(make_config(SYNTHETIC, startcash=500000, strategies=[{"strategy": "buyandhold"}]))
+    netval = basket.run()["SPY+QQQ"][0][2]
+    assert netval == pytest.approx(sum(summary[0][2] for summary in single.run().values()))
+
+
+def test_buy_and_hold_late_ticker(tmp_path):
+    orders = basket_orders(tmp_path, {"strategy": "buyandhold"})
+    assert orders.groupby("underlying").date.min().to_dict() == {"SPY": "2021-01-04", "QQQ": "2021-02-01"}
+    # Equal shares of the cash
+    values = (orders.qty * orders.price).tolist()
+    assert values[0] == pytest.approx(values[1], rel=0.01)
+
+
+def test_covered_call_basket(tmp_path):
+    orders = basket_orders(tmp_path, {"strategy": "coveredcall", "dte": 7, "delta": 0.3})
+    calls = orders[orders.symbol.str.contains(":CALL:")]
+    assert calls.groupby("underlying").date.min().to_dict() == {"SPY": "2021-01-04", "QQQ": "2021-02-01"}
+    shares = orders[orders.symbol == orders.underlying].groupby("underlying").qty.first()
+    assert (shares % 100 == 0).all() and (shares > 0).all()
+
+
+def test_unfit_strategy():
+    with pytest.raises(ValueError, match="cannot trade baskets"):
+        BackTestEngine(make_config(SYNTHETIC, ticker=["SPY+QQQ"], strategies=[{"strategy": "wheel"}])).run()
+
+
+def test_ticker_lookups():
+    source = SyntheticDataSource(LATE_QQQ)
+    for event in events_generator("SPY+QQQ", "2021-01-28", "2021-02-03", source=source):
+        assert event.get_basket() == ["SPY", "QQQ"]
+        option = event.find_option_by_delta("SPY", type="CALL", preferred_dte=7, preferred_delta=0.3)
+        assert option.symbol.startswith("SPY:")
+        assert event.find_expiry("SPY", preferred_dte=7) == option.expiry
+        put = event.find_option_by_min_credit("QQQ", type="PUT", preferred_credit=1.0, preferred_dte=7)
+        if event.quotedate < "2021-02-01":
+            assert event.get_tickers() == ["SPY"] and put is None
+        else:
+            assert put.symbol.startswith("QQQ:")
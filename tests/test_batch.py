@@ -0,0 +1,35 @@
+import os
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from core.batch import run_batch
+
+STRATEGIES = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": 7, "delta": 0.3}]
+
+
+def test_batch_matches_separate_runs():
+    configs = [make_config(SYNTHETIC, strategies=STRATEGIES),
+               make_config(SYNTHETIC, strategies=STRATEGIES, ticker=["QQQ"], fromDate="2021-02-01"),
+               make_config(SYNTHETIC, strategies=[{"strategy": "coveredcall", "dte": 45, "delta": 0.2}],
+                           toDate="2021-02-15"),
+               make_config(SYNTHETIC, strategies=STRATEGIES, pushdown="all"),
+               make_config(SYNTHETIC, strategies=STRATEGIES, pushdown="none", retain=1)]
+    batch = run_batch(configs)
+    for config, (summary_by_ticker, _) in zip(configs, batch):
+        assert summarize(summary_by_ticker) == summarize(BackTestEngine(config).run())
+
+
+def test_cache_keys_of_shared_load(tmp_path):
+    # The second configuration widens the DTE window of the first one's load
+    cache = str(tmp_path / "cache")
+    narrow = make_config(SYNTHETIC, strategies=STRATEGIES[1:], ticker=["SPY"], resultcache=cache)
+    wide = make_config(SYNTHETIC, strategies=[{"strategy": "coveredcall", "dte": 120, "delta": 0.2}],
+                       ticker=["SPY"], resultcache=cache)
+    run_batch([narrow, wide])
+    assert len(os.listdir(cache)) == 2
+    run_batch([narrow, wide])
+    assert len(os.listdir(cache)) == 2
+
+    # On its own, the first configuration loads a narrower window
+    BackTestEngine(narrow).run()
+    assert len(os.listdir(cache)) == 3
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import TICKERS, event_rows
+from core.datafilter import DataFilter
+from datasource.binary_source import BinaryDataSource, write_binary_store
+from datasource.sqlite_source import SQLiteDataSource
+
+FILTERS = [None, DataFilter(min_dte=0, max_dte=30), DataFilter(min_dte=0, max_dte=60, min_delta=0.2, max_delta=0.5)]
+
+
+def build_store(root, option_frames, encoding):
+    for ticker in TICKERS:
+        write_binary_store(str(root), ticker, option_frames[ticker], encoding)
+    return BinaryDataSource({"type": "binary", "path": str(root)})
+
+
+def assert_same_events(events, expected):
+    assert len(expected) > 0
+    assert [event.quotedate for event in events] == [event.quotedate for event in expected]
+    for event, other in zip(events, expected):
+        assert event.price == other.price
+        assert event_rows(event) == event_rows(other)
+
+
+@pytest.mark.parametrize("data_filter", FILTERS, ids=str)
+def test_plain_round_trip(tmp_path, option_frames, sqlite_db, data_filter):
+    store = build_store(tmp_path, option_frames, "plain")
+    db = SQLiteDataSource({"type": "sqlite", "path": sqlite_db})
+    for ticker in TICKERS:
+        assert_same_events(list(store.events(ticker, "2021-01-04", "2021-03-01", data_filter)),
+                           list(db.events(ticker, "2021-01-04", "2021-03-01", data_filter)))
+
+
+@pytest.mark.parametrize("data_filter", FILTERS, ids=str)
+def test_delta_round_trip(tmp_path, option_frames, sqlite_db, data_filter):
+    store = build_store(tmp_path, option_frames, "delta")
+    db = SQLiteDataSource({"type": "sqlite", "path": sqlite_db})
+    for ticker in TICKERS:
+        assert_same_events(list(store.events(ticker, "2021-01-04", "2021-03-01", data_filter)),
+                           list(db.events(ticker, "2021-01-04", "2021-03-01", data_filter)))
+
+
+def test_delta_seek(tmp_path, option_frames):
+    # Reads starting between keyframes apply the diffs from the keyframe before
+    store = build_store(tmp_path, option_frames, "delta")
+    full = list(store.events("SPY", "2020-12-01"))
+    for fromdate in ["2021-01-13", "2021-02-02", "2021-02-17"]:
+        tail = [event for event in full if event.quotedate >= fromdate]
+        assert_same_events(list(store.events("SPY", fromdate)), tail)
@@ -0,0 +1,33 @@
+import pytest
+
+from conftest import SYNTHETIC, make_config
+from core.backtest_engine import BackTestEngine
+from utils.bootstrap import run_bootstrap
+
+STRATEGIES = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": [7, 14], "delta": [0.2, 0.3]}]
+
+
+@pytest.fixture(scope="module")
+def run():
+    engine = BackTestEngine(make_config(SYNTHETIC, ticker=["SPY"], strategies=STRATEGIES))
+    return engine.run(), engine.nav_histories
+
+
+def test_intervals(run):
+    summary_by_ticker, nav_histories = run
+    params = {"bootstrap": {"samples": 500, "block": 5, "seed": 1}}
+    intervals = run_bootstrap(params, summary_by_ticker, nav_histories)
+    assert len(intervals["SPY"]) == 5
+    for perf, drawdown, _, strategy_id, _ in summary_by_ticker["SPY"]:
+        bounds = intervals["SPY"][strategy_id]
+        for name in ("performance", "max_drawdown", "sharpe"):
+            assert bounds[name][0] <= bounds[name][1] <= bounds[name][2]
+        assert bounds["performance"][0] <= perf <= bounds["performance"][2]
+        assert bounds["max_drawdown"][0] <= drawdown <= bounds["max_drawdown"][2]
+
+    # Seeded: the same intervals every time, also over a pool of workers
+    assert run_bootstrap(params, summary_by_ticker, nav_histories) == intervals
+    pooled = {"bootstrap": dict(params["bootstrap"], workers=2)}
+    assert run_bootstrap(pooled, summary_by_ticker, nav_histories) == intervals
+    other = {"bootstrap": dict(params["bootstrap"], seed=2)}
+    assert run_bootstrap(other, summary_by_ticker, nav_histories) != intervals
@@ -0,0 +1,40 @@
+import logging
+import shutil
+import sqlite3
+
+from conftest import SYNTHETIC, TODATE, make_config, summarize
+from core.backtest_engine import BackTestEngine
+
+
+def test_resume_extended_run(tmp_path, caplog):
+    checkpoint = {"path": str(tmp_path / "checkpoints"), "every": 5}
+    full = summarize(BackTestEngine(make_config(SYNTHETIC)).run())
+
+    BackTestEngine(make_config(SYNTHETIC, checkpoint=checkpoint, toDate="2021-02-01")).run()
+    with caplog.at_level(logging.INFO):
+        resumed = summarize(BackTestEngine(make_config(SYNTHETIC, checkpoint=checkpoint)).run())
+    assert "Resuming SPY from checkpoint" in caplog.text
+    assert resumed == full
+
+    # Rerunning resumes from the snapshots at the end of the run
+    again = summarize(BackTestEngine(make_config(SYNTHETIC, checkpoint=checkpoint, toDate=TODATE)).run())
+    assert again == full
+
+
+def test_changed_data(tmp_path, sqlite_db, caplog):
+    path = str(tmp_path / "options.db")
+    shutil.copy(sqlite_db, path)
+    datasource = {"type": "sqlite", "path": path}
+    checkpoint = {"path": str(tmp_path / "checkpoints"), "every": 5}
+    BackTestEngine(make_config(datasource, checkpoint=checkpoint, toDate="2021-02-01")).run()
+
+    # Corrected quotes before the checkpoint
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE bt_OptionDataTable SET OptBid = OptBid * 0.9, OptAsk = OptAsk * 1.1 "
+                   "WHERE QuoteDate < '2021-01-15'")
+    full = summarize(BackTestEngine(make_config(datasource)).run())
+    with caplog.at_level(logging.INFO):
+        rerun = summarize(BackTestEngine(make_config(datasource, checkpoint=checkpoint)).run())
+    assert "Resuming" not in caplog.text
+    assert "Option data of SPY up to its checkpoint at 2021-01-29 changed" in caplog.text
+    assert rerun == full
@@ -0,0 +1,59 @@
+import os
+
+from conftest import SYNTHETIC, make_config
+from core.backtest_engine import BackTestEngine
+from utils.export import EXPORT_FORMATS, MAX_QUEUED_BATCHES, ResultExporter, read_results
+
+
+def test_tiny_batches(tmp_path):
+    # Far more batches than the queue holds; the simulation waits for the writer instead of queueing them all
+    path = str(tmp_path / "export")
+    config = make_config(SYNTHETIC, ticker=["SPY"], toDate="2021-02-01")
+    summary = BackTestEngine(dict(config, export={"path": path, "format": "ndjson", "batch": 1})).run()
+    assert MAX_QUEUED_BATCHES < len(read_results(path, "orders"))
+    assert len(read_results(path, "summary")) == len(summary["SPY"])
+    assert sorted(read_results(path, "nav").strategy.unique()) == sorted(s[3] for s in summary["SPY"])
+
+
+def test_earlier_export_removed(tmp_path):
+    path = str(tmp_path / "export")
+    exporter = ResultExporter(path, "ndjson")
+    exporter.add("nav", "SPY", "BuyAndHold", "2021-01-04", 1000.0)
+    exporter.add("orders", "SPY", "BuyAndHold", "2021-01-04", "SPY", 10.0, 100.0)
+    exporter.close()
+
+    # A later export without any orders, in another format
+    exporter = ResultExporter(path, "parquet")
+    exporter.add("nav", "SPY", "BuyAndHold", "2021-01-05", 1010.0)
+    exporter.close()
+    assert read_results(path, "nav").date.tolist() == ["2021-01-05"]
+    assert len(read_results(path, "orders")) == 0
+    # Only the files of the later export are left
+    assert os.listdir(path) == ["nav" + EXPORT_FORMATS[exporter.fmt]]
+
+
+def test_nav_streamed(tmp_path):
+    path = str(tmp_path / "export")
+    config = make_config(SYNTHETIC, ticker=["SPY"], strategies=[{"strategy": "buyandhold"},
+                                                                 {"strategy": "coveredcall", "dte": 7, "delta": 0.3}])
+    plain = BackTestEngine(config)
+    plain.run()
+    histories = plain.nav_histories["SPY"]
+    assert len(histories) == 2
+
+    # Net values are streamed instead of kept in memory
+    exporting = BackTestEngine(dict(config, export={"path": path, "format": "ndjson"}))
+    exporting.run()
+    assert exporting.nav_histories == {"SPY": {}}
+    nav = read_results(path, "nav")
+    for strategy_id, history in histories.items():
+        rows = nav[nav.strategy == strategy_id]
+        assert list(zip(rows.date, rows.net_value)) == history[1:]
+
+    # Cached results are written out from their history
+    cache = str(tmp_path / "cache")
+    BackTestEngine(dict(config, resultcache=cache)).run()
+    BackTestEngine(dict(config, resultcache=cache, export={"path": path, "format": "ndjson"})).run()
+    columns = ["strategy", "date"]
+    cached = read_results(path, "nav")
+    assert cached.sort_values(columns).values.tolist() == nav.sort_values(columns).values.tolist()
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+
+from datasource.columnar_source import ColumnarDataSource, partition_path
+from datasource.ingest import ingest_file, publish_partitions
+
+
+def write_csv(path, quotedate, strikes, bid):
+    pd.DataFrame({"Ticker": "spy", "QuoteDate": quotedate, "StockPrice": 100.0, "OptExpDate": "2021-02-19",
+                  "OptStrike": strikes, "OptType": "C", "OptBid": bid, "OptAsk": bid + 0.1}).to_csv(path, index=False)
+    return str(path)
+
+
+def ingest(root, filenames):
+    """
+    Ingest files one by one, the way ingest.py does in its worker processes
+    """
+    staged, emptied = {}, set()
+    for index, filename in enumerate(filenames):
+        stats = ingest_file((filename, index, root, None))
+        for partition in stats["partitions"]:
+            staged.setdefault(partition, []).append(index)
+        emptied.update(stats["emptied"])
+    return publish_partitions(root, staged, emptied)
+
+
+def test_day_spread_over_files(tmp_path):
+    root = str(tmp_path / "store")
+    first = write_csv(tmp_path / "a.csv", "2021-01-04", [90, 95], 1.0)
+    second = write_csv(tmp_path / "b.csv", "2021-01-04", [95, 100], 2.0)
+    assert ingest(root, [first, second]) == (1, 0)
+
+    day = ColumnarDataSource({"path": root}).query("SPY", "2021-01-04")
+    assert dict(zip(day.OptionSymbol, day.OptBid)) == \
+        {"SPY:2021:02:19:CALL:90": 1.0, "SPY:2021:02:19:CALL:95": 2.0, "SPY:2021:02:19:CALL:100": 2.0}
+    assert os.listdir(os.path.dirname(partition_path(root, "SPY", "2021-01-04"))) == ["2021-01-04.parquet"]
+
+
+def test_day_without_valid_rows(tmp_path):
+    root = str(tmp_path / "store")
+    ingest(root, [write_csv(tmp_path / "a.csv", "2021-01-04", [90, 95], 1.0)])
+    assert os.path.exists(partition_path(root, "SPY", "2021-01-04"))
+
+    # Corrected dump of the day: zero bid and ask only
+    corrected = write_csv(tmp_path / "b.csv", "2021-01-04", [90, 95], 0.0)
+    pd.read_csv(corrected).assign(OptAsk=0.0).to_csv(corrected, index=False)
+    assert ingest(root, [corrected]) == (0, 1)
+    assert not os.path.exists(partition_path(root, "SPY", "2021-01-04"))
@@ -0,0 +1,61 @@
+from conftest import FROMDATE, SYNTHETIC, TICKERS, TODATE, make_config
+from core.backtest_engine import BackTestEngine
+from utils.metrics import RunMetrics, count_weekdays
+
+
+def read_metrics(path):
+    """
+    :return: {(metric name, labels string): value} of a Prometheus style metrics file
+    """
+    values = {}
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            name, value = line.split()
+            labels = ""
+            if "{" in name:
+                name, labels = name[:-1].split("{")
+            values[(name, labels)] = float(value)
+    return values
+
+
+def test_count_weekdays():
+    assert count_weekdays("2021-01-04", "2021-01-11") == 5
+    assert count_weekdays("2021-01-08", "2021-01-12") == 2
+    assert count_weekdays("2021-01-11", "2021-01-04") == 0
+
+
+def test_metrics_file(tmp_path):
+    path = str(tmp_path / "metrics.prom")
+    strategies = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": 7, "delta": 0.3}]
+    BackTestEngine(make_config(SYNTHETIC, strategies=strategies,
+                               metrics={"path": path, "every": 3600, "console": False})).run()
+    values = read_metrics(path)
+
+    for ticker in TICKERS:
+        labels = 'ticker="{}"'.format(ticker)
+        # Synthetic data is quoted on every weekday, so the estimate is exact
+        events = count_weekdays(FROMDATE, TODATE)
+        assert values[("backtest_events_total", labels)] == events
+        assert values[("backtest_events_expected", labels)] == events
+        assert 0 < values[("backtest_strategy_steps_total", labels)] <= events * len(strategies)
+        # Nothing is left to simulate
+        assert values[("backtest_eta_seconds", labels)] == 0
+    assert values[("backtest_events_per_second", "")] > 0
+    assert values[("backtest_simulate_seconds_total", "")] > 0
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_progress_line(capsys):
+    metrics = RunMetrics(interval=3600)
+    metrics.start([("SPY", 10), ("QQQ", 10)])
+    metrics.start_ticker("SPY")
+    for _ in range(5):
+        metrics.add_event("SPY", 2, 0.01, 0.09)
+    metrics.close()
+    line = capsys.readouterr().err
+    assert line.startswith("\rSPY 5/20 events (25%)") and line.endswith("\n")
+    # The time per event of SPY also estimates QQQ, which has not started yet
+    assert "ETA SPY 0s, all 1s" in line
+    assert "loading 10%" in line
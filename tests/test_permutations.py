@@ -0,0 +1,51 @@
+import pytest
+
+from utils.permutations import budget_shares, iter_sampled_permutations
+
+SPECS = [{"strategy": "coveredcall", "dte": [7, 14, 21, 30, 45], "delta": [0.1, 0.2, 0.3, 0.4]},
+         {"strategy": "wheel", "calldte": [7, 14], "calldelta": [0.2, 0.3, 0.4], "putdte": 7, "putdelta": -0.3},
+         {"strategy": "buyandhold"}]
+
+
+def sample(sampling):
+    return list(iter_sampled_permutations(SPECS, sampling))
+
+
+def test_grid():
+    permutations = sample(None)
+    assert len(permutations) == 20 + 6 + 1
+    assert len(set(str(sorted(p.items())) for p in permutations)) == len(permutations)
+    assert permutations[0] == {"strategy": "coveredcall", "dte": 7, "delta": 0.1}
+    assert permutations[-1] == {"strategy": "buyandhold"}
+
+
+@pytest.mark.parametrize("mode", ["random", "lhs"])
+def test_per_strategy(mode):
+    permutations = sample({"mode": mode, "n": 4})
+    counts = [sum(1 for p in permutations if p["strategy"] == spec["strategy"]) for spec in SPECS]
+    if mode == "random":
+        assert counts == [4, 4, 1]
+    else:
+        # Duplicate points on coarse axes are dropped
+        assert 1 <= counts[0] <= 4 and 1 <= counts[1] <= 4 and counts[2] == 1
+    for p in permutations:
+        assert not any(type(value) == list for value in p.values())
+
+
+@pytest.mark.parametrize("n", [1, 5, 10, 26, 27, 100])
+def test_budget(n):
+    permutations = sample({"mode": "budget", "n": n})
+    assert len(permutations) == min(n, 27)
+
+
+def test_budget_shares():
+    # One-point specs must not each take a permutation beyond the budget
+    assert sum(budget_shares([1 for _ in range(20)], 10)) == 10
+    assert budget_shares([20, 6, 1], 9) == [7, 2, 0]
+    assert budget_shares([3, 2], 10) == [3, 2]
+
+
+@pytest.mark.parametrize("mode", ["random", "lhs", "budget"])
+def test_seeded(mode):
+    assert sample({"mode": mode, "n": 5, "seed": 3}) == sample({"mode": mode, "n": 5, "seed": 3})
+    assert sample({"mode": mode, "n": 5, "seed": 3}) != sample({"mode": mode, "n": 5, "seed": 4})
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from conftest import SYNTHETIC, TICKERS, event_rows
+from datasource.sqlite_source import SQLiteDataSource
+from datasource.synthetic_source import SyntheticDataSource
+from utils.prefetch import ITEM, consume, prefetch, prefetch_events
+
+
+def produce_and_die(q, stop):
+    q.put((ITEM, "first"))
+    time.sleep(0.2)
+    # Killed without a chance to report anything, as by the OOM killer
+    os._exit(9)
+
+
+def failing_items():
+    yield 1
+    raise ValueError("broken data")
+
+
+def test_dead_producer_process():
+    ctx = multiprocessing.get_context()
+    q, stop = ctx.Queue(maxsize=2), ctx.Event()
+    producer = ctx.Process(target=produce_and_die, args=(q, stop), daemon=True)
+    producer.start()
+    items = consume(q, stop, producer)
+    assert next(items) == "first"
+    with pytest.raises(RuntimeError, match="exit code 9"):
+        next(items)
+
+
+def test_producer_error():
+    items = prefetch(failing_items(), depth=2)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="broken data"):
+        next(items)
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_prefetched_events(mode):
+    source = SyntheticDataSource(SYNTHETIC)
+    tickers = [(ticker, "2021-01-04") for ticker in TICKERS]
+    expected = list(prefetch_events(source, tickers, "2021-02-01", depth=0))
+    prefetched = list(prefetch_events(source, tickers, "2021-02-01", depth=4, mode=mode))
+    assert [(ticker, event is None) for ticker, event in prefetched] == \
+        [(ticker, event is None) for ticker, event in expected]
+    for (_, event), (_, other) in zip(prefetched, expected):
+        if event is not None:
+            assert event.quotedate == other.quotedate and event_rows(event) == event_rows(other)
+
+
+def test_process_with_open_connection(sqlite_db):
+    # The worker process opens a connection of its own, and leaves the one of this process alone
+    source = SQLiteDataSource({"type": "sqlite", "path": sqlite_db})
+    fingerprint = source.get_fingerprint("SPY", "2021-01-04")
+    expected = list(source.events("SPY", "2021-01-04", "2021-02-01"))
+    db = source.connect()
+    prefetched = list(prefetch_events(source, [("SPY", "2021-01-04")], "2021-02-01", depth=4, mode="process"))
+    assert [event.quotedate for _, event in prefetched[:-1]] == [event.quotedate for event in expected]
+    assert source.db is db and source.get_fingerprint("SPY", "2021-01-04") == fingerprint
+    assert len(source.query("SPY", "2021-01-04", "2021-01-06")) > 0
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from utils.profiler import PROFILER, percentile
+
+STRATEGIES = [{"strategy": "coveredcall", "dte": [7, 14], "delta": 0.3}, {"strategy": "rndstrategy", "dte": 7}]
+
+
+@pytest.fixture
+def profiler():
+    PROFILER.reset()
+    PROFILER.enabled = True
+    yield PROFILER
+    PROFILER.enabled = False
+    PROFILER.reset()
+
+
+def test_report(tmp_path, profiler):
+    config = make_config(SYNTHETIC, ticker=["SPY"], strategies=STRATEGIES)
+    engine = BackTestEngine(config)
+    results = summarize(engine.run())
+    report = profiler.write(str(tmp_path / "profile.json"))
+    with open(str(tmp_path / "profile.json")) as f:
+        assert json.load(f) == report
+
+    stages = report["stages"]
+    assert set(stages) >= {"query", "decode", "chain_build", "handle_event", "update_portfolio", "rnd_fit"}
+    assert stages["rnd_fit"]["within"] == "handle_event"
+    assert stages["rnd_fit"]["total"] <= stages["handle_event"]["total"]
+    nr_events = len(next(iter(engine.nav_histories["SPY"].values()))) - 1
+    assert report["events"]["count"] == nr_events
+    assert report["events"]["p50"] <= report["events"]["p99"] <= report["events"]["max"]
+    # Three strategies, all of them stepped on every event at least to update their portfolios
+    assert sorted(report["strategies"]) == sorted(results["SPY"])
+    assert stages["update_portfolio"]["count"] == 3 * nr_events
+    for entry in report["strategies"].values():
+        assert entry["total"] == pytest.approx(sum(t for stage, t in entry.items() if stage != "total"))
+
+    # Profiling does not change results
+    profiler.enabled = False
+    assert summarize(BackTestEngine(config).run()) == results
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 100
+    assert percentile([], 50) is None
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from core.datafilter import DataFilter
+from core.event import Event
+from core.option import Option
+from core.optionchainset import OptionChainSet
+from datasource.datasource import apply_data_filter, build_query
+
+
+@pytest.fixture(scope="module")
+def datasources(sqlite_db):
+    return {"synthetic": SYNTHETIC, "sqlite": {"type": "sqlite", "path": sqlite_db}}
+
+
+@pytest.fixture(scope="module")
+def full_loads(datasources):
+    """
+    Results of loading all option data, by data source
+    """
+    return {name: summarize(BackTestEngine(make_config(params, pushdown="none")).run())
+            for name, params in datasources.items()}
+
+
+def test_sources_agree(full_loads):
+    assert full_loads["sqlite"] == full_loads["synthetic"]
+
+
+@pytest.mark.parametrize("source", ["synthetic", "sqlite"])
+@pytest.mark.parametrize("pushdown", ["dte", "all"])
+def test_pushdown_matches_full_load(datasources, full_loads, source, pushdown):
+    results = summarize(BackTestEngine(make_config(datasources[source], pushdown=pushdown)).run())
+    assert results == full_loads[source]
+
+
+def gapped_days():
+    """
+    Option rows of two days; the first has no expiry within 50 days besides a 0 DTE one
+    """
+    rows = []
+    for quotedate, dtes in [("2021-01-04", [0, 80, 90, 200]), ("2021-01-05", [10, 80, 90])]:
+        for dte in dtes:
+            rows.append({"Ticker": "SPY", "QuoteDate": quotedate, "DaysToExp": dte, "GreekDelta": 0.5})
+    return pd.DataFrame(rows)
+
+
+def test_window_keeps_first_expiry_beyond():
+    data_filter = DataFilter(min_dte=0, max_dte=50)
+    filtered = apply_data_filter(gapped_days(), data_filter)
+    assert filtered.groupby("QuoteDate").DaysToExp.apply(list).to_dict() == \
+        {"2021-01-04": [0, 80], "2021-01-05": [10, 80]}
+
+
+def test_query_keeps_first_expiry_beyond():
+    db = sqlite3.connect(":memory:")
+    gapped_days().to_sql("bt_OptionDataTable", db, index=False)
+    query_str, query_params = build_query("SPY", "2021-01-01", data_filter=DataFilter(min_dte=0, max_dte=50))
+    queried = pd.read_sql_query(query_str, db, params=query_params)
+    assert queried.groupby("QuoteDate").DaysToExp.apply(sorted).to_dict() == \
+        {"2021-01-04": [0, 80], "2021-01-05": [10, 80]}
+
+
+def test_find_option_without_expiry():
+    # Only a 0 DTE expiry, which is not allowed by default
+    chains = OptionChainSet("SPY")
+    chains.add_option(Option(ticker="SPY", expiry="2021-01-04", symbol="SPY:2021:01:04:CALL:370", strike=370,
+                             type="CALL", bid=1.0, ask=1.1, oi=10, vol=10, quotedate="2021-01-04", underlying=370,
+                             daytoexp=0, iv=0.2, delta=0.5, gamma=0.01, theta=-0.1, vega=0.1))
+    event = Event(ticker="SPY", quotedate="2021-01-04", price=370, option_chains=chains)
+    assert event.find_expiry(preferred_dte=7) is None
+    assert event.find_option_by_delta(type="CALL", preferred_dte=7, preferred_delta=0.3) is None
+    assert event.find_option_by_min_credit(type="CALL", preferred_credit=1.0, preferred_dte=7) is None
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from strategy import registry
+from strategy.buyandhold import BuyAndHold
+from strategy.registry import get_strategy_class, register_strategy, strategy_from_params
+from strategy.wheel import Wheel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLUGIN = """
+from strategy.buyandhold import BuyAndHold
+
+
+class PluginHold(BuyAndHold):
+    def get_unique_id(self):
+        return "PluginHold"
+"""
+
+
+@pytest.fixture
+def strategies(monkeypatch):
+    """
+    Registrations of a test are undone afterwards
+    """
+    monkeypatch.setattr(registry, "STRATEGIES", dict(registry.STRATEGIES))
+
+
+def test_known_names(strategies):
+    assert get_strategy_class("Wheel") is Wheel
+    strategy = strategy_from_params({"strategy": "buyandhold"})
+    assert type(strategy) is BuyAndHold and strategy.params == {"strategy": "buyandhold"}
+    with pytest.raises(ValueError, match="Unknown strategy 'nosuchstrategy'"):
+        strategy_from_params({"strategy": "nosuchstrategy"})
+
+
+def test_register(strategies):
+    @register_strategy("MyHold")
+    class MyHold(BuyAndHold):
+        def get_unique_id(self):
+            return "MyHold"
+
+    assert get_strategy_class("myhold") is MyHold
+    register_strategy("pathhold", "strategy.buyandhold:BuyAndHold")
+    assert get_strategy_class("pathhold") is BuyAndHold
+    # Registered strategies run like the built in ones
+    summary = summarize(BackTestEngine(make_config(SYNTHETIC, strategies=[{"strategy": "myhold"},
+                                                                          {"strategy": "buyandhold"}])).run())
+    for by_id in summary.values():
+        assert by_id["MyHold"] == by_id["BuyAndHold"]
+
+
+def test_entry_point(strategies, tmp_path, monkeypatch):
+    # An installed package advertising a strategy in its entry points
+    (tmp_path / "holdplugin.py").write_text(PLUGIN)
+    dist_info = tmp_path / "holdplugin-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: holdplugin\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text("[{}]\npluginhold = holdplugin:PluginHold\n".format(
+        registry.ENTRY_POINT_GROUP))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    strategy = strategy_from_params({"strategy": "PluginHold"})
+    assert type(strategy).__name__ == "PluginHold" and isinstance(strategy, BuyAndHold)
+    # The class is looked up once
+    assert registry.STRATEGIES["pluginhold"] is type(strategy)
+
+
+def test_lazy_imports():
+    # Strategies and their dependencies are only imported once used
+    code = "import sys; import core.backtest_engine; from strategy.registry import strategy_from_params; " \
+           "strategy_from_params({'strategy': 'wheel'}); " \
+           "print(sorted(m for m in ('scipy', 'matplotlib', 'strategy.rnd_strategy', 'strategy.wheel') " \
+           "if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "['strategy.wheel']"
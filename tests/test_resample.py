@@ -0,0 +1,58 @@
+import logging
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from strategy.covered_call import CoveredCall
+from utils.resample import get_step_period, parse_resample, rank_correlation
+
+STRATEGIES = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": [7, 14], "delta": 0.3}]
+
+
+def test_steps_on_first_day_of_period(monkeypatch):
+    stepped = []
+    handle_event = CoveredCall.handle_event
+
+    def record(self, open_positions, totalcash, totalvalue, event):
+        stepped.append(event.quotedate)
+        return handle_event(self, open_positions, totalcash, totalvalue, event)
+
+    monkeypatch.setattr(CoveredCall, "handle_event", record)
+    engine = BackTestEngine(make_config(SYNTHETIC, ticker=["SPY"], strategies=STRATEGIES, resample=5))
+    engine.run()
+
+    # Portfolios are still marked every trading day
+    dates = [quotedate for quotedate, _ in engine.nav_histories["SPY"]["BuyAndHold"][1:]]
+    first_days = {}
+    for quotedate in dates:
+        first_days.setdefault(get_step_period(quotedate, 5, "2021-01-04"), quotedate)
+    first_days = set(first_days.values())
+    assert len(stepped) > 0 and set(stepped) <= first_days
+    assert len(first_days) < len(dates)
+
+
+def test_buy_and_hold_unchanged():
+    # Buying on the first day and holding on does not depend on the stepping
+    config = make_config(SYNTHETIC, strategies=STRATEGIES[:1])
+    assert summarize(BackTestEngine(dict(config, resample="weekly")).run()) == \
+        summarize(BackTestEngine(config).run())
+
+
+def test_divergence_report(caplog):
+    config = make_config(SYNTHETIC, ticker=["SPY"], strategies=STRATEGIES, resample={"every": 5, "compare": True})
+    with caplog.at_level(logging.INFO):
+        BackTestEngine(config).run()
+    messages = [record.getMessage() for record in caplog.records if record.name == "utils.resample"]
+    assert messages[0] == "Divergence of results stepped every 5 days from full resolution"
+    assert sum(1 for m in messages if m.startswith("SPY Strategy ")) == 3
+    assert messages[-1].startswith("SPY Performance diff avg")
+    # Buying and holding is the same at both resolutions
+    assert any(m.startswith("SPY Strategy BuyAndHold") and "(diff +0.00%) MaxDrawdown" in m for m in messages)
+
+
+def test_parse_and_rank_correlation():
+    assert parse_resample(None) == (None, False)
+    assert parse_resample(1) == (None, False)
+    assert parse_resample({"every": "weekly", "compare": True}) == ("weekly", True)
+    assert rank_correlation([1, 2, 3], [10, 20, 30]) == 1.0
+    assert rank_correlation([1, 2, 3], [3, 2, 1]) == -1.0
+    assert rank_correlation([1, 1], [1, 2]) is None
@@ -0,0 +1,53 @@
+import logging
+import os
+
+import core.option
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine, spawn_strategies
+from utils.result_cache import FILE_DIGESTS, ResultCache
+
+STRATEGIES = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": [7, 14], "delta": 0.3}]
+
+
+def cached_count(caplog):
+    return [int(record.getMessage().split()[2]) for record in caplog.records
+            if record.getMessage().endswith("taken from the result cache")]
+
+
+def test_hits_and_misses(tmp_path, caplog):
+    config = make_config(SYNTHETIC, ticker=["SPY"], strategies=STRATEGIES, resultcache=str(tmp_path / "cache"))
+    with caplog.at_level(logging.INFO):
+        first = summarize(BackTestEngine(config).run())
+        assert cached_count(caplog) == [0]
+        caplog.clear()
+
+        # Rerun: everything comes from the cache
+        assert summarize(BackTestEngine(config).run()) == first
+        assert cached_count(caplog) == [3]
+        caplog.clear()
+
+        # New permutations, within the same DTE window
+        strategies = [STRATEGIES[0], {"strategy": "coveredcall", "dte": [7, 14], "delta": [0.3, 0.2]}]
+        BackTestEngine(dict(config, strategies=strategies)).run()
+        assert cached_count(caplog) == [3]
+        caplog.clear()
+
+        # Changed option data
+        BackTestEngine(dict(config, datasource=dict(SYNTHETIC, seed=1))).run()
+        assert cached_count(caplog) == [0]
+    assert len(os.listdir(str(tmp_path / "cache"))) == 3 + 2 + 3
+
+
+def test_code_changes(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    strategy = spawn_strategies({"strategy": "buyandhold"})[0]
+    key = cache.make_key(strategy, "SPY", "2021-01-04", "2021-03-01", 1000000, "data")
+
+    # Option pricing is not part of the strategy module, but decides results all the same
+    path = core.option.__file__
+    digest = FILE_DIGESTS.get(path)
+    FILE_DIGESTS[path] = "edited"
+    try:
+        assert cache.make_key(strategy, "SPY", "2021-01-04", "2021-03-01", 1000000, "data") != key
+    finally:
+        FILE_DIGESTS[path] = digest
@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+
+
+@pytest.fixture(scope="module")
+def plain_run():
+    engine = BackTestEngine(make_config(SYNTHETIC))
+    return summarize(engine.run()), engine.nav_histories
+
+
+def check_top_histories(engine, summary, histories, top, metric):
+    """
+    Check that the engine kept the histories of the top portfolios by the metric, as simulated by the plain run
+    """
+    for ticker, by_id in summary.items():
+        kept = engine.nav_histories[ticker]
+        # Portfolios with equal results may tie for the last place
+        values = sorted((metric(*by_id[strategy_id]) for strategy_id in by_id), reverse=True)
+        assert sorted((metric(*by_id[strategy_id]) for strategy_id in kept), reverse=True) == values[:top]
+        # Histories read back from the result cache hold lists instead of tuples
+        for strategy_id, history in kept.items():
+            assert [tuple(entry) for entry in history] == histories[ticker][strategy_id]
+
+
+@pytest.mark.parametrize("metric_name, metric", [
+    ("performance", lambda perf, drawdown, netval: perf),
+    ("calmar", lambda perf, drawdown, netval: perf / max(abs(drawdown), 1.0)),
+])
+def test_top_histories(plain_run, metric_name, metric):
+    summary, histories = plain_run
+    engine = BackTestEngine(make_config(SYNTHETIC, retain={"top": 2, "metric": metric_name}))
+    # Summaries still cover all portfolios
+    assert summarize(engine.run()) == summary
+    check_top_histories(engine, summary, histories, 2, metric)
+
+
+def test_cached_without_history(tmp_path, plain_run):
+    summary, histories = plain_run
+    config = make_config(SYNTHETIC, retain=2, resultcache=str(tmp_path / "cache"))
+    BackTestEngine(config).run()
+    # All results come from the cache the second time, the top ones are simulated again for their histories
+    engine = BackTestEngine(config)
+    assert summarize(engine.run()) == summary
+    check_top_histories(engine, summary, histories, 2, lambda perf, drawdown, netval: perf)
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError, match="Unknown retain metric"):
+        BackTestEngine(make_config(SYNTHETIC, retain={"top": 2, "metric": "sortino"}))
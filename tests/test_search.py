@@ -0,0 +1,29 @@
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from core.search import ParameterSearch
+
+SPACE = {"strategy": "coveredcall", "dte": [2, 7, 14, 21, 30], "delta": [0.1, 0.2, 0.3, 0.4, 0.5]}
+
+
+def test_search(monkeypatch):
+    config = make_config(SYNTHETIC, ticker=["SPY"], strategies=[SPACE],
+                         search={"budget": 10, "batch": 4, "workers": 1, "objective": "calmar", "seed": 0})
+    search = ParameterSearch(config)
+    best = []
+    evaluate = search.evaluate
+
+    def evaluate_and_track(candidates, data_filter, pool):
+        evaluate(candidates, data_filter, pool)
+        best.append(max(value for value, _, _ in search.evaluated.values()))
+
+    monkeypatch.setattr(search, "evaluate", evaluate_and_track)
+    summary = search.run()["SPY"]
+
+    # Batches of 4 up to the budget, never losing the best candidate
+    assert len(best) == 3 and len(search.evaluated) == 10 and len(summary) == 10
+    assert best == sorted(best)
+
+    # Evaluations match separate runs of the candidates
+    params = [candidate_params for _, candidate_params, _ in search.evaluated.values()]
+    separate = summarize(BackTestEngine(make_config(SYNTHETIC, ticker=["SPY"], strategies=params)).run())
+    assert summarize({"SPY": summary}) == separate
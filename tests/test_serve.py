@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import TICKERS, make_config
+from backtest import run_test
+from datasource.binary_source import write_binary_store
+from serve import JobRunner, summary_to_json
+
+JOB_STRATEGIES = [[{"strategy": "coveredcall", "dte": 7, "delta": 0.3}],
+                  [{"strategy": "coveredcall", "dte": 14, "delta": 0.2}],
+                  [{"strategy": "wheel", "calldte": 14, "calldelta": 0.3, "putdte": 7, "putdelta": -0.3}],
+                  [{"strategy": "rndstrategy", "dte": 7}]]
+
+
+@pytest.fixture(scope="module")
+def delta_store(tmp_path_factory, option_frames):
+    root = str(tmp_path_factory.mktemp("binary"))
+    for ticker in TICKERS:
+        write_binary_store(root, ticker, option_frames[ticker], "delta")
+    return {"type": "binary", "path": root}
+
+
+def test_concurrent_jobs(delta_store):
+    # Jobs loading all option data share cached events, decoding their option chains at the same time
+    configs = [make_config(delta_store, strategies=strategies, pushdown=pushdown)
+               for pushdown in ["none", "dte"] for strategies in JOB_STRATEGIES]
+    expected = [json.dumps(summary_to_json(run_test(config)), sort_keys=True) for config in configs]
+
+    runner = JobRunner(workers=4, cache_entries=16)
+    try:
+        for _ in range(2):
+            job_ids = [runner.submit(config) for config in configs]
+            jobs = [runner.get_job(job_id, wait=300) for job_id in job_ids]
+            assert [job["status"] for job in jobs] == ["done" for _ in configs]
+            assert [json.dumps(job["result"], sort_keys=True) for job in jobs] == expected
+        assert runner.get_status()["sources"][0]["hits"] > 0
+    finally:
+        runner.executor.shutdown()
+
+
+def test_waiting_exclusive_job():
+    # A job forking workers waits for the running job, and jobs coming in meanwhile wait for it
+    runner = JobRunner(workers=1)
+    order = []
+
+    def job(name, exclusive):
+        runner.enter(exclusive)
+        order.append(name)
+        runner.leave()
+
+    runner.enter(False)
+    threads = [threading.Thread(target=job, args=("exclusive", True))]
+    threads[0].start()
+    while runner.waiting_exclusive == 0:
+        time.sleep(0.01)
+    threads += [threading.Thread(target=job, args=("plain", False)) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    assert order == []
+    runner.leave()
+    for thread in threads:
+        thread.join(10)
+    assert order == ["exclusive", "plain", "plain", "plain"]
+    runner.executor.shutdown()
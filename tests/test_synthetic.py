@@ -0,0 +1,52 @@
+import pandas as pd
+
+import benchmark
+from conftest import SYNTHETIC
+from datasource.synthetic_source import SyntheticDataSource
+
+
+def test_same_data_whatever_the_range():
+    whole = SyntheticDataSource(SYNTHETIC).query("SPY", "2021-01-04", "2021-03-01")
+    part = SyntheticDataSource(SYNTHETIC).query("SPY", "2021-02-01", "2021-02-15")
+    overlap = whole[(whole.QuoteDate >= "2021-02-01") & (whole.QuoteDate < "2021-02-15")].reset_index(drop=True)
+    pd.testing.assert_frame_equal(overlap, part.reset_index(drop=True))
+
+
+def test_seed_and_fingerprint():
+    source = SyntheticDataSource(SYNTHETIC)
+    reseeded = SyntheticDataSource(dict(SYNTHETIC, seed=1))
+    prices = [s.query("SPY", "2021-01-04", "2021-02-01").groupby("QuoteDate").StockPrice.first()
+              for s in (source, reseeded)]
+    assert not prices[0].equals(prices[1])
+    # The fingerprint only depends on the parameters
+    fingerprint = source.get_fingerprint("SPY", "2021-01-04")
+    assert fingerprint == SyntheticDataSource(SYNTHETIC).get_fingerprint("SPY", "2021-06-01")
+    assert fingerprint != reseeded.get_fingerprint("SPY", "2021-01-04")
+    assert fingerprint != source.get_fingerprint("QQQ", "2021-01-04")
+
+
+def test_consistent_quotes():
+    data = SyntheticDataSource(SYNTHETIC).query("SPY", "2021-01-04", "2021-02-01")
+    assert (pd.to_datetime(data.QuoteDate).dt.weekday < 5).all()
+    assert (data.OptBid <= data.OptAsk).all() and (data.OptBid >= 0).all()
+    calls, puts = data[data.OptType == "CALL"], data[data.OptType == "PUT"]
+    assert calls.GreekDelta.between(0, 1).all() and puts.GreekDelta.between(-1, 0).all()
+    # Put-call parity holds for the quotes of the same strike and expiry
+    merged = calls.merge(puts, on=["QuoteDate", "OptExpDate", "OptStrike"], suffixes=("_call", "_put"))
+    assert (merged.GreekDelta_call - merged.GreekDelta_put).round(9).eq(1).all()
+    # Strikes are on a fixed grid, so symbols recur from day to day
+    assert data.groupby("OptionSymbol").QuoteDate.nunique().max() > 1
+
+
+def test_benchmarks_run():
+    for name in ("decode", "find_option_by_delta", "update_portfolio"):
+        run, unit = benchmark.BENCHMARKS[name]()
+        assert run() > 0 and len(unit) > 0
+
+
+def test_compare():
+    result = {"unit": "events", "rate": 100.0, "peak_mb": 10.0}
+    assert not benchmark.compare("decode", result, None)[1]
+    assert not benchmark.compare("decode", result, {"rate": 110.0, "peak_mb": 10.0})[1]
+    assert benchmark.compare("decode", result, {"rate": 200.0, "peak_mb": 10.0})[1]
+    assert benchmark.compare("decode", result, {"rate": 100.0, "peak_mb": 5.0})[1]
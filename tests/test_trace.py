@@ -0,0 +1,52 @@
+import pytest
+
+from conftest import SYNTHETIC, make_config
+from core.backtest_engine import BackTestEngine
+from utils.export import read_results
+from utils.trace import TraceWriter, read_trace
+
+STRATEGIES = [{"strategy": "buyandhold"}, {"strategy": "coveredcall", "dte": 7, "delta": 0.3}]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    trace = TraceWriter(path)
+    trace.strategy(0, "BuyAndHold")
+    trace.nav("2021-01-04", 0, 1000.0)
+    trace.order("2021-01-04", 0, "SPY:2021:01:15:CALL:380", -2)
+    trace.close()
+    # Net values before the first event have no ticker
+    assert list(read_trace(path)) == [
+        ("nav", {"date": "2021-01-04", "ticker": None, "strategy": "BuyAndHold", "net_value": 1000.0}),
+        ("order", {"date": "2021-01-04", "ticker": None, "strategy": "BuyAndHold",
+                   "symbol": "SPY:2021:01:15:CALL:380", "qty": -2.0})]
+
+    with open(path, "wb") as f:
+        f.write(b"not a trace")
+    with pytest.raises(ValueError):
+        list(read_trace(path))
+
+
+def test_run_trace(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    export = str(tmp_path / "export")
+    plain = BackTestEngine(make_config(SYNTHETIC, strategies=STRATEGIES))
+    plain.run()
+    BackTestEngine(make_config(SYNTHETIC, strategies=STRATEGIES, trace=path,
+                               export={"path": export, "format": "ndjson"})).run()
+    records = list(read_trace(path))
+
+    for ticker, histories in plain.nav_histories.items():
+        events = [fields["date"] for kind, fields in records if kind == "event" and fields["ticker"] == ticker]
+        for strategy_id, history in histories.items():
+            navs = [(fields["date"], fields["net_value"]) for kind, fields in records
+                    if kind == "nav" and fields["ticker"] == ticker and fields["strategy"] == strategy_id]
+            assert navs == history[1:]
+            assert [quotedate for quotedate, _ in navs] == events
+
+    # Fills (assignments and expiries included) are the exported orders; orders are what strategies asked for
+    fills = [(f["ticker"], f["strategy"], f["date"], f["symbol"], f["qty"], f["price"]) for kind, f in records
+             if kind == "fill"]
+    assert fills == [tuple(row) for row in read_results(export, "orders").values.tolist()]
+    orders = [(f["ticker"], f["strategy"], f["date"], f["symbol"]) for kind, f in records if kind == "order"]
+    assert len(orders) > 0 and set(orders) <= set(fill[:4] for fill in fills)
@@ -0,0 +1,52 @@
+import pytest
+
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+from core.event import Event
+from core.wakeup import WakeUp
+from strategy.buyandhold import BuyAndHold
+from strategy.covered_call import CoveredCall
+from strategy.strategy import Strategy
+from strategy.wheel import Wheel
+
+SLEEPERS = [BuyAndHold, CoveredCall, Wheel]
+
+
+def count_steps(monkeypatch):
+    steps = []
+    for cls in SLEEPERS:
+        def record(self, open_positions, totalcash, totalvalue, event, handle_event=cls.handle_event):
+            steps.append(event.quotedate)
+            return handle_event(self, open_positions, totalcash, totalvalue, event)
+        monkeypatch.setattr(cls, "handle_event", record)
+    return steps
+
+
+def test_same_results_without_wake_ups(monkeypatch):
+    steps = count_steps(monkeypatch)
+    sleeping = BackTestEngine(make_config(SYNTHETIC))
+    results = summarize(sleeping.run())
+    nr_sleeping = len(steps)
+
+    # Strategies stepped on every event
+    for cls in SLEEPERS:
+        monkeypatch.setattr(cls, "get_wake_up", Strategy.get_wake_up)
+    del steps[:]
+    awake = BackTestEngine(make_config(SYNTHETIC))
+    assert summarize(awake.run()) == results
+    assert awake.nav_histories == sleeping.nav_histories
+    assert nr_sleeping < len(steps) / 2
+
+
+@pytest.mark.parametrize("price, quotedate, fires", [(100.0, "2021-01-05", False), (89.0, "2021-01-05", True),
+                                                     (111.0, "2021-01-05", True), (100.0, "2021-01-15", True)])
+def test_fires(price, quotedate, fires):
+    wake_up = WakeUp(date="2021-01-15", price_below=90.0, price_above=110.0)
+    assert wake_up.fires(Event("SPY", quotedate, price, None)) == fires
+
+
+def test_at_expiry():
+    positions = [("SPY", 100), ("SPY:2021:02:19:CALL:400", -1), ("SPY:2021:01:29:PUT:350", -1)]
+    assert WakeUp.at_expiry(positions).date == "2021-01-29"
+    assert WakeUp.at_expiry(positions, "CALL").date == "2021-02-19"
+    assert WakeUp.at_expiry([("SPY", 100)]).date is None
@@ -0,0 +1,20 @@
+from conftest import SYNTHETIC, make_config, summarize
+from core.backtest_engine import BackTestEngine
+
+WINDOWS = [["2021-01-04", "2021-02-01"], ["2021-01-15", "2021-02-15"], ["2021-02-01", "2021-03-01"]]
+
+
+def test_windows_match_separate_runs():
+    engine = BackTestEngine(make_config(SYNTHETIC, walkforward={"windows": WINDOWS, "workers": 2}))
+    summary_by_window = engine.run_windows()
+    assert list(summary_by_window) == [tuple(window) for window in WINDOWS]
+    for (fromdate, todate), summary_by_ticker in summary_by_window.items():
+        separate = BackTestEngine(make_config(SYNTHETIC, fromDate=fromdate, toDate=todate))
+        assert summarize(summary_by_ticker) == summarize(separate.run())
+        assert engine.nav_histories[fromdate, todate] == separate.nav_histories
+
+
+def test_rolling_windows():
+    engine = BackTestEngine(make_config(SYNTHETIC, walkforward={"length": 28, "step": 14}))
+    assert engine.get_windows() == [("2021-01-04", "2021-02-01"), ("2021-01-18", "2021-02-15"),
+                                    ("2021-02-01", "2021-03-01")]
@@ -1,17 +1,54 @@
 import logging
 
+import numpy as np
+
+from utils.analytics import STAT_NAMES, aggregate_by, compute_stats, nav_matrix
+
 logger = logging.getLogger(__name__)
 
 
-def mean(arr):
-    return sum(arr) / len(arr)
+def collect_portfolios(stratname, ticker_summary, nav_histories=None):
+    """
+    :param stratname: name of the strategy to collect the portfolios of
+    :param ticker_summary: result of a BacktestEngine test-run
+    :param nav_histories: dictionary of {ticker: {strategy_id: net value history}} of the same run, or None
+    :return: (list of strategies, dictionary of statistic names to arrays with a value per strategy) pair; return and
+             risk statistics (see utils.analytics) are only included if the net value histories of all of them are given
+    """
+    strategies = []
+    values = {"performance": [], "maxdrawdown": []}
+    stats = []
+    complete = True
+    for ticker, summary in ticker_summary.items():
+        entries = [(perf, drawdown, id, strat) for perf, drawdown, netval, id, strat in summary
+                   if strat.params["strategy"] == stratname]
+        for perf, drawdown, id, strat in entries:
+            strategies.append(strat)
+            values["performance"].append(perf)
+            values["maxdrawdown"].append(drawdown)
+        if nav_histories is not None and len(entries) > 0 and \
+                all(id in nav_histories.get(ticker, {}) for _, _, id, _ in entries):
+            # All portfolios of a ticker at once
+            _, navs = nav_matrix([nav_histories[ticker][id] for _, _, id, _ in entries])
+            stats.append(compute_stats(navs))
+        elif len(entries) > 0:
+            complete = False
 
+    values = {name: np.array(column, dtype=float) for name, column in values.items()}
+    # Statistics of only some of the portfolios (see "retain" in the Readme) would not line up with the rest
+    if len(stats) > 0 and complete:
+        for name in STAT_NAMES:
+            values[name] = np.concatenate([s[name] for s in stats])
+    return strategies, values
 
-def analyze(test_params, ticker_summary):
+
+def analyze(test_params, ticker_summary, nav_histories=None):
     """
     Run some quick statistical analysis based on configuraiton file
     :param test_params: contains parameters to evaluate
     :param ticker_summary: result of a BacktestEngine test-run based on the same test_params configuration
+    :param nav_histories: net value histories of the same test-run (see BackTestEngine.nav_histories), for return and
+                          risk statistics per parameter value; None to only use final performance and drawdown
     """
 
     if "analyze" in test_params:
@@ -20,28 +57,24 @@ def analyze(test_params, ticker_summary):
             params = detail["params"]
 
             logger.info("Statistics strategy {}".format(stratname))
+            strategies, values = collect_portfolios(stratname, ticker_summary, nav_histories)
+            if len(strategies) == 0:
+                continue
 
             for p in params:
-                buckets_perf = {}
-                buckets_drawdown = {}
-                param_val_list = []
-
                 # Do bucketing of summary results based on param list
-                for ticker, summary in ticker_summary.items():
-                    for perf, drawdown, netval, id, strat in summary:
-                        if strat.params["strategy"] == stratname:
-                            param_val = strat.params[p]
-                            if param_val not in buckets_perf:
-                                buckets_perf[param_val] = []
-                                buckets_drawdown[param_val] = []
-                                param_val_list.append(param_val)
-                            buckets_perf[param_val].append(perf)
-                            buckets_drawdown[param_val].append(drawdown)
+                param_vals, counts, aggregates = aggregate_by(values, [strat.params[p] for strat in strategies])
 
                 # Print stats
-                param_val_list.sort()
-                for pv in param_val_list:
-                    avg_perf = mean(buckets_perf[pv])
-                    avg_drawdown = mean(buckets_drawdown[pv])
-                    logger.info("{} val {} avg_performance {} avg_maxdrawdown {}".format(p, pv, avg_perf, avg_drawdown))
-
+                for k, pv in enumerate(param_vals):
+                    logger.info("{} val {} avg_performance {} avg_maxdrawdown {}".format(
+                        p, pv, aggregates["performance"]["mean"][k], aggregates["maxdrawdown"]["mean"][k]))
+                    if "cagr" in aggregates:
+                        logger.info("{} val {} portfolios {} avg_cagr {:.2f}% avg_volatility {:.2f}% avg_sharpe {:.2f} "
+                                    "avg_sortino {:.2f} avg_calmar {:.2f} avg_rolling_drawdown {:.2f}% "
+                                    "performance min {:.2f}% max {:.2f}%".format(
+                                        p, pv, counts[k], aggregates["cagr"]["mean"][k] * 100,
+                                        aggregates["volatility"]["mean"][k] * 100, aggregates["sharpe"]["mean"][k],
+                                        aggregates["sortino"]["mean"][k], aggregates["calmar"]["mean"][k],
+                                        aggregates["rolling_drawdown"]["mean"][k] * 100,
+                                        aggregates["performance"]["min"][k], aggregates["performance"]["max"][k]))
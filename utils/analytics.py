@@ -0,0 +1,148 @@
+"""
+Vectorized performance analytics over the net value histories of many portfolios at once: every portfolio is a row
+of a single 2-D array, so statistics of sweeps with thousands of portfolios take a handful of NumPy operations.
+All returns, volatilities and drawdowns are fractions (0.05 for 5%).
+"""
+import numpy as np
+
+# Events are trading days
+PERIODS_PER_YEAR = 252
+
+# Trailing window of the rolling drawdown statistic: a quarter
+ROLLING_WINDOW = 63
+
+STAT_NAMES = ["total_return", "cagr", "volatility", "sharpe", "sortino", "max_drawdown", "calmar", "rolling_drawdown"]
+
+
+def forward_fill(values):
+    """
+    :param values: 2-D array with NaN gaps; the first column must not have any
+    :return: copy of the array with every NaN replaced by the last value before it on its row
+    """
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+
+def nav_matrix(histories):
+    """
+    :param histories: list of net value histories (see Portfolio.net_value_history), lists of (date, net value)
+                      pairs starting with a ("start", starting cash) entry
+    :return: (list of dates, 2-D array with a row of net values per history and a column per date) pair; histories
+             missing dates of others carry their last net value forward
+    """
+    if len(histories) == 0:
+        return [], np.zeros((0, 0))
+    columns = [tuple(zip(*history)) for history in histories]
+    dates = columns[0][0]
+    if all(history_dates == dates for history_dates, _ in columns):
+        # The common case: portfolios simulated over the same events
+        return list(dates), np.array([values for _, values in columns], dtype=float)
+
+    dates = ["start"] + sorted(set(d for history_dates, _ in columns for d in history_dates[1:]))
+    position = {d: i for i, d in enumerate(dates)}
+    navs = np.full((len(histories), len(dates)), np.nan)
+    for row, (history_dates, values) in enumerate(columns):
+        navs[row, [position[d] for d in history_dates]] = values
+    return dates, forward_fill(navs)
+
+
+def daily_returns(navs):
+    """
+    :param navs: 2-D array of net values, a row per portfolio
+    :return: 2-D array of returns from one column to the next (one column less); 0 where the net value was 0
+    """
+    previous = navs[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous != 0, navs[:, 1:] / previous - 1, 0.0)
+
+
+def drawdowns(navs):
+    """
+    :param navs: 2-D array of net values, a row per portfolio
+    :return: 2-D array of the drawdown from the running peak at every date (0 at a new peak, negative below it)
+    """
+    peaks = np.maximum.accumulate(navs, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peaks > 0, navs / peaks - 1, 0.0)
+
+
+def rolling_drawdowns(navs, window):
+    """
+    :param navs: 2-D array of net values, a row per portfolio
+    :param window: number of dates to look back for the peak
+    :return: 2-D array of the drawdown from the peak of the trailing window at every date
+    """
+    padded = np.concatenate([np.repeat(navs[:, :1], window - 1, axis=1), navs], axis=1)
+    peaks = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1).max(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peaks > 0, navs / peaks - 1, 0.0)
+
+
+def compute_stats(navs, periods_per_year=PERIODS_PER_YEAR, risk_free=0.0, rolling_window=ROLLING_WINDOW):
+    """
+    :param navs: 2-D array of net values, a row per portfolio and a column per date
+    :param periods_per_year: number of dates per year, to annualize with
+    :param risk_free: annual risk free rate, for the Sharpe and Sortino ratios
+    :param rolling_window: number of dates to look back for the peak of rolling_drawdown, the average drawdown from the
+                           peak of the trailing window
+    :return: dictionary of STAT_NAMES to 1-D arrays with a value per portfolio; NaN where undefined
+    """
+    returns = daily_returns(navs)
+    excess = returns - risk_free / periods_per_year
+    years = returns.shape[1] / float(periods_per_year)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = navs[:, -1] / navs[:, 0]
+        total_return = growth - 1
+        cagr = np.where(growth > 0, np.power(np.abs(growth), 1 / years) - 1, np.nan) if years > 0 else \
+            np.full(len(navs), np.nan)
+
+        mean = excess.mean(axis=1) if returns.shape[1] > 0 else np.full(len(navs), np.nan)
+        std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.full(len(navs), np.nan)
+        downside = np.sqrt((np.minimum(excess, 0) ** 2).mean(axis=1)) if returns.shape[1] > 0 else \
+            np.full(len(navs), np.nan)
+        volatility = std * np.sqrt(periods_per_year)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), np.nan)
+        sortino = np.where(downside > 0, mean / downside * np.sqrt(periods_per_year), np.nan)
+
+        max_drawdown = drawdowns(navs).min(axis=1)
+        calmar = np.where(max_drawdown < 0, cagr / np.abs(max_drawdown), np.nan)
+        rolling_drawdown = rolling_drawdowns(navs, rolling_window).mean(axis=1) if navs.shape[1] > 0 else \
+            np.full(len(navs), np.nan)
+
+    return {"total_return": total_return, "cagr": cagr, "volatility": volatility, "sharpe": sharpe,
+            "sortino": sortino, "max_drawdown": max_drawdown, "calmar": calmar, "rolling_drawdown": rolling_drawdown}
+
+
+def aggregate_by(values, keys):
+    """
+    Group per portfolio values by a key, such as the value of a strategy parameter
+    :param values: dictionary of names to 1-D arrays, with a value per portfolio
+    :param keys: list of keys, one per portfolio
+    :return: (sorted list of distinct keys, array of portfolio counts per key, dictionary of names to dictionaries of
+             "mean", "min" and "max" arrays with an entry per key); NaN values are left out
+    """
+    distinct = sorted(set(keys))
+    index = {key: i for i, key in enumerate(distinct)}
+    groups = np.array([index[key] for key in keys], dtype=int)
+    counts = np.bincount(groups, minlength=len(distinct))
+
+    # Sort portfolios by group, to reduce every group's slice at once
+    order = np.argsort(groups, kind="stable")
+    starts = np.searchsorted(groups[order], np.arange(len(distinct)))
+
+    aggregates = {}
+    for name, column in values.items():
+        column = np.asarray(column, dtype=float)
+        finite = ~np.isnan(column)
+        totals = np.bincount(groups, weights=np.where(finite, column, 0.0), minlength=len(distinct))
+        nr_finite = np.bincount(groups, weights=finite, minlength=len(distinct))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(nr_finite > 0, totals / nr_finite, np.nan)
+        sorted_column = column[order]
+        aggregates[name] = {"mean": means,
+                            "min": np.fmin.reduceat(sorted_column, starts) if len(column) > 0 else means,
+                            "max": np.fmax.reduceat(sorted_column, starts) if len(column) > 0 else means}
+    return distinct, counts, aggregates
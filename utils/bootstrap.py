@@ -0,0 +1,153 @@
+"""
+Block bootstrap of the daily returns of every portfolio, for confidence intervals on return, max drawdown and Sharpe
+ratio (see "bootstrap" in the Readme). Resampled paths are drawn as blocks of consecutive days, to keep the short term
+dependence between returns (volatility clusters, option expiry cycles). All portfolios are resampled with the same
+blocks, and every worker process handles a chunk of portfolios with all resamples vectorized over NumPy arrays.
+"""
+import logging
+import multiprocessing
+import time
+import warnings
+
+import numpy as np
+
+from utils.analytics import PERIODS_PER_YEAR, daily_returns, nav_matrix
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the number of values in a (portfolios, resamples, days) block computed at once
+MAX_BLOCK_VALUES = 1 << 22
+
+# Portfolios handed to a worker process at once
+CHUNK_ROWS = 16
+
+# Worker processes by default: none, as analyses also run next to other jobs (see serve.py), and forking a pool of
+# processes for every one of them costs more than it saves on all but the largest sweeps
+DEFAULT_WORKERS = 1
+
+
+def block_indices(nr_days, block, samples, seed):
+    """
+    :param nr_days: length of the return series
+    :param block: number of consecutive days per block
+    :param samples: number of resampled paths
+    :param seed: random seed; the same seed gives the same paths
+    :return: 2-D array of day indices, a row of nr_days indices per resampled path; blocks wrap around the end
+    """
+    rng = np.random.RandomState(seed)
+    nr_blocks = -(-nr_days // block)
+    starts = rng.randint(0, nr_days, size=(samples, nr_blocks))
+    indices = (starts[:, :, None] + np.arange(block)) % nr_days
+    return indices.reshape(samples, nr_blocks * block)[:, :nr_days]
+
+
+def resample_metrics(returns, indices, periods_per_year=PERIODS_PER_YEAR):
+    """
+    :param returns: 2-D array of daily returns, a row per portfolio
+    :param indices: 2-D array of day indices, a row per resampled path (see block_indices)
+    :return: dictionary of "performance", "max_drawdown" (both fractions) and "sharpe" to 2-D arrays with a row per
+             portfolio and a column per resampled path
+    """
+    rows, samples = returns.shape[0], indices.shape[0]
+    metrics = {name: np.empty((rows, samples)) for name in ("performance", "max_drawdown", "sharpe")}
+    batch = max(1, MAX_BLOCK_VALUES // max(1, rows * indices.shape[1]))
+    for start in range(0, samples, batch):
+        paths = returns[:, indices[start:start + batch]]
+        growth = np.cumprod(1 + paths, axis=2)
+        # The path starts at 1, which counts as a peak as well
+        peaks = np.maximum(np.maximum.accumulate(growth, axis=2), 1.0)
+        std = paths.std(axis=2, ddof=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics["performance"][:, start:start + batch] = growth[:, :, -1] - 1
+            metrics["max_drawdown"][:, start:start + batch] = np.minimum((growth / peaks - 1).min(axis=2), 0.0)
+            metrics["sharpe"][:, start:start + batch] = np.where(
+                std > 0, paths.mean(axis=2) / std * np.sqrt(periods_per_year), np.nan)
+    return metrics
+
+
+def bootstrap_chunk(returns, block, samples, seed, quantiles):
+    """
+    Worker task: resample a chunk of portfolios
+    :return: dictionary of metric names to 2-D arrays with a row per portfolio and a column per quantile
+    """
+    metrics = resample_metrics(returns, block_indices(returns.shape[1], block, samples, seed))
+    with warnings.catch_warnings():
+        # Sharpe ratios are undefined for portfolios that never change in value
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {name: np.nanquantile(values, quantiles, axis=1).T for name, values in metrics.items()}
+
+
+def bootstrap(returns, block=10, samples=1000, seed=0, confidence=0.9, pool=None):
+    """
+    :param returns: 2-D array of daily returns, a row per portfolio
+    :param block: number of consecutive days per resampled block
+    :param samples: number of resampled paths
+    :param seed: random seed
+    :param confidence: width of the confidence intervals
+    :param pool: a multiprocessing pool to spread the portfolios over, or None to run in this process
+    :return: dictionary of "performance", "max_drawdown" and "sharpe" to 2-D arrays with a row per portfolio, and
+             lower bound, median and upper bound columns
+    """
+    quantiles = [(1 - confidence) / 2, 0.5, (1 + confidence) / 2]
+    if len(returns) == 0 or returns.shape[1] < 2:
+        return {name: np.full((len(returns), 3), np.nan) for name in ("performance", "max_drawdown", "sharpe")}
+    block = max(1, min(block, returns.shape[1]))
+
+    args = [(returns[i:i + CHUNK_ROWS], block, samples, seed, quantiles) for i in range(0, len(returns), CHUNK_ROWS)]
+    chunks = pool.starmap(bootstrap_chunk, args) if pool is not None else [bootstrap_chunk(*a) for a in args]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def run_bootstrap(test_params, ticker_summary, nav_histories):
+    """
+    Bootstrap every portfolio with a net value history, and log its confidence intervals
+    :param test_params: test parameters with a "bootstrap" entry (see Readme)
+    :param ticker_summary: result of a BacktestEngine test-run
+    :param nav_histories: dictionary of {ticker: {strategy_id: net value history}} of the same run
+    :return: dictionary of {ticker: {strategy_id: {metric name: (lower, median, upper)}}}; performance and max
+             drawdown in percents
+    """
+    settings = test_params.get("bootstrap", None)
+    if not settings or nav_histories is None:
+        return {}
+    if type(settings) != dict:
+        settings = {}
+    block = settings.get("block", 10)
+    samples = settings.get("samples", 1000)
+    confidence = settings.get("confidence", 0.9)
+    workers = settings.get("workers", DEFAULT_WORKERS)
+
+    started = time.time()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    intervals = {}
+    try:
+        for ticker, summary in ticker_summary.items():
+            histories = nav_histories.get(ticker, {})
+            ids = [id for _, _, _, id, _ in summary if id in histories]
+            if len(ids) == 0:
+                continue
+            _, navs = nav_matrix([histories[id] for id in ids])
+            bounds = bootstrap(daily_returns(navs), block, samples, settings.get("seed", 0), confidence, pool)
+            intervals[ticker] = {}
+            for row, id in enumerate(ids):
+                intervals[ticker][id] = {"performance": tuple(bounds["performance"][row] * 100),
+                                         "max_drawdown": tuple(bounds["max_drawdown"][row] * 100),
+                                         "sharpe": tuple(bounds["sharpe"][row])}
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    logger.info("Bootstrap of {} portfolios with {} resamples of {} day blocks took {:.2f}s; {:.0f}% intervals".format(
+        sum(len(by_id) for by_id in intervals.values()), samples, block, time.time() - started, confidence * 100))
+    for ticker, summary in ticker_summary.items():
+        for perf, drawdown, netval, id, _ in summary:
+            if id not in intervals.get(ticker, {}):
+                continue
+            bounds = intervals[ticker][id]
+            logger.info("{} Strategy {} Performance {:.2f}% [{:.2f}%, {:.2f}%] MaxDrawdown {:.2f}% [{:.2f}%, {:.2f}%] "
+                        "Sharpe [{:.2f}, {:.2f}]".format(
+                            ticker, id, perf, bounds["performance"][0], bounds["performance"][2], drawdown,
+                            bounds["max_drawdown"][0], bounds["max_drawdown"][2], bounds["sharpe"][0],
+                            bounds["sharpe"][2]))
+    return intervals
@@ -0,0 +1,71 @@
+"""
+Periodic snapshots of strategy and portfolio state, so that a run can resume where it stopped, or be extended with
+newly ingested trading days without simulating the past again
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from utils.result_cache import code_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpointer:
+    """
+    Stores the state of all strategies and portfolios simulated for a ticker (strategy state, cash, holdings, last
+    prices, net value history) as a pickle file in a checkpoint folder.
+
+    A checkpoint is keyed by everything that decides the simulation up to its date except for the end date, so a run
+    with a later end date picks up from the latest snapshot. The option data up to its date can only be fingerprinted
+    once the date is known, so the data fingerprint is stored along with the snapshot instead (see load()).
+    """
+    def __init__(self, path, every=20):
+        """
+        :param path: checkpoint folder
+        :param every: number of events between two snapshots
+        """
+        self.path = path
+        self.every = every
+
+    def make_key(self, ticker, fromdate, startcash, strategy_list, extra=None):
+        """
+        :param ticker: string of the ticker ("SPY", "QQQ", ...)
+        :param fromdate: date string (YYYY-MM-DD) the run started from
+        :param startcash: starting cash amount
+        :param strategy_list: list of simulated strategies (their params are part of the key)
+        :param extra: any other JSON serializable engine settings that change results
+        :return: the checkpoint key string
+        """
+        key_data = {"ticker": ticker, "fromdate": fromdate, "startcash": startcash,
+                    "params": [strat.params for strat in strategy_list],
+                    "code": [code_fingerprint(strat) for strat in strategy_list], "extra": extra}
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        """
+        :return: (quotedate of the last simulated event, strategy list, portfolio list, data fingerprint), or None if no
+                 checkpoint
+        """
+        try:
+            with open(os.path.join(self.path, key + ".pkl"), "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return state["quotedate"], state["strategies"], state["portfolios"], state.get("data", None)
+
+    def save(self, key, quotedate, strategy_list, portfolio_list, data_fingerprint=None):
+        """
+        Snapshot the state after simulating the event of the given quotedate
+        :param data_fingerprint: fingerprint of the option data simulated so far (see DataSource.get_fingerprint)
+        """
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, key + ".pkl")
+        tmp_filename = filename + ".tmp{}".format(os.getpid())
+        with open(tmp_filename, "wb") as f:
+            # Portfolios refer to their strategies; pickling both together keeps them linked
+            pickle.dump({"quotedate": quotedate, "strategies": strategy_list, "portfolios": portfolio_list,
+                         "data": data_fingerprint}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
@@ -0,0 +1,192 @@
+"""
+Columnar export of backtest results, for loading into notebooks: net value histories, executed orders (fills,
+including assignments and expiries) and final summaries of every portfolio, each written to its own file in an export
+folder. Rows are buffered on the simulation thread and written in batches by a background thread; the simulation waits
+for the writer once MAX_QUEUED_BATCHES batches are queued, so only a few batches of rows are ever kept in memory.
+
+Formats:
+ - parquet: <path>/nav.parquet, orders.parquet, summary.parquet; written a row group per batch
+ - arrow: Arrow IPC (Feather v2) files, <path>/nav.arrow, ...; can be memory mapped, and read zero-copy
+ - ndjson: one JSON object per line, <path>/nav.ndjson, ...; needs no pyarrow
+"""
+import importlib.util
+import json
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "ndjson": ".ndjson"}
+
+# Columns of every dataset, along with their Arrow type names
+DATASETS = {
+    "nav": [("ticker", "string"), ("strategy", "string"), ("date", "string"), ("net_value", "float64")],
+    "orders": [("ticker", "string"), ("strategy", "string"), ("date", "string"), ("symbol", "string"),
+               ("qty", "float64"), ("price", "float64")],
+    "summary": [("ticker", "string"), ("strategy", "string"), ("name", "string"), ("performance", "float64"),
+                ("max_drawdown", "float64"), ("net_value", "float64"), ("params", "string")],
+}
+
+# Hand buffered rows of a dataset over to the writer thread once it holds this many rows
+DEFAULT_BATCH_ROWS = 65536
+
+# Batches waiting for the writer thread; once that many are queued, the simulation waits for the writer to catch up
+MAX_QUEUED_BATCHES = 2
+
+
+def get_schema(dataset):
+    import pyarrow as pa
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in DATASETS[dataset]])
+
+
+class ResultExporter:
+    """
+    Streams result rows to columnar files; call close() at the end of the run to write out the remaining rows
+    """
+    def __init__(self, path, fmt="parquet", batch_rows=DEFAULT_BATCH_ROWS):
+        """
+        :param path: folder to write the export files into (files of an earlier export are removed)
+        :param fmt: one of EXPORT_FORMATS
+        :param batch_rows: number of rows per written batch
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError("Unknown export format '{}', expected one of {}".format(fmt, ", ".join(EXPORT_FORMATS)))
+        if fmt != "ndjson" and importlib.util.find_spec("pyarrow") is None:
+            logger.info("pyarrow is not installed; exporting results as ndjson instead of {}".format(fmt))
+            fmt = "ndjson"
+        self.path = path
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        os.makedirs(path, exist_ok=True)
+        self.clear()
+
+        self.strategies = {}
+        self.buffers = {dataset: {name: [] for name, _ in columns} for dataset, columns in DATASETS.items()}
+        self.writers = {}
+        self.queue = queue.Queue(maxsize=MAX_QUEUED_BATCHES)
+        self.error = None
+        self.thread = threading.Thread(target=self.write_batches, daemon=True)
+        self.thread.start()
+
+    def get_file(self, dataset):
+        return os.path.join(self.path, dataset + EXPORT_FORMATS[self.fmt])
+
+    def clear(self):
+        """
+        Remove the files of an earlier export, in any format: read_results() picks up the first format it finds, and
+        datasets without rows in this run are not written at all
+        """
+        for dataset in DATASETS:
+            for ext in EXPORT_FORMATS.values():
+                filename = os.path.join(self.path, dataset + ext)
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def open_writer(self, dataset):
+        if self.fmt == "ndjson":
+            return open(self.get_file(dataset), "w")
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.get_file(dataset), get_schema(dataset))
+        import pyarrow as pa
+        return pa.ipc.new_file(self.get_file(dataset), get_schema(dataset))
+
+    def write_batch(self, dataset, columns):
+        writer = self.writers.get(dataset)
+        if writer is None:
+            writer = self.writers[dataset] = self.open_writer(dataset)
+        if self.fmt == "ndjson":
+            names = list(columns)
+            for row in zip(*columns.values()):
+                writer.write(json.dumps(dict(zip(names, row))) + "\n")
+        else:
+            import pyarrow as pa
+            writer.write_table(pa.Table.from_pydict(columns, schema=get_schema(dataset)))
+
+    def write_batches(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.write_batch(*batch)
+            except Exception as e:
+                # Reported on close, the simulation goes on
+                self.error = e
+
+    def flush(self, dataset):
+        columns = self.buffers[dataset]
+        if len(next(iter(columns.values()))) > 0:
+            self.queue.put((dataset, columns))
+            self.buffers[dataset] = {name: [] for name in columns}
+
+    def add(self, dataset, *values):
+        columns = self.buffers[dataset]
+        for column, value in zip(columns.values(), values):
+            column.append(value)
+        if len(columns["ticker"]) >= self.batch_rows:
+            self.flush(dataset)
+
+    def strategy(self, index, strategy_id):
+        """
+        Define the strategy of an index, as used by fill() and nav()
+        """
+        self.strategies[index] = strategy_id
+
+    def fill(self, ticker, quotedate, index, symbol, qty, price):
+        self.add("orders", ticker, self.strategies[index], quotedate, symbol, float(qty), float(price))
+
+    def nav(self, ticker, quotedate, index, net_value):
+        self.add("nav", ticker, self.strategies[index], quotedate, float(net_value))
+
+    def nav_history(self, ticker, strategy_id, net_value_history):
+        """
+        :param net_value_history: list of (date, net value) pairs; the ("start", cash) entry is left out
+        """
+        for quotedate, net_value in net_value_history[1:]:
+            self.add("nav", ticker, strategy_id, quotedate, float(net_value))
+
+    def summary(self, ticker, summary):
+        """
+        :param summary: list of (performance, maxdrawdown, netvalue, strategy_id, strategy) entries of a ticker
+        """
+        for perf, drawdown, netval, strategy_id, strategy in summary:
+            self.add("summary", ticker, strategy_id, strategy.params["strategy"], float(perf), float(drawdown),
+                     float(netval), json.dumps(strategy.params, sort_keys=True))
+
+    def close(self):
+        for dataset in DATASETS:
+            self.flush(dataset)
+        self.queue.put(None)
+        self.thread.join()
+        for dataset, writer in self.writers.items():
+            writer.close()
+        if self.error is not None:
+            raise IOError("Exporting results to {} failed: {}".format(self.path, self.error))
+        logger.info("Results exported to {} ({})".format(self.path, self.fmt))
+
+
+def read_results(path, dataset):
+    """
+    :param path: an export folder written by ResultExporter
+    :param dataset: "nav", "orders" or "summary"
+    :return: pandas DataFrame of the dataset; empty if nothing was exported
+    """
+    import pandas as pd
+
+    for fmt, ext in EXPORT_FORMATS.items():
+        filename = os.path.join(path, dataset + ext)
+        if not os.path.exists(filename):
+            continue
+        if fmt == "parquet":
+            return pd.read_parquet(filename)
+        if fmt == "arrow":
+            import pyarrow as pa
+            with pa.memory_map(filename) as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        return pd.read_json(filename, lines=True, dtype=False)
+    return pd.DataFrame(columns=[name for name, _ in DATASETS[dataset]])
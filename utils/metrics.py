@@ -0,0 +1,212 @@
+"""
+Live progress and throughput metrics of a running backtest, published every few seconds: rewritten as a Prometheus
+style text file (for node_exporter's textfile collector, or just `cat`), and as a progress line on the console.
+Per event the engine only adds to a few counters; everything else is computed when publishing.
+"""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+# Default number of seconds between updates of the metrics file and progress line
+DEFAULT_INTERVAL = 5.0
+
+
+def count_weekdays(fromdate, todate):
+    """
+    :return: number of weekdays from fromdate (included) until todate (not included), both "YYYY-MM-DD" strings;
+             an estimate of the number of events, ignoring holidays
+    """
+    start = date(int(fromdate[0:4]), int(fromdate[5:7]), int(fromdate[8:10]))
+    end = date(int(todate[0:4]), int(todate[5:7]), int(todate[8:10]))
+    days = (end - start).days
+    if days <= 0:
+        return 0
+    weeks, rest = divmod(days, 7)
+    return weeks * 5 + sum(1 for i in range(rest) if (start + timedelta(days=i)).weekday() < 5)
+
+
+def get_rss():
+    """
+    :return: resident memory of this process in bytes, or None if it cannot be told
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak instead of current resident memory; in KB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except ImportError:
+        return None
+
+
+def per_ticker(values):
+    """
+    :return: list of (labels, value) samples of a {ticker: value} dictionary
+    """
+    return [({"ticker": ticker}, value) for ticker, value in values.items()]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "{}h{:02d}m".format(seconds // 3600, seconds // 60 % 60)
+    if seconds >= 60:
+        return "{}m{:02d}s".format(seconds // 60, seconds % 60)
+    return "{}s".format(seconds)
+
+
+class RunMetrics:
+    """
+    Counts events and strategy steps per ticker, along with the time spent waiting for events to load and the time
+    spent simulating them, and publishes rates and ETAs from them
+    """
+    def __init__(self, path=None, interval=DEFAULT_INTERVAL, console=True):
+        """
+        :param path: file to rewrite with the metrics, or None
+        :param interval: seconds between updates
+        :param console: True to show a progress line on stderr
+        """
+        self.path = path
+        self.interval = interval
+        self.console = console
+        self.started = time.perf_counter()
+        self.next_publish = self.started + interval
+        self.expected = {}
+        self.events = {}
+        self.steps = {}
+        self.ticker_time = {}
+        self.load_time = 0.0
+        self.simulate_time = 0.0
+        self.ticker = None
+
+    def start(self, expected_events):
+        """
+        :param expected_events: list of (ticker, estimated number of events) pairs, in the order they are simulated
+        """
+        for ticker, expected in expected_events:
+            self.expected[ticker] = expected
+            self.events[ticker] = 0
+            self.steps[ticker] = 0
+
+    def start_ticker(self, ticker):
+        self.ticker = ticker
+
+    def add_event(self, ticker, steps, load_seconds, simulate_seconds):
+        """
+        :param ticker: ticker of the event
+        :param steps: number of strategies that handled the event
+        :param load_seconds: time spent waiting for the event to be loaded
+        :param simulate_seconds: time spent simulating the event
+        """
+        self.events[ticker] += 1
+        self.steps[ticker] += steps
+        self.load_time += load_seconds
+        self.simulate_time += simulate_seconds
+        self.ticker_time[ticker] = self.ticker_time.get(ticker, 0.0) + load_seconds + simulate_seconds
+        if time.perf_counter() >= self.next_publish:
+            self.publish()
+
+    def get_eta(self, ticker):
+        """
+        :return: estimated seconds left for the ticker, or None before any of its events were simulated
+        """
+        if self.events[ticker] == 0:
+            return None
+        remaining = max(0, self.expected[ticker] - self.events[ticker])
+        return remaining * self.ticker_time[ticker] / self.events[ticker]
+
+    def report(self):
+        """
+        :return: list of (metric name, help text, type, list of (labels, value) samples) entries
+        """
+        elapsed = time.perf_counter() - self.started
+        events = sum(self.events.values())
+        steps = sum(self.steps.values())
+        busy = self.load_time + self.simulate_time
+
+        # Tickers not started yet are estimated at the average time per event so far
+        seconds_per_event = busy / events if events > 0 else None
+        eta = {}
+        for ticker in self.expected:
+            eta[ticker] = self.get_eta(ticker)
+            if eta[ticker] is None and seconds_per_event is not None:
+                eta[ticker] = self.expected[ticker] * seconds_per_event
+        total_eta = None if any(value is None for value in eta.values()) else sum(eta.values())
+
+        metrics = [
+            ("backtest_elapsed_seconds", "Seconds since the run started", "gauge", [({}, elapsed)]),
+            ("backtest_events_total", "Events simulated", "counter", per_ticker(self.events)),
+            ("backtest_events_expected", "Estimated number of events to simulate", "gauge", per_ticker(self.expected)),
+            ("backtest_strategy_steps_total", "Events handled by strategies", "counter", per_ticker(self.steps)),
+            ("backtest_events_per_second", "Events simulated per second", "gauge",
+             [({}, events / elapsed if elapsed > 0 else 0.0)]),
+            ("backtest_strategy_steps_per_second", "Events handled by strategies per second", "gauge",
+             [({}, steps / elapsed if elapsed > 0 else 0.0)]),
+            ("backtest_load_seconds_total", "Seconds spent waiting for events to load", "counter",
+             [({}, self.load_time)]),
+            ("backtest_simulate_seconds_total", "Seconds spent simulating events", "counter",
+             [({}, self.simulate_time)]),
+            ("backtest_eta_seconds", "Estimated seconds left", "gauge",
+             [(labels, value) for labels, value in per_ticker(eta) if value is not None] +
+             ([({}, total_eta)] if total_eta is not None else [])),
+        ]
+        rss = get_rss()
+        if rss is not None:
+            metrics.append(("backtest_resident_memory_bytes", "Resident memory of the backtest process", "gauge",
+                            [({}, rss)]))
+        return metrics
+
+    def write(self, metrics):
+        lines = []
+        for name, help_text, metric_type, samples in metrics:
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for labels, value in samples:
+                label_str = ",".join('{}="{}"'.format(key, label) for key, label in sorted(labels.items()))
+                lines.append("{}{} {}".format(name, "{" + label_str + "}" if label_str else "", value))
+        # Readers never see a half written file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def progress_line(self, metrics):
+        values = {name: samples for name, _, _, samples in metrics}
+        events = sum(self.events.values())
+        expected = sum(self.expected.values())
+        eta = {labels.get("ticker"): value for labels, value in values["backtest_eta_seconds"]}
+        busy = self.load_time + self.simulate_time
+        line = "{} {}/{} events ({:.0f}%) | {:.1f} events/s {:.0f} steps/s | ETA {} {}, all {} | loading {:.0f}%"
+        line = line.format(self.ticker, events, expected, 100.0 * events / max(1, expected),
+                           values["backtest_events_per_second"][0][1],
+                           values["backtest_strategy_steps_per_second"][0][1],
+                           self.ticker, format_duration(eta.get(self.ticker)), format_duration(eta.get(None)),
+                           100.0 * self.load_time / busy if busy > 0 else 0.0)
+        if "backtest_resident_memory_bytes" in values:
+            line += " | RSS {:.0f} MB".format(values["backtest_resident_memory_bytes"][0][1] / 2 ** 20)
+        return line
+
+    def publish(self):
+        self.next_publish = time.perf_counter() + self.interval
+        metrics = self.report()
+        if self.path is not None:
+            self.write(metrics)
+        if self.console:
+            sys.stderr.write("\r" + self.progress_line(metrics) + "\033[K")
+            sys.stderr.flush()
+
+    def close(self):
+        """
+        Publish the final metrics, and end the progress line
+        """
+        self.publish()
+        if self.console:
+            sys.stderr.write("\n")
+            sys.stderr.flush()
@@ -0,0 +1,213 @@
+"""
+Lazy generation of strategy parameter permutations, and sampling of large parameter grids
+"""
+import itertools
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_MODES = ("grid", "random", "lhs", "budget")
+
+
+def get_param_axes(params):
+    """
+    :param params: dictionary of strategy parameters
+    :return: list of (key, values) tuples, one for each array-style parameter, in the order of the dictionary
+    """
+    return [(key, value) for key, value in params.items() if type(value) == list]
+
+
+def grid_size(params):
+    """
+    :param params: dictionary of strategy parameters
+    :return: number of permutations the array-style parameters span
+    """
+    size = 1
+    for _, values in get_param_axes(params):
+        size *= len(values)
+    return size
+
+
+def make_permutation(params, axes, value_indices):
+    """
+    :param params: dictionary of strategy parameters
+    :param axes: array-style parameters, as returned by get_param_axes
+    :param value_indices: index into the values of each axis
+    :return: a copy of params, with each array-style parameter replaced by the selected value
+    """
+    param_cpy = dict(params)
+    for (key, values), i in zip(axes, value_indices):
+        param_cpy[key] = values[i]
+    return param_cpy
+
+
+def permutation_at(params, axes, index):
+    """
+    Decode a position in the grid into a permutation, without enumerating the grid.
+    Positions follow the order of iter_permutations: the last array-style parameter changes fastest.
+    :param params: dictionary of strategy parameters
+    :param axes: array-style parameters, as returned by get_param_axes
+    :param index: position in the grid, between 0 and grid_size - 1
+    :return: the permutation at that position
+    """
+    value_indices = []
+    for _, values in reversed(axes):
+        index, i = divmod(index, len(values))
+        value_indices.append(i)
+    value_indices.reverse()
+    return make_permutation(params, axes, value_indices)
+
+
+def iter_permutations(params):
+    """
+    :param params: dictionary of strategy parameters
+    :return: generator of all permutations of the array-style parameters
+    """
+    axes = get_param_axes(params)
+    for value_indices in itertools.product(*[range(len(values)) for _, values in axes]):
+        yield make_permutation(params, axes, value_indices)
+
+
+def iter_random_permutations(params, n, rng):
+    """
+    :param params: dictionary of strategy parameters
+    :param n: number of permutations to draw (without replacement)
+    :param rng: random.Random instance
+    :return: generator of n permutations drawn uniformly from the grid, in grid order
+    """
+    size = grid_size(params)
+    if n >= size:
+        yield from iter_permutations(params)
+        return
+
+    axes = get_param_axes(params)
+    for index in sorted(rng.sample(range(size), n)):
+        yield permutation_at(params, axes, index)
+
+
+def lhs_indices(axes, n, rng):
+    """
+    :param axes: array-style parameters, as returned by get_param_axes
+    :param n: number of points to draw
+    :param rng: random.Random instance
+    :return: list of at most n distinct value index tuples, forming a Latin hypercube sample of the axes
+    """
+    columns = []
+    for _, values in axes:
+        strata = list(range(n))
+        rng.shuffle(strata)
+        columns.append([min(len(values) - 1, int((s + rng.random()) / n * len(values))) for s in strata])
+
+    points = []
+    seen = set()
+    for value_indices in zip(*columns):
+        if value_indices not in seen:
+            seen.add(value_indices)
+            points.append(value_indices)
+    return points
+
+
+def iter_corner_permutations(params):
+    """
+    Permutations of only the smallest and largest value of every numeric array-style parameter (all values of
+    non-numeric ones). Strategy data windows grow monotonically with their parameters, so the data needs of these
+    corners cover the data needs of the whole grid.
+    :param params: dictionary of strategy parameters
+    :return: generator of permutations
+    """
+    corners = dict(params)
+    for key, values in get_param_axes(params):
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            corners[key] = sorted(set([min(values), max(values)]))
+    yield from iter_permutations(corners)
+
+
+def iter_lhs_permutations(params, n, rng):
+    """
+    Latin hypercube sample of the grid: each axis is split into n equal strata, and every stratum of every axis is
+    used exactly once. On a coarse axis several strata map to the same value, so duplicate points are dropped and
+    fewer than n permutations can be returned.
+    :param params: dictionary of strategy parameters
+    :param n: number of points to draw
+    :param rng: random.Random instance
+    :return: generator of at most n distinct permutations
+    """
+    if n >= grid_size(params):
+        yield from iter_permutations(params)
+        return
+
+    axes = get_param_axes(params)
+    for value_indices in lhs_indices(axes, n, rng):
+        yield make_permutation(params, axes, value_indices)
+
+
+def budget_shares(sizes, n):
+    """
+    Split a budget of n permutations over grids, proportional to their sizes (largest remainder method)
+    :param sizes: list of grid sizes
+    :param n: total number of permutations
+    :return: list of the number of permutations to draw from every grid, summing up to min(n, sum(sizes))
+    """
+    total = sum(sizes)
+    if total <= n:
+        return list(sizes)
+    quotas = [n * size / total for size in sizes]
+    shares = [int(quota) for quota in quotas]
+    # Hand out what is left to the largest remainders, the earliest grids first on ties
+    by_remainder = sorted(range(len(sizes)), key=lambda i: shares[i] - quotas[i])
+    for i in by_remainder[:n - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def parse_sampling(spec):
+    """
+    :param spec: the "sampling" entry of the test parameters; None, a mode string or a dictionary (see Readme)
+    :return: (mode, n, seed) tuple
+    """
+    if spec is None:
+        spec = {}
+    elif isinstance(spec, str):
+        spec = {"mode": spec}
+
+    mode = spec.get("mode", "grid").lower()
+    if mode not in SAMPLING_MODES:
+        raise ValueError("Unknown sampling mode '{}', expected one of {}".format(mode, SAMPLING_MODES))
+    n = spec.get("n", None)
+    if mode != "grid" and (n is None or n < 1):
+        raise ValueError("Sampling mode '{}' needs a positive sample size 'n'".format(mode))
+    return mode, n, spec.get("seed", 0)
+
+
+def iter_sampled_permutations(param_specs, sampling=None):
+    """
+    Generate the parameter permutations to test for a list of strategy specs. The sample is seeded, so the same
+    specs always produce the same permutations.
+    :param param_specs: list of strategy parameter dictionaries, each possibly holding array-style parameters
+    :param sampling: the "sampling" entry of the test parameters (see parse_sampling)
+    :return: generator of parameter dictionaries
+    """
+    mode, n, seed = parse_sampling(sampling)
+    rng = random.Random(seed)
+
+    if mode == "budget":
+        # Split a total of n permutations over the strategy specs, proportional to the size of their grids
+        sizes = [grid_size(params) for params in param_specs]
+        total = sum(sizes)
+        logger.debug("Sampling {} out of {} permutations".format(min(n, total), total))
+        for params, share in zip(param_specs, budget_shares(sizes, n)):
+            if share > 0:
+                yield from iter_random_permutations(params, share, rng)
+        return
+
+    for params in param_specs:
+        if mode == "grid":
+            yield from iter_permutations(params)
+        else:
+            logger.debug("Sampling {} out of {} permutations of {}".format(
+                min(n, grid_size(params)), grid_size(params), params.get("strategy")))
+            if mode == "random":
+                yield from iter_random_permutations(params, n, rng)
+            elif mode == "lhs":
+                yield from iter_lhs_permutations(params, n, rng)
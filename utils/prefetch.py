@@ -0,0 +1,151 @@
+"""
+Background prefetching of events: upcoming days (and the next ticker) are loaded and decoded while the current event
+is being simulated, so a run takes about max(load, simulate) time instead of their sum.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+
+from utils.data_loader import data_source_from_params, events_generator
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_MODES = ("thread", "process")
+
+# Markers passed along with the prefetched items
+ITEM, DONE, ERROR = 0, 1, 2
+
+
+def ticker_events(source, tickers, todate=None, data_filter=None):
+    """
+    Events of several tickers, one ticker after the other
+    :param tickers: list of (ticker, fromdate) pairs; every ticker can be read from its own date (included)
+    :return: yields (ticker, event) pairs, and a (ticker, None) pair once the events of a ticker are exhausted
+    """
+    for ticker, fromdate in tickers:
+        for event in events_generator(ticker=ticker, fromdate=fromdate, todate=todate, data_filter=data_filter,
+                                      source=source):
+            yield ticker, event
+        yield ticker, None
+
+
+def put_until_stopped(q, item, stop):
+    """
+    Put an item on a bounded queue, giving up once the consumer signals it stopped listening
+    :return: True if the item was queued
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def produce(items, q, stop):
+    try:
+        for item in items:
+            if not put_until_stopped(q, (ITEM, item), stop):
+                return
+        put_until_stopped(q, (DONE, None), stop)
+    except BaseException as e:
+        put_until_stopped(q, (ERROR, e), stop)
+
+
+def produce_ticker_events(source_params, tickers, todate, data_filter, q, stop):
+    """
+    Producer of a prefetch worker process; exceptions are sent back as strings since they may not be picklable
+    :param source_params: parameters of the DataSource to read from (see data_source_from_params)
+    """
+    try:
+        source = data_source_from_params(source_params)
+        for item in ticker_events(source, tickers, todate, data_filter):
+            if not put_until_stopped(q, (ITEM, item), stop):
+                return
+        put_until_stopped(q, (DONE, None), stop)
+    except BaseException as e:
+        put_until_stopped(q, (ERROR, "{}: {}".format(type(e).__name__, e)), stop)
+
+
+def get_from(q, producer, poll=1.0):
+    """
+    Wait for the next item of a prefetch queue, as long as its producer is alive
+    :param producer: the Thread or Process filling the queue
+    :raise RuntimeError: if the producer died without sending anything (e.g. a worker process killed by the OS)
+    """
+    while True:
+        try:
+            return q.get(timeout=poll)
+        except queue.Empty:
+            if producer.is_alive():
+                continue
+        # The producer may have put its last items right before exiting
+        try:
+            return q.get(timeout=poll)
+        except queue.Empty:
+            exitcode = getattr(producer, "exitcode", None)
+            raise RuntimeError("Prefetching events failed: the producer {} stopped unexpectedly{}".format(
+                producer.name, "" if exitcode is None else " (exit code {})".format(exitcode)))
+
+
+def consume(q, stop, producer):
+    try:
+        while True:
+            marker, item = get_from(q, producer)
+            if marker == ITEM:
+                yield item
+            elif marker == ERROR:
+                if isinstance(item, BaseException):
+                    raise item
+                raise RuntimeError("Prefetching events failed: {}".format(item))
+            else:
+                return
+    finally:
+        # Let the producer know nobody is listening anymore (also when the consumer stops early)
+        stop.set()
+
+
+def prefetch(items, depth=8):
+    """
+    Iterate over items in a background thread, keeping up to depth items ready ahead of the consumer
+    :param items: any iterable, typically a generator doing I/O or decoding work
+    :param depth: maximum number of items prefetched ahead
+    :return: yields the items, in order; exceptions raised by the iterable are re-raised in the consumer
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce, args=(items, q, stop), daemon=True)
+    producer.start()
+    return consume(q, stop, producer)
+
+
+def prefetch_events(source, tickers, todate=None, data_filter=None, depth=8, mode="thread"):
+    """
+    Events of several tickers (see ticker_events), loaded ahead in a background thread or process
+    :param source: the DataSource to read from; in "process" mode, the worker reads from a DataSource set up from the
+                   same parameters
+    :param tickers: list of (ticker, fromdate) pairs, in the order they should be simulated; fromdate is included
+    :param todate: date string (YYYY-MM-DD), NOT included
+    :param data_filter: a DataFilter with DTE/delta windows to restrict the data to (optional)
+    :param depth: maximum number of events prefetched ahead; 0 disables prefetching
+    :param mode: "thread" (cheap, overlaps I/O and C-level decoding) or "process" (also overlaps Python-level decoding,
+                 at the cost of pickling every event over to the simulation process)
+    :return: yields (ticker, event) pairs, and a (ticker, None) pair once the events of a ticker are exhausted
+    """
+    items = ticker_events(source, tickers, todate, data_filter)
+    if depth <= 0:
+        return items
+    if mode == "thread":
+        return prefetch(items, depth)
+
+    # The worker process is spawned rather than forked, and sets up a data source of its own: a forked one would share
+    # the DB connections opened by this process so far (e.g. for fingerprints), and locks held by its other threads
+    ctx = multiprocessing.get_context("spawn")
+    q = ctx.Queue(maxsize=depth)
+    stop = ctx.Event()
+    producer = ctx.Process(target=produce_ticker_events,
+                           args=(source.params, tickers, todate, data_filter, q, stop), daemon=True)
+    producer.start()
+    return consume(q, stop, producer)
@@ -0,0 +1,106 @@
+"""
+Low overhead per-stage timers for profiling backtest runs (see --profile in the Readme).
+Instrumented code checks PROFILER.enabled before taking any timings, so a normal run pays for a boolean check only.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Stages timed inside other stages; their time is also part of the enclosing stage's total
+NESTED_STAGES = {"rnd_fit": "handle_event"}
+
+
+def percentile(sorted_values, p):
+    """
+    :param sorted_values: list of values in ascending order
+    :param p: percentile between 0 and 100
+    :return: nearest rank percentile, or None if there are no values
+    """
+    if len(sorted_values) == 0:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))]
+
+
+class Profiler:
+    """
+    Collects total time and call count per stage, the time taken by every event, and the time spent in every strategy
+    """
+    def __init__(self):
+        self.enabled = False
+        # Events can be loaded by a prefetch thread while the main thread simulates
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.totals = {}
+        self.counts = {}
+        self.event_times = []
+        self.strategy_costs = {}
+
+    def add(self, stage, seconds, count=1):
+        with self.lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    def add_event(self, seconds):
+        self.event_times.append(seconds)
+
+    def add_strategy(self, strategy, stage, seconds):
+        self.add(stage, seconds)
+        costs = self.strategy_costs.setdefault(strategy, {})
+        costs[stage] = costs.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def report(self):
+        """
+        :return: JSON serializable dictionary of all timings, in seconds
+        """
+        stages = {}
+        for stage, total in self.totals.items():
+            stages[stage] = {"total": total, "count": self.counts[stage], "mean": total / max(1, self.counts[stage])}
+            if stage in NESTED_STAGES:
+                stages[stage]["within"] = NESTED_STAGES[stage]
+
+        event_times = sorted(self.event_times)
+        events = {"count": len(event_times), "total": sum(event_times)}
+        for p in (50, 90, 99):
+            events["p{}".format(p)] = percentile(event_times, p)
+        events["max"] = event_times[-1] if len(event_times) > 0 else None
+
+        # Strategies with the same id (the same permutation tested on several tickers) are added up
+        strategies = {}
+        for strategy, costs in self.strategy_costs.items():
+            entry = strategies.setdefault(strategy.get_unique_id(), {})
+            for stage, total in costs.items():
+                entry[stage] = entry.get(stage, 0.0) + total
+        for entry in strategies.values():
+            entry["total"] = sum(entry.values())
+
+        return {"wall_time": time.perf_counter() - self.started, "stages": stages, "events": events,
+                "strategies": dict(sorted(strategies.items(), key=lambda item: item[1]["total"], reverse=True))}
+
+    def write(self, path):
+        """
+        Write the report as JSON
+        :param path: file name to write to
+        :return: the report
+        """
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+PROFILER = Profiler()
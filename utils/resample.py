@@ -0,0 +1,110 @@
+"""
+Coarse stepping of strategies, for fast first-pass sweeps: strategies only get to act on the first trading day of
+every period (every N days, or weekly), while portfolios are still marked and settled on every trading day
+"""
+import logging
+from datetime import date
+
+from utils.tools import nr_days_between_dates
+
+logger = logging.getLogger(__name__)
+
+
+def parse_resample(spec):
+    """
+    :param spec: the "resample" entry of the test parameters; None, a number of days, "weekly", or a dictionary
+                 with "every" and "compare" entries (see Readme)
+    :return: (every, compare) pair, with every None for full resolution
+    """
+    if spec is None:
+        return None, False
+    if type(spec) != dict:
+        spec = {"every": spec}
+
+    every = spec.get("every", None)
+    if every == 1:
+        every = None
+    if every is not None and every != "weekly" and (type(every) != int or every < 1):
+        raise ValueError("Unknown resample period '{}', expected a number of days or 'weekly'".format(every))
+    return every, spec.get("compare", False) and every is not None
+
+
+def get_step_period(quotedate, every, origin):
+    """
+    :param quotedate: a date string in the form of "YYYY-MM-DD"
+    :param every: a number of days, "weekly", or None for full resolution
+    :param origin: a date string of the start of the first period
+    :return: identifier of the period the date falls in; strategies act on the first trading day of each period
+    """
+    if every is None:
+        return quotedate
+    if every == "weekly":
+        year, month, day = quotedate.split("-")
+        return date(int(year), int(month), int(day)).isocalendar()[:2]
+    return nr_days_between_dates(origin, quotedate) // every
+
+
+def get_ranks(values):
+    """
+    :return: rank of every value (0 for the smallest), ties get the average rank
+    """
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0 for _ in values]
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2.0
+        i = j + 1
+    return ranks
+
+
+def rank_correlation(x, y):
+    """
+    :return: Spearman rank correlation of two equally long lists of values; None if undefined
+    """
+    rx, ry = get_ranks(x), get_ranks(y)
+    n = len(x)
+    if n < 2:
+        return None
+    mx, my = sum(rx) / n, sum(ry) / n
+    cov = sum((a - mx) * (b - my) for a, b in zip(rx, ry))
+    vx = sum((a - mx) ** 2 for a in rx)
+    vy = sum((b - my) ** 2 for b in ry)
+    if vx == 0 or vy == 0:
+        return None
+    return cov / (vx * vy) ** 0.5
+
+
+def report_divergence(coarse_summary, full_summary, every):
+    """
+    Log how far the results of a coarse run diverge from those of a full resolution run
+    :param coarse_summary: summary_by_ticker of the coarse run (see BackTestEngine.run)
+    :param full_summary: summary_by_ticker of the full resolution run
+    :param every: the resample period of the coarse run
+    """
+    logger.info("Divergence of results stepped {} from full resolution".format(
+        "weekly" if every == "weekly" else "every {} days".format(every)))
+    for ticker, summary in coarse_summary.items():
+        full = {id: (perf, drawdown) for perf, drawdown, _, id, _ in full_summary.get(ticker, [])}
+        rows = [(id, perf, drawdown) + full[id] for perf, drawdown, _, id, _ in summary if id in full]
+        if len(rows) == 0:
+            continue
+
+        for id, perf, drawdown, full_perf, full_drawdown in rows:
+            logger.info("{} Strategy {} Performance {:.2f}% vs {:.2f}% (diff {:+.2f}%) MaxDrawdown {:.2f}% vs {:.2f}% "
+                        "(diff {:+.2f}%)".format(ticker, id, perf, full_perf, perf - full_perf, drawdown,
+                                                 full_drawdown, drawdown - full_drawdown))
+
+        perf_diffs = [abs(perf - full_perf) for _, perf, _, full_perf, _ in rows]
+        drawdown_diffs = [abs(drawdown - full_drawdown) for _, _, drawdown, _, full_drawdown in rows]
+        correlation = rank_correlation([r[1] for r in rows], [r[3] for r in rows])
+        best = max(rows, key=lambda r: r[1])[0]
+        full_best = max(rows, key=lambda r: r[3])[0]
+        logger.info("{} Performance diff avg {:.2f}% max {:.2f}%, MaxDrawdown diff avg {:.2f}% max {:.2f}%, rank "
+                    "correlation {}, same best strategy: {}".format(
+                        ticker, sum(perf_diffs) / len(rows), max(perf_diffs), sum(drawdown_diffs) / len(rows),
+                        max(drawdown_diffs), "n/a" if correlation is None else "{:.3f}".format(correlation),
+                        best == full_best))
@@ -0,0 +1,89 @@
+"""
+Persistent cache of backtest results, so that rerunning a sweep only simulates the strategy permutations that are new
+or changed
+"""
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Source modules that decide the outcome of a simulation, on top of the module of the strategy itself: building events
+# out of option rows, stepping strategies and marking portfolios, and the helpers strategies use
+SIMULATION_MODULES = ["core.backtest_engine", "core.datafilter", "core.event", "core.option", "core.optionchain",
+                      "core.optionchainset", "core.order", "core.portfolio", "core.wakeup", "indicators.rnd",
+                      "strategy.strategy", "utils.data_loader", "utils.resample", "utils.tools"]
+
+
+# Digests of source files read so far
+FILE_DIGESTS = {}
+
+
+def file_digest(path):
+    if path not in FILE_DIGESTS:
+        with open(path, "rb") as f:
+            FILE_DIGESTS[path] = hashlib.sha1(f.read()).hexdigest()
+    return FILE_DIGESTS[path]
+
+
+def code_fingerprint(strategy):
+    """
+    :param strategy: an initialized strategy
+    :return: fingerprint of the source code that decides the outcome of simulating the strategy
+    """
+    # Strategies are imported on demand (see strategy/registry.py), so make sure all modules count, whatever ran before;
+    # modules are only located, not imported, so that no strategy pays for the dependencies of another one
+    modules = [type(strategy).__module__] + SIMULATION_MODULES
+    return ";".join(file_digest(importlib.util.find_spec(m).origin) for m in modules)
+
+
+class ResultCache:
+    """
+    Stores the final summary and net value history of every simulated (strategy parameters, ticker, date range,
+    starting cash, data version) combination as a small JSON file in a cache folder
+    """
+    def __init__(self, path):
+        """
+        :param path: cache folder
+        """
+        self.path = path
+
+    def make_key(self, strategy, ticker, fromdate, todate, startcash, data_fingerprint, extra=None):
+        """
+        :param strategy: an initialized strategy (its params are part of the key)
+        :param ticker: string of the ticker ("SPY", "QQQ", ...)
+        :param fromdate: date string (YYYY-MM-DD)
+        :param todate: date string (YYYY-MM-DD)
+        :param startcash: starting cash amount
+        :param data_fingerprint: data version fingerprint (see DataSource.get_fingerprint)
+        :param extra: any other JSON serializable engine settings that change results
+        :return: the cache key string
+        """
+        key_data = {"params": strategy.params, "ticker": ticker, "fromdate": fromdate, "todate": todate,
+                    "startcash": startcash, "data": data_fingerprint, "code": code_fingerprint(strategy),
+                    "extra": extra}
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        :return: the cached result dictionary, or None if not cached
+        """
+        try:
+            with open(os.path.join(self.path, key + ".json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        """
+        :param key: the cache key string
+        :param result: JSON serializable result dictionary
+        """
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, key + ".json")
+        tmp_filename = filename + ".tmp{}".format(os.getpid())
+        with open(tmp_filename, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_filename, filename)
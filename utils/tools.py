@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, timedelta
 
 
 def nr_days_between_dates(date1, date2):
@@ -15,6 +15,17 @@ def nr_days_between_dates(date1, date2):
     return abs(delta.days)
 
 
+def add_days(date1, days):
+    """
+    :param date1: a date string in the form of "YYYY-MM-DD"
+    :param days: number of days to add (can be negative)
+    :return: the resulting date string in the form of "YYYY-MM-DD"
+    """
+    year1, month1, day1 = date1.split("-")
+    d1 = date(int(year1), int(month1), int(day1)) + timedelta(days=days)
+    return d1.isoformat()
+
+
 def symbol_to_params(symbol):
     """
     Dirty function to turn symbol into option info
@@ -0,0 +1,149 @@
+"""
+Compact binary trace of a backtest run (events, orders, fills and net values), for auditing a simulation in detail.
+Records are packed into a buffer on the simulation thread and written to disk by a background thread.
+
+Layout: the MAGIC header, followed by records that each start with a one byte record type:
+ - NAME: (id, length, utf-8 bytes) defines the string of a name id, before its first use
+ - EVENT: (date, ticker name id, underlying price)
+ - ORDER: (date, strategy index, symbol name id, quantity)
+ - FILL: (date, strategy index, symbol name id, quantity, price); includes assignments and expiries
+ - NAV: (date, strategy index, net value)
+ - STRATEGY: (strategy index, strategy name id) defines the strategy of an index
+Dates are stored as YYYYMMDD integers.
+"""
+import queue
+import struct
+import threading
+
+MAGIC = b"BTTRACE1"
+
+NAME, EVENT, ORDER, FILL, NAV, STRATEGY = range(6)
+
+RECORDS = {
+    NAME: struct.Struct("<BIH"),
+    EVENT: struct.Struct("<BIId"),
+    ORDER: struct.Struct("<BIIId"),
+    FILL: struct.Struct("<BIIIdd"),
+    NAV: struct.Struct("<BIId"),
+    STRATEGY: struct.Struct("<BII"),
+}
+
+# Hand buffered records over to the writer thread once the buffer grows beyond this many bytes
+FLUSH_SIZE = 1 << 16
+
+
+def date_to_int(quotedate):
+    return int(quotedate[0:4]) * 10000 + int(quotedate[5:7]) * 100 + int(quotedate[8:10])
+
+
+def int_to_date(value):
+    return "{:04d}-{:02d}-{:02d}".format(value // 10000, value // 100 % 100, value % 100)
+
+
+class TraceWriter:
+    """
+    Appends trace records to a file; call close() at the end of the run to write out the remaining records
+    """
+    def __init__(self, path):
+        """
+        :param path: file to write the trace to (overwritten)
+        """
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.names = {}
+        self.buffer = bytearray()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.write_chunks, daemon=True)
+        self.thread.start()
+
+    def write_chunks(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            self.file.write(chunk)
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.queue.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def add(self, record_type, *values):
+        self.buffer += RECORDS[record_type].pack(record_type, *values)
+        if len(self.buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def name_id(self, name):
+        """
+        :return: the id of a name string, defining it in the trace on first use
+        """
+        name_id = self.names.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names[name] = name_id
+            encoded = name.encode("utf-8")
+            self.buffer += RECORDS[NAME].pack(NAME, name_id, len(encoded)) + encoded
+        return name_id
+
+    def strategy(self, index, name):
+        self.add(STRATEGY, index, self.name_id(name))
+
+    def event(self, event):
+        # A record per underlying, for baskets (see MultiEvent) as well
+        for ticker_event in event.get_events():
+            self.add(EVENT, date_to_int(ticker_event.quotedate), self.name_id(ticker_event.ticker), ticker_event.price)
+
+    def order(self, quotedate, index, symbol, qty):
+        self.add(ORDER, date_to_int(quotedate), index, self.name_id(symbol), qty)
+
+    def fill(self, quotedate, index, symbol, qty, price):
+        self.add(FILL, date_to_int(quotedate), index, self.name_id(symbol), qty, price)
+
+    def nav(self, quotedate, index, net_value):
+        self.add(NAV, date_to_int(quotedate), index, net_value)
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+def read_trace(path):
+    """
+    :param path: a trace file written by TraceWriter
+    :return: generator of (record type name, dictionary of fields) pairs, with names and dates decoded
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError("{} is not a backtest trace".format(path))
+
+    names = {}
+    strategies = {}
+    ticker = None
+    pos = len(MAGIC)
+    while pos < len(data):
+        record_type = data[pos]
+        record = RECORDS[record_type]
+        values = record.unpack_from(data, pos)[1:]
+        pos += record.size
+        if record_type == NAME:
+            name_id, length = values
+            names[name_id] = data[pos:pos + length].decode("utf-8")
+            pos += length
+        elif record_type == STRATEGY:
+            strategies[values[0]] = names[values[1]]
+        elif record_type == EVENT:
+            # Orders, fills and net values that follow belong to the ticker of the latest event
+            ticker = names[values[1]]
+            yield "event", {"date": int_to_date(values[0]), "ticker": ticker, "price": values[2]}
+        elif record_type == ORDER:
+            yield "order", {"date": int_to_date(values[0]), "ticker": ticker, "strategy": strategies[values[1]],
+                            "symbol": names[values[2]], "qty": values[3]}
+        elif record_type == FILL:
+            yield "fill", {"date": int_to_date(values[0]), "ticker": ticker, "strategy": strategies[values[1]],
+                           "symbol": names[values[2]], "qty": values[3], "price": values[4]}
+        elif record_type == NAV:
+            yield "nav", {"date": int_to_date(values[0]), "ticker": ticker, "strategy": strategies[values[1]],
+                          "net_value": values[2]}